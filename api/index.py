@@ -1,55 +1,192 @@
+import io
+import os
 import json
+import time
+import uuid
+import base64
+from functools import wraps
 
-from flask import Flask, make_response, render_template, request
+from flask import Flask, Response, g, make_response, render_template, request, send_file
 
+from api.jobs import JobLimitExceeded, JobManager
+from api.sessions import SessionPool, SessionStore
+from api.stream import job_stream
+from core import metrics
+from core.cache import AssemblyCache
+from core.conditions import Condition
 from core.controller import Controller
-from core.util import fill_memory
+from core.image import detect_format, load_image, save_image
+from core.pool import ControllerPool
+from core.util import hexconvert
 
 # from core.flags import flags
 
 CLEAR_TOKEN = "batman"
 app = Flask(__name__, static_folder="static")
-controller = Controller()
+SESSION_COOKIE = "sim8051_session"
+# filled in the background on the first request, not at import time
+controllers = ControllerPool(size=int(os.environ.get("CONTROLLER_POOL_SIZE", 4)), prewarm=False, refill=True)
+sessions = SessionPool(
+    controllers=controllers,
+    max_sessions=int(os.environ.get("MAX_SESSIONS", 64)),
+    idle_timeout=float(os.environ.get("SESSION_IDLE_TIMEOUT", 1800)),
+    max_memory=int(os.environ["SESSION_MAX_MEMORY"]) if os.environ.get("SESSION_MAX_MEMORY") else None,
+    store=SessionStore(os.environ["SESSION_STORE_DIR"]) if os.environ.get("SESSION_STORE_DIR") else None,
+)
+MAX_RUN_STEPS = int(os.environ.get("MAX_RUN_STEPS", 100000))
+# instruction budget of a background run
+MAX_JOB_STEPS = int(os.environ.get("MAX_JOB_STEPS", 10000000))
+MAX_MEMORY_SLICE = int(os.environ.get("MAX_MEMORY_SLICE", 4096))
+jobs = JobManager(
+    max_workers=int(os.environ.get("RUN_WORKERS", 2)),
+    max_pending=int(os.environ.get("MAX_PENDING_JOBS", 16)),
+    max_instructions=MAX_JOB_STEPS,
+)
+assembly_cache = AssemblyCache(
+    maxsize=int(os.environ.get("ASSEMBLY_CACHE_SIZE", 128)), path=os.environ.get("ASSEMBLY_CACHE_DIR", None)
+)
 
 app.jinja_env.globals.update(zip=zip)
 
+http_requests = metrics.REGISTRY.counter(
+    "sim8051_http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status")
+)
+http_seconds = metrics.REGISTRY.histogram(
+    "sim8051_http_request_seconds", "Time spent handling an HTTP request", ("route", "method")
+)
+metrics.REGISTRY.gauge("sim8051_sessions_live", "Sessions in the pool").set_function(lambda: len(sessions))
+metrics.REGISTRY.gauge("sim8051_controllers_idle", "Pre-built controllers waiting in the pool").set_function(
+    lambda: len(controllers)
+)
+metrics.REGISTRY.gauge("sim8051_jobs_active", "Queued and running jobs").set_function(
+    lambda: sum(jobs.stats()[x] for x in ("queued", "running"))
+)
+cache_hit_ratio = metrics.REGISTRY.gauge("sim8051_cache_hit_ratio", "Hit ratio of the caches", ("cache",))
+cache_hit_ratio.set_function(lambda: assembly_cache.stats()["hit_rate"], cache="assembly")
+cache_hit_ratio.set_function(
+    lambda: sessions.metrics["hits"] / max(1, sessions.metrics["hits"] + sessions.metrics["created"]), cache="sessions"
+)
 
-def _get_ram_and_rom():
-    _memory_ram, _memory_rom = None, None
-    _ram = fill_memory(controller.op.memory_ram, 256).sort()
-    if _ram:
-        _ram = list(_ram.items())
-        _memory_ram = [_ram[x : x + 16] for x in range(0, len(_ram), 16)]
 
-    _rom = fill_memory(controller.op.memory_rom, 256).sort()
-    if _rom:
-        _rom = list(_rom.items())
-        _memory_rom = [_rom[x : x + 16] for x in range(0, len(_rom), 16)]
+@app.before_request
+def _start_timer() -> None:
+    g.started = time.perf_counter()
+    return None
 
-    # print(f"RAM:{_memory_ram}; ROM:{_memory_rom}")
-    return _memory_ram, _memory_rom
 
+@app.after_request
+def _record_request(response: Response) -> Response:
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    http_requests.inc(route=route, method=request.method, status=response.status_code)
+    if "started" in g:
+        http_seconds.observe(time.perf_counter() - g.started, route=route, method=request.method)
+    return response
 
-@app.route("/reset", methods=["POST"])
-def reset():
-    global controller
-    controller.reset()
-    ram, rom = _get_ram_and_rom()
+
+def _render(template: str, **context) -> str:
+    with metrics.render_seconds.time(template=template):
+        return render_template(template, **context)
+
+
+def _get_int_arg(key: str, default: int = None) -> int:
+    """Query parameter as int; `0x12`/`12H` are hex, plain digits are decimal"""
+    value = request.args.get(key, None)
+    if not value:
+        return default
+    value = hexconvert(value)
+    if value[:2].lower() == "0x":
+        return int(value, 16)
+    return int(value)
+
+
+def _get_version_arg() -> int:
+    """State version from the `since` query parameter; `None` for the full state"""
+    since = request.args.get("since", "")
+    return int(since) if since.isdigit() else None
+
+
+def _session_id() -> str:
+    """Session id from the cookie; cookie-less clients share the `default` session"""
+    sid = request.cookies.get(SESSION_COOKIE, None)
+    if not sid or len(sid) > 64 or not all(x.isalnum() or x in "-_" for x in sid):
+        return "default"
+    return sid
+
+
+def with_controller(func):
+    """
+    Call the route with the controller of the request's session; serialized per session, refused
+    while a job runs the session's controller
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        while True:
+            session = g.session = sessions.get(_session_id())
+            job = jobs.active(session.sid)
+            if job:
+                return make_response(f"Session busy with job {job.id}", 409)
+            with session.lock:
+                if session.closed:
+                    # evicted before the lock was taken; its controller may be another session's by now
+                    continue
+                return func(session.controller, *args, **kwargs)
+
+    return wrapper
+
+
+def _memory_rows(memory, size: int = 256) -> list:
+    """First `size` bytes of the memory as rows of 16 `(address, value)` pairs, read from the buffer"""
+    cells = [(format(addr, "#06x"), format(value, "#04x")) for addr, value in enumerate(memory.dump(0, size))]
+    return [cells[x : x + 16] for x in range(0, len(cells), 16)]
+
+
+def _get_ram_and_rom(controller: Controller):
+    """
+    RAM and the first page of the ROM for the templates; the rest of the ROM is fetched by the
+    grid in the browser through `/memory`
+    """
+    return _memory_rows(controller.op.memory_ram), _memory_rows(controller.op.memory_rom)
+
+
+def _state_response(controller: Controller) -> dict:
+    """
+    Controller state for the routes; with the `since` query parameter only the changes
+    since that state version are returned as JSON, otherwise the rendered templates
+    """
+    if "since" in request.args:
+        return g.session.state.delta(_get_version_arg())
+
+    ram, rom = _get_ram_and_rom(controller)
     return {
-        "registers_flags": render_template(
+        "index": controller._run_idx,
+        "registers_flags": _render(
             "render_registers_flags.html",
             registers=controller.op.super_memory._registers_todict(),
             flags=controller.op.super_memory.PSW.flags(),
             general_purpose_registers=controller.op.super_memory._general_purpose_registers,
         ),
-        "memory": render_template("render_memory.html", ram=ram, rom=rom),
-        "assembler": render_template("render_assembler.html", assembler=controller.op._assembler),
+        "memory": _render("render_memory.html", ram=ram, rom=rom),
+        "assembler": _render("render_assembler.html", assembler=controller.op._assembler),
     }
 
 
+@app.route("/state", methods=["GET"])
+@with_controller
+def state(controller: Controller):
+    return g.session.state.delta(_get_version_arg())
+
+
+@app.route("/reset", methods=["POST"])
+@with_controller
+def reset(controller: Controller):
+    controller.reset()
+    return _state_response(controller)
+
+
 @app.route("/assemble", methods=["POST"])
-def assemble():
-    global controller
+@with_controller
+def assemble(controller: Controller):
     commands_json = request.data
     if commands_json:
         commands_dict = json.loads(commands_json)
@@ -57,11 +194,11 @@ def assemble():
         _flags = commands_dict.get("flags", None)
         if _commands and _flags:
             try:
-                controller.set_flags(_flags)
-                controller.parse_all(_commands)
-                ram, rom = _get_ram_and_rom()
+                assembly_cache.assemble(controller, _commands, _flags)
+                controller.cfg()
+                ram, rom = _get_ram_and_rom(controller)
                 print("PASSED")
-                return render_template("render_memory.html", ram=ram, rom=rom)
+                return _render("render_memory.html", ram=ram, rom=rom)
             except Exception as e:
                 print(e)
                 return make_response(f"Exception raised {e}", 400)
@@ -69,24 +206,20 @@ def assemble():
 
 
 @app.route("/run", methods=["POST"])
-def run():
-    global controller
+@with_controller
+def run(controller: Controller):
     print(controller.ready)
+    if controller.ready and request.args.get("async", None):
+        try:
+            job = jobs.submit(g.session)
+            return make_response(job.todict(), 202)
+        except JobLimitExceeded as e:
+            return make_response(f"Exception raised {e}", 429)
     if controller.ready:
         try:
-            controller.run()
-            ram, rom = _get_ram_and_rom()
+            finished = controller.run(limit=MAX_RUN_STEPS)
             controller.inspect()
-            return {
-                "registers_flags": render_template(
-                    "render_registers_flags.html",
-                    registers=controller.op.super_memory._registers_todict(),
-                    flags=controller.op.super_memory.PSW.flags(),
-                    general_purpose_registers=controller.op.super_memory._general_purpose_registers,
-                ),
-                "memory": render_template("render_memory.html", ram=ram, rom=rom),
-                "assembler": render_template("render_assembler.html", assembler=controller.op._assembler),
-            }
+            return {**_state_response(controller), "reason": "end" if finished else "limit"}
 
         except Exception as e:
             print(e)
@@ -94,34 +227,153 @@ def run():
     return make_response("Controller not ready", 400)
 
 
+@app.route("/jobs", methods=["GET"])
+def job_stats():
+    return jobs.stats()
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    """
+    Status and progress of the job; once it's done the state is added, as a delta with `since`
+    """
+    job = jobs.get(job_id, _session_id())
+    if job is None:
+        return make_response("Job not found", 404)
+    status = job.todict()
+    if job.done:
+        with job.session.lock:
+            status["state"] = job.session.state.delta(_get_version_arg())
+    return status
+
+
+@app.route("/jobs/<job_id>/stream", methods=["GET"])
+def job_events(job_id: str):
+    """
+    Server-Sent Events of the job's state at `fps` frames per second, see `api.stream.job_stream`
+    """
+    job = jobs.get(job_id, _session_id())
+    if job is None:
+        return make_response("Job not found", 404)
+    try:
+        fps = float(request.args.get("fps", 30))
+    except ValueError:
+        return make_response("Invalid fps", 400)
+    return Response(
+        job_stream(job, fps=fps, since=_get_version_arg()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id: str):
+    job = jobs.cancel(job_id, _session_id())
+    if job is None:
+        return make_response("Job not found", 404)
+    return job.todict()
+
+
 @app.route("/run-once", methods=["POST"])
-def step():
-    global controller
+@with_controller
+def step(controller: Controller):
     print(controller.ready)
     if controller.ready:
         try:
             controller.run_once()
-            ram, rom = _get_ram_and_rom()
-            return {
-                "index": controller._run_idx,
-                "registers_flags": render_template(
-                    "render_registers_flags.html",
-                    registers=controller.op.super_memory._registers_todict(),
-                    flags=controller.op.super_memory.PSW.flags(),
-                    general_purpose_registers=controller.op.super_memory._general_purpose_registers,
-                ),
-                "memory": render_template("render_memory.html", ram=ram, rom=rom),
-                "assembler": render_template("render_assembler.html", assembler=controller.op._assembler),
-            }
+            return _state_response(controller)
         except Exception as e:
             print(e)
             return make_response(f"Exception raised {e}", 400)
     return make_response("Controller not ready", 400)
 
 
+@app.route("/run-steps", methods=["POST"])
+@with_controller
+def run_steps(controller: Controller):
+    """
+    Run `steps` instructions, or until the label/callstack index `until` or the `condition` e.g.
+    `A == 0x05`; parameters from the JSON body or the query, `trace` adds a per-step trace
+    """
+    if not controller.ready:
+        return make_response("Controller not ready", 400)
+    params = request.get_json(silent=True, force=True) or request.args
+    try:
+        steps = params.get("steps", None)
+        until = params.get("until", None)
+        condition = params.get("condition", None)
+        trace = str(params.get("trace", "")).lower() in ("1", "true")
+        if steps is None and until is None and condition is None:
+            steps = 1
+        result = controller.run_steps(
+            steps=None if steps is None else int(steps),
+            until=until,
+            condition=Condition(condition) if condition else None,
+            trace=trace,
+            limit=MAX_RUN_STEPS,
+        )
+        if not trace:
+            result.pop("trace")
+        return {**_state_response(controller), **result}
+    except Exception as e:
+        print(e)
+        return make_response(f"Exception raised {e}", 400)
+
+
+@app.route("/memory", methods=["GET"])
+@with_controller
+def memory_slice(controller: Controller):
+    """
+    Raw bytes of a memory space straight from its buffer; `space` rom|ram|xram, `start`, `len` (at
+    most `MAX_MEMORY_SLICE`). JSON with the bytes in base64, or the bytes with `format=binary`
+    """
+    space = request.args.get("space", "rom")
+    try:
+        memory = controller.op.super_memory.space(space)
+        start = _get_int_arg("start", 0)
+        data = controller.op.super_memory.read_block(space, start, min(_get_int_arg("len", 256), MAX_MEMORY_SLICE))
+    except Exception as e:
+        print(e)
+        return make_response(f"Exception raised {e}", 400)
+    if request.args.get("format", None) == "binary":
+        return Response(
+            data,
+            mimetype="application/octet-stream",
+            headers={"X-Memory-Start": str(start), "X-Memory-Size": str(len(memory.buffer))},
+        )
+    return {
+        "space": space,
+        "start": start,
+        "len": len(data),
+        "size": len(memory.buffer),
+        "data": base64.b64encode(data).decode("ascii"),
+    }
+
+
+@app.route("/memory", methods=["POST"])
+@with_controller
+def memory_write(controller: Controller):
+    """
+    Bulk write of the request body into a memory space from `start`; the body is the raw bytes
+    (`application/octet-stream`) or a hex/base64 string with `encoding=hex|base64`
+    """
+    encoding = request.args.get("encoding", None)
+    if encoding is None:
+        encoding = "raw" if request.mimetype == "application/octet-stream" else "hex"
+    try:
+        written = controller.op.super_memory.write_block(
+            request.args.get("space", "ram"), _get_int_arg("start", 0), request.get_data(), encoding
+        )
+        return {**_state_response(controller), "written": written}
+    except Exception as e:
+        print(e)
+        return make_response(f"Exception raised {e}", 400)
+
+
 @app.route("/memory-edit", methods=["POST"])
-def update_memory():
-    global controller
+@with_controller
+def update_memory(controller: Controller):
     mem_data = request.data
     if mem_data:
         mem_data = json.loads(mem_data)
@@ -130,35 +382,110 @@ def update_memory():
             for memloc, memdata in mem_data:
                 print("=============================")
                 print(memloc, memdata)
-                controller.op.memory_ram.write(memloc, memdata)
-            ram, rom = _get_ram_and_rom()
-            return {
-                "index": controller._run_idx,
-                "registers_flags": render_template(
-                    "render_registers_flags.html",
-                    registers=controller.op.super_memory._registers_todict(),
-                    flags=controller.op.super_memory.PSW.flags(),
-                    general_purpose_registers=controller.op.super_memory._general_purpose_registers,
-                ),
-                "memory": render_template("render_memory.html", ram=ram, rom=rom),
-                "assembler": render_template("render_assembler.html", assembler=controller.op._assembler),
-            }
+                controller.op.super_memory.write_block(
+                    "ram", int(hexconvert(memloc), 16), bytes([int(hexconvert(memdata), 16)])
+                )
+            return _state_response(controller)
         except Exception as e:
             print(e)
             return make_response(f"Exception raised {e}", 400)
     return make_response("Controller not ready", 400)
 
 
+@app.route("/upload-image", methods=["POST"])
+@with_controller
+def upload_image(controller: Controller):
+    _file = request.files.get("image", None)
+    _stream = _file.stream if _file else io.BytesIO(request.get_data())
+    _format = request.args.get("format", None) or detect_format(_file.filename if _file else "", default="hex")
+    try:
+        _start = _get_int_arg("start", 0)
+        low, high, count = load_image(_stream, controller.op.memory_rom, fmt=_format, start=_start)
+        print(f"loaded {count} bytes; {low}-{high}")
+        if count and request.args.get("assemble", None):
+            controller.parse_rom(low, high - low + 1)
+        ram, rom = _get_ram_and_rom(controller)
+        return _render("render_memory.html", ram=ram, rom=rom)
+    except Exception as e:
+        print(e)
+        return make_response(f"Exception raised {e}", 400)
+
+
+@app.route("/download-image", methods=["GET"])
+@with_controller
+def download_image(controller: Controller):
+    _format = request.args.get("format", "hex")
+    try:
+        _start = _get_int_arg("start", 0)
+        _size = _get_int_arg("len", None)
+        if _format == "hex":
+            _stream = io.StringIO()
+            save_image(_stream, controller.op.memory_rom, fmt=_format, start=_start, size=_size)
+            _data = io.BytesIO(_stream.getvalue().encode("ascii"))
+        else:
+            _data = io.BytesIO()
+            save_image(_data, controller.op.memory_rom, fmt=_format, start=_start, size=_size)
+            _data.seek(0)
+        return send_file(_data, mimetype="application/octet-stream", as_attachment=True, download_name=f"rom.{_format}")
+    except Exception as e:
+        print(e)
+        return make_response(f"Exception raised {e}", 400)
+
+
+@app.route("/disassemble", methods=["GET"])
+@with_controller
+def disassemble(controller: Controller):
+    try:
+        _start = _get_int_arg("start", 0)
+        _size = min(_get_int_arg("len", 256), MAX_MEMORY_SLICE)
+        return {
+            "start": _start,
+            "len": _size,
+            "instructions": controller.disassembler.disassemble(_start, _size),
+        }
+    except Exception as e:
+        print(e)
+        return make_response(f"Exception raised {e}", 400)
+
+
+@app.route("/cfg", methods=["GET"])
+@with_controller
+def control_flow(controller: Controller):
+    try:
+        return controller.cfg().todict()
+    except Exception as e:
+        print(e)
+        return make_response(f"Exception raised {e}", 400)
+
+
+@app.route("/sessions", methods=["GET"])
+def session_stats():
+    return {**sessions.stats(), "controllers": controllers.stats()}
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_text():
+    """Prometheus text exposition of `core.metrics.REGISTRY`"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route("/", methods=["GET"])
 def main():
-    global controller
-    controller = Controller()
-    ram, rom = _get_ram_and_rom()
-    return render_template(
-        "index.html",
-        ram=ram,
-        rom=rom,
-        registers=controller.op.super_memory._registers_todict(),
-        general_purpose_registers=controller.op.super_memory._general_purpose_registers,
-        flags=controller.op.super_memory.PSW.flags(),
+    sid = request.cookies.get(SESSION_COOKIE, None)
+    if _session_id() != sid:
+        sid = uuid.uuid4().hex
+    session = sessions.new(sid)
+    controller = session.controller
+    ram, rom = _get_ram_and_rom(controller)
+    response = make_response(
+        _render(
+            "index.html",
+            ram=ram,
+            rom=rom,
+            registers=controller.op.super_memory._registers_todict(),
+            general_purpose_registers=controller.op.super_memory._general_purpose_registers,
+            flags=controller.op.super_memory.PSW.flags(),
+        )
     )
+    response.set_cookie(SESSION_COOKIE, sid, httponly=True, samesite="Lax")
+    return response
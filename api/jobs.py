@@ -0,0 +1,192 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobLimitExceeded(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, session, limit: int = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.session = session
+        # instruction budget of the run
+        self.limit = limit
+        self.status = QUEUED
+        # why the run stopped; `end`, `stopped` or `limit`
+        self.reason = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._stop = threading.Event()
+        self._instructions = 0
+        self._cycles = 0
+        return
+
+    def __repr__(self) -> str:
+        return f"<Job id={self.id} status={self.status}>"
+
+    @property
+    def sid(self) -> str:
+        return self.session.sid
+
+    @property
+    def done(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def cancel(self) -> bool:
+        self._stop.set()
+        return True
+
+    def run(self) -> None:
+        if self._stop.is_set() or self.session.closed:
+            self.status, self.finished = CANCELLED, time.time()
+            return
+        controller = self.session.controller
+        with self.session.lock:
+            if self.session.closed:
+                # the session left the pool while the job was queued
+                self.status, self.finished = CANCELLED, time.time()
+                return
+            self.status, self.started = RUNNING, time.time()
+            self._instructions, self._cycles = controller.instructions, controller.cycles
+            try:
+                finished = controller.run(stop=self._stop, limit=self.limit)
+                if finished:
+                    self.status, self.reason = DONE, "end"
+                elif self._stop.is_set():
+                    self.status, self.reason = CANCELLED, "stopped"
+                else:
+                    self.status, self.reason = DONE, "limit"
+            except Exception as e:
+                print(e)
+                self.status, self.error = FAILED, f"Exception raised {e}"
+            self.finished = time.time()
+            self._instructions = controller.instructions - self._instructions
+            self._cycles = controller.cycles - self._cycles
+        return
+
+    def progress(self) -> dict:
+        """Instructions and cycles executed by the job so far"""
+        if self.status == RUNNING:
+            # read without the session lock; the counters are only ever incremented
+            controller = self.session.controller
+            return {
+                "instructions": controller.instructions - self._instructions,
+                "cycles": controller.cycles - self._cycles,
+            }
+        return {"instructions": self._instructions, "cycles": self._cycles}
+
+    def todict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "reason": self.reason,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            **self.progress(),
+        }
+
+    pass
+
+
+class JobManager:
+    """
+    Runs the controllers of the sessions in a bounded thread pool
+
+    max_workers: no. of jobs running at once
+    max_pending: cap on the queued and running jobs; `submit` raises `JobLimitExceeded` above it
+    max_finished: no. of finished jobs kept for polling
+    max_instructions: instruction budget of every job; `None` runs until the program ends
+    """
+
+    def __init__(
+        self, max_workers: int = 2, max_pending: int = 16, max_finished: int = 256, max_instructions: int = None
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.max_instructions = max_instructions
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sim8051-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        return
+
+    def __repr__(self) -> str:
+        return f"<JobManager jobs={len(self._jobs)} max_workers={self.max_workers}>"
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def _prune(self) -> None:
+        finished = [x.id for x in self._jobs.values() if x.done]
+        for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+        return
+
+    def active(self, sid: str) -> Job:
+        """Queued or running job of the session `sid`"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.sid == sid and not job.done:
+                    return job
+        return None
+
+    def submit(self, session) -> Job:
+        """
+        Queue a run of the session's controller; a session has at most one active job
+        """
+        with self._lock:
+            self._prune()
+            if any(x.sid == session.sid and not x.done for x in self._jobs.values()):
+                raise JobLimitExceeded("session already has an active job")
+            if sum(not x.done for x in self._jobs.values()) >= self.max_pending:
+                raise JobLimitExceeded(f"too many pending jobs; max {self.max_pending}")
+            job = Job(session, limit=self.max_instructions)
+            self._jobs[job.id] = job
+        self._executor.submit(job.run)
+        return job
+
+    def get(self, job_id: str, sid: str = None) -> Job:
+        """Job `job_id`; `None` if unknown or if it belongs to another session than `sid`"""
+        job = self._jobs.get(job_id, None)
+        if job is None or (sid is not None and job.sid != sid):
+            return None
+        return job
+
+    def cancel(self, job_id: str, sid: str = None) -> Job:
+        job = self.get(job_id, sid)
+        if job:
+            job.cancel()
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [x.status for x in self._jobs.values()]
+        return {
+            "jobs": len(statuses),
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            **{status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)},
+        }
+
+    def shutdown(self, cancel: bool = True) -> None:
+        if cancel:
+            for job in list(self._jobs.values()):
+                job.cancel()
+        self._executor.shutdown(wait=True)
+        return
+
+    pass
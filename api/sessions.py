@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+
+from core.controller import Controller
+from core.pool import ControllerPool
+from core.state import StateTracker
+
+
+class Session:
+    def __init__(self, sid: str, controller: Controller) -> None:
+        self.sid = sid
+        self.controller = controller
+        self.state = StateTracker(controller)
+        self.lock = threading.RLock()
+        self.created = time.monotonic()
+        self.last_access = self.created
+        # set once the session left the pool; its controller may be reused
+        self.closed = False
+        return
+
+    def __repr__(self) -> str:
+        return f"<Session sid={self.sid} idle={time.monotonic() - self.last_access:.1f}s>"
+
+    pass
+
+
+class SessionStore:
+    """
+    Local store for the evicted sessions; one `Controller.snapshot` file per session
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        return
+
+    def _file(self, sid: str) -> str:
+        if not re.fullmatch(r"[0-9a-zA-Z_-]+", sid):
+            raise ValueError(f"invalid session id `{sid}`")
+        return os.path.join(self.path, f"{sid}.session")
+
+    @staticmethod
+    def dump(controller: Controller) -> bytes:
+        return controller.snapshot()
+
+    @staticmethod
+    def load(data: bytes, controller: Controller) -> Controller:
+        controller.restore(data)
+        return controller
+
+    def save(self, sid: str, controller: Controller) -> bool:
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(self.dump(controller))
+        os.replace(tmp, self._file(sid))
+        return True
+
+    def restore(self, sid: str, controller: Controller) -> Controller:
+        try:
+            with open(self._file(sid), "rb") as f:
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        os.remove(self._file(sid))
+        return self.load(data, controller)
+
+    pass
+
+
+class SessionPool:
+    """
+    Session-keyed registry of controllers with LRU and idle-timeout eviction
+
+    max_sessions: max. no. of live sessions
+    idle_timeout: seconds after which an idle session is evicted; `None` disables it
+    max_memory: cap on the summed memory estimate of the live sessions in bytes; `None` disables it
+    store: `SessionStore` for the evicted sessions; they are restored when the session returns
+    controllers: `ControllerPool` the controllers are taken from and returned to; otherwise they're
+        built with `factory`
+    """
+
+    def __init__(
+        self,
+        factory=Controller,
+        max_sessions: int = 64,
+        idle_timeout: float = 1800,
+        max_memory: int = None,
+        store: SessionStore = None,
+        controllers: ControllerPool = None,
+    ) -> None:
+        self.factory = controllers.acquire if controllers is not None else factory
+        self.controllers = controllers
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_memory = max_memory
+        self.store = store
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+        self.metrics = {
+            "created": 0,
+            "restored": 0,
+            "evicted": 0,
+            "expired": 0,
+            "hits": 0,
+            # evicted while busy; saved once the session lock is released
+            "deferred": 0,
+        }
+        return
+
+    def __repr__(self) -> str:
+        return f"<SessionPool sessions={len(self)} max_sessions={self.max_sessions}>"
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._sessions
+
+    @staticmethod
+    def memory_estimate(controller: Controller) -> int:
+        """Rough estimate of the bytes held by the controller"""
+        memory_ram = controller.op.memory_ram
+        memory_rom = controller.op.memory_rom
+        estimate = sum(len(x.buffer) for x in controller.op.super_memory.spaces.values())
+        # materialized `MemoryCell` views
+        estimate += (len(memory_ram) + len(memory_rom)) * (sys.getsizeof(object()) + 200)
+        estimate += sum(sys.getsizeof(x) + sys.getsizeof(x[2]) + sys.getsizeof(x[3]) for x in controller.callstack)
+        estimate += sum(len(key) + len(val) for key, val in controller.op._assembler.items())
+        return estimate
+
+    def _close(self, session: Session) -> None:
+        # a job running on the controller holds the lock; the controller isn't recycled then
+        if not session.lock.acquire(blocking=False):
+            session.closed = True
+            return
+        try:
+            session.closed = True
+            if self.controllers is not None:
+                self.controllers.release(session.controller)
+        finally:
+            session.lock.release()
+        return
+
+    def _evict(self, sid: str, reason: str = "evicted") -> None:
+        session = self._sessions.pop(sid)
+        self.metrics[reason] += 1
+        if self.store:
+            # a job or a run holds the session lock; it's never waited for under the pool lock
+            if not session.lock.acquire(blocking=False):
+                session.closed = True
+                self.metrics["deferred"] += 1
+                threading.Thread(target=self._save_later, args=(sid, session), daemon=True).start()
+                return
+            try:
+                self.store.save(sid, session.controller)
+            finally:
+                session.lock.release()
+        self._close(session)
+        return
+
+    def _save_later(self, sid: str, session: Session) -> None:
+        """Save a session evicted while busy, once its run is over"""
+        with session.lock:
+            self.store.save(sid, session.controller)
+        self._close(session)
+        return
+
+    def _sweep(self) -> None:
+        if self.idle_timeout is not None:
+            deadline = time.monotonic() - self.idle_timeout
+            while self._sessions:
+                sid, session = next(iter(self._sessions.items()))
+                if session.last_access > deadline:
+                    break
+                self._evict(sid, reason="expired")
+        while len(self._sessions) > self.max_sessions:
+            self._evict(next(iter(self._sessions)))
+        if self.max_memory is not None:
+            while len(self._sessions) > 1 and self.memory_usage() > self.max_memory:
+                self._evict(next(iter(self._sessions)))
+        return
+
+    def get(self, sid: str) -> Session:
+        """
+        Session `sid`; restored from the store or created if it's not live
+        """
+        with self._lock:
+            session = self._sessions.get(sid, None)
+            if session:
+                self.metrics["hits"] += 1
+                self._sessions.move_to_end(sid)
+            else:
+                controller = self.factory()
+                if self.store and self.store.restore(sid, controller):
+                    self.metrics["restored"] += 1
+                else:
+                    self.metrics["created"] += 1
+                session = self._sessions[sid] = Session(sid, controller)
+            session.last_access = time.monotonic()
+            self._sweep()
+            return session
+
+    def new(self, sid: str) -> Session:
+        """Replace the session `sid` with a fresh controller"""
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+            if session:
+                self._close(session)
+            self.metrics["created"] += 1
+            session = self._sessions[sid] = Session(sid, self.factory())
+            self._sweep()
+            return session
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            return sum(self.memory_estimate(x.controller) for x in self._sessions.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "memory": self.memory_usage(),
+                "max_memory": self.max_memory,
+                **self.metrics,
+            }
+
+    pass
@@ -1,3 +1,8 @@
+// version of the controller state shown; the server returns the changes since it
+var stateVersion = "";
+// background job running the program
+var runningJob = null;
+
 window.onload = function () {
     console.log("load");
     // reload code contents
@@ -5,6 +10,7 @@ window.onload = function () {
 
     document.getElementById("run").disabled = true;
     document.getElementById("step").disabled = true;
+    MountMemoryGrids()
 
     document.getElementById("assemble").addEventListener("click", function () {
         console.log("assemble")
@@ -19,6 +25,7 @@ window.onload = function () {
                 document.getElementById("run").disabled = false
                 document.getElementById("step").disabled = false
                 document.getElementById("memory-container").innerHTML = response;
+                MountMemoryGrids()
                 ProgressSideBar(_code, 0)
             }
         };
@@ -39,18 +46,25 @@ window.onload = function () {
     document.getElementById("run").addEventListener("click", function () {
         console.log("run");
         const request = new XMLHttpRequest();
-        request.open("POST", `/run`);
+        request.open("POST", `/run?async=1&since=${stateVersion}`);
         request.onload = () => {
             const response = request.responseText;
-            if (request.status != 200) {
+            if (request.status != 202) {
                 alert(response);
             }
             else {
-                const _resp_dict = JSON.parse(response)
-                document.getElementById("registers-flags").innerHTML = _resp_dict["registers_flags"];
-                document.getElementById("memory-container").innerHTML = _resp_dict["memory"];
-                document.getElementById("assembler-container").innerHTML = _resp_dict["assembler"];
-                ProgressSideBar(_code, _code.split("\n").filter(Boolean).length)
+                runningJob = JSON.parse(response)["id"]
+                document.getElementById("run").disabled = true
+                document.getElementById("step").disabled = true
+                const done = () => {
+                    ProgressSideBar(_code, _code.split("\n").filter(Boolean).length)
+                }
+                if (window.EventSource) {
+                    StreamJob(runningJob, done)
+                }
+                else {
+                    PollJob(runningJob, done)
+                }
             }
         };
         var _code = document.getElementById("code").value.trim();
@@ -60,7 +74,7 @@ window.onload = function () {
     document.getElementById("step").addEventListener("click", function () {
         console.log("step");
         const request = new XMLHttpRequest();
-        request.open("POST", `/run-once`);
+        request.open("POST", `/run-once?since=${stateVersion}`);
         request.onload = () => {
             const response = request.responseText;
             if (request.status != 200) {
@@ -70,9 +84,7 @@ window.onload = function () {
             else {
                 const _resp_dict = JSON.parse(response)
                 index = _resp_dict["index"];
-                document.getElementById("registers-flags").innerHTML = _resp_dict["registers_flags"];
-                document.getElementById("memory-container").innerHTML = _resp_dict["memory"];
-                document.getElementById("assembler-container").innerHTML = _resp_dict["assembler"];
+                PatchState(_resp_dict)
                 document.getElementById("code").value = _code;
                 ProgressSideBar(_code, index)
             }
@@ -83,18 +95,21 @@ window.onload = function () {
 
     document.getElementById("reset").addEventListener("click", function () {
         console.log("reset")
+        if (runningJob) {
+            const cancel = new XMLHttpRequest();
+            cancel.open("DELETE", `/jobs/${runningJob}`, false);
+            cancel.send();
+            runningJob = null
+        }
         const request = new XMLHttpRequest();
-        request.open("POST", `/reset`);
+        request.open("POST", `/reset?since=${stateVersion}`);
         request.onload = () => {
             const response = request.responseText;
             if (request.status != 200) {
                 alert(response)
             }
             else {
-                const _resp_dict = JSON.parse(response)
-                document.getElementById("registers-flags").innerHTML = _resp_dict["registers_flags"];
-                document.getElementById("memory-container").innerHTML = _resp_dict["memory"];
-                document.getElementById("assembler-container").innerHTML = _resp_dict["assembler"];
+                PatchState(JSON.parse(response))
                 document.getElementById("run").disabled = true
                 document.getElementById("step").disabled = true
                 document.getElementById("track").textContent = ""
@@ -113,7 +128,7 @@ window.onload = function () {
                 alert("invalid")
             }
             const request = new XMLHttpRequest();
-            request.open("POST", `/memory-edit`);
+            request.open("POST", `/memory-edit?since=${stateVersion}`);
             request.onload = () => {
                 const response = request.responseText;
                 if (request.status != 200) {
@@ -122,9 +137,7 @@ window.onload = function () {
                 else {
                     const _resp_dict = JSON.parse(response)
                     index = _resp_dict["index"];
-                    document.getElementById("registers-flags").innerHTML = _resp_dict["registers_flags"];
-                    document.getElementById("memory-container").innerHTML = _resp_dict["memory"];
-                    document.getElementById("assembler-container").innerHTML = _resp_dict["assembler"];
+                    PatchState(_resp_dict)
                 }
             }
             request.send(JSON.stringify(_mem_edit));
@@ -136,6 +149,237 @@ window.onload = function () {
     }
 }
 
+// frames per second of the live view while a job runs
+const STREAM_FPS = 30;
+
+function FinishJob(status, done) {
+    runningJob = null
+    document.getElementById("run").disabled = !status["ready"]
+    document.getElementById("step").disabled = !status["ready"]
+    if (status["status"] == "failed") {
+        alert(status["error"])
+    }
+    else if (status["status"] == "done") {
+        done()
+    }
+}
+function StreamJob(job, done) {
+    // live view of the running job; every event carries the changes since the previous one
+    const source = new EventSource(`/jobs/${job}/stream?fps=${STREAM_FPS}&since=${stateVersion}`);
+    var ready = false
+    source.addEventListener("state", event => {
+        const _resp_dict = JSON.parse(event.data)
+        document.getElementById("track").title = `${_resp_dict["job"]["instructions"]} instructions, ${_resp_dict["job"]["cycles"]} cycles`
+        PatchState(_resp_dict["state"])
+        ready = _resp_dict["state"]["ready"]
+    });
+    source.addEventListener("done", event => {
+        source.close()
+        FinishJob({...JSON.parse(event.data), "ready": ready}, done)
+    });
+    source.onerror = () => {
+        source.close()
+        PollJob(job, done)
+    };
+}
+function PollJob(job, done) {
+    // poll the job till it's finished; the final state is patched in
+    const request = new XMLHttpRequest();
+    request.open("GET", `/jobs/${job}?since=${stateVersion}`);
+    request.onload = () => {
+        const response = request.responseText;
+        if (request.status != 200) {
+            runningJob = null
+            alert(response)
+            return
+        }
+        const _resp_dict = JSON.parse(response)
+        document.getElementById("track").title = `${_resp_dict["instructions"]} instructions, ${_resp_dict["cycles"]} cycles`
+        if (!_resp_dict["state"]) {
+            setTimeout(() => PollJob(job, done), 250)
+            return
+        }
+        PatchState(_resp_dict["state"])
+        FinishJob({..._resp_dict, "ready": _resp_dict["state"]["ready"]}, done)
+    };
+    request.send();
+}
+function HexByte(value) {
+    return value.toString(16).padStart(2, "0")
+}
+function PatchCell(id, value) {
+    var cell = document.getElementById(id);
+    if (cell) {
+        cell.textContent = value
+    }
+}
+function PatchState(state) {
+    // apply the changes since `stateVersion`; cells outside the rendered grid are skipped
+    stateVersion = state["version"]
+    for (const [key, value] of Object.entries(state["registers"])) {
+        PatchCell("register-" + key, value)
+    }
+    for (const [key, value] of Object.entries(state["flags"])) {
+        var flag = document.getElementById(key);
+        if (flag) {
+            flag.checked = value
+        }
+    }
+    for (const [addr, value] of state["ram"]) {
+        PatchCell("ram-" + addr, HexByte(value))
+        if (addr < 32) {
+            PatchCell("gpr-" + addr, HexByte(value))
+        }
+    }
+    const romGrid = memoryGrids["rom"]
+    for (const [addr, value] of state["rom"]) {
+        if (romGrid) {
+            romGrid.Patch(addr, value)
+        }
+        else {
+            PatchCell("rom-" + addr, HexByte(value))
+        }
+    }
+    if (romGrid) {
+        romGrid.Refresh(STATE_ROM_WINDOW)
+    }
+    if (state["assembler"] !== null) {
+        RenderAssembler(state["assembler"])
+    }
+}
+// virtualized memory grids; only the rows in view are rendered, their bytes fetched from `/memory`
+const GRID_ROW_HEIGHT = 18;
+// bytes per `/memory` request
+const GRID_BLOCK = 1024;
+// rows rendered above and below the view
+const GRID_OVERSCAN = 4;
+// bytes of the ROM carried by the state deltas; the rows in view past it are refetched
+const STATE_ROM_WINDOW = 256;
+var memoryGrids = {};
+
+function MountMemoryGrids() {
+    memoryGrids = {}
+    document.querySelectorAll(".memory-grid").forEach(element => {
+        memoryGrids[element.dataset.space] = new MemoryGrid(element)
+    });
+}
+class MemoryGrid {
+    constructor(element) {
+        this.space = element.dataset.space
+        this.viewport = element.querySelector(".memory-grid-viewport")
+        this.spacer = element.querySelector(".memory-grid-spacer")
+        this.table = this.spacer.querySelector("table")
+        // size of the space; known after the first response
+        this.size = 0
+        // start address -> `Uint8Array` of `GRID_BLOCK` bytes
+        this.blocks = new Map()
+        this.pending = new Set()
+        this.first = this.last = -1
+        this.viewport.addEventListener("scroll", () => this.Render())
+        this.Fetch(0)
+    }
+    Fetch(start) {
+        if (this.pending.has(start)) {
+            return
+        }
+        this.pending.add(start)
+        const request = new XMLHttpRequest();
+        request.open("GET", `/memory?space=${this.space}&start=${start}&len=${GRID_BLOCK}&format=binary`);
+        request.responseType = "arraybuffer"
+        request.onload = () => {
+            this.pending.delete(start)
+            if (request.status != 200) {
+                return
+            }
+            this.size = parseInt(request.getResponseHeader("X-Memory-Size"))
+            this.spacer.style.height = `${Math.ceil(this.size / 16) * GRID_ROW_HEIGHT}px`
+            this.blocks.set(start, new Uint8Array(request.response))
+            this.first = this.last = -1
+            this.Render()
+        };
+        request.onerror = () => this.pending.delete(start)
+        request.send();
+    }
+    Render() {
+        if (!this.size) {
+            return
+        }
+        const top = this.viewport.scrollTop
+        const first = Math.max(0, Math.floor(top / GRID_ROW_HEIGHT) - GRID_OVERSCAN)
+        const last = Math.min(
+            Math.ceil(this.size / 16),
+            Math.ceil((top + this.viewport.clientHeight) / GRID_ROW_HEIGHT) + GRID_OVERSCAN
+        )
+        if (first == this.first && last == this.last) {
+            return
+        }
+        this.first = first
+        this.last = last
+        for (let start = first * 16 - (first * 16) % GRID_BLOCK; start < last * 16; start += GRID_BLOCK) {
+            if (!this.blocks.has(start)) {
+                this.Fetch(start)
+            }
+        }
+        const tbody = document.createElement("tbody");
+        for (let row = first; row < last; row++) {
+            const tr = tbody.insertRow();
+            const th = document.createElement("th");
+            th.scope = "row"
+            th.textContent = "0x" + row.toString(16).padStart(3, "0")
+            tr.append(th)
+            const block = this.blocks.get(row * 16 - (row * 16) % GRID_BLOCK)
+            for (let addr = row * 16; addr < row * 16 + 16; addr++) {
+                const cell = tr.insertCell();
+                cell.id = `${this.space}-${addr}`
+                cell.textContent = block ? HexByte(block[addr % GRID_BLOCK]) : ""
+            }
+        }
+        this.table.tBodies[0].replaceWith(tbody)
+        this.table.style.top = `${first * GRID_ROW_HEIGHT}px`
+    }
+    Patch(addr, value) {
+        const block = this.blocks.get(addr - addr % GRID_BLOCK)
+        if (block) {
+            block[addr % GRID_BLOCK] = value
+        }
+        PatchCell(`${this.space}-${addr}`, HexByte(value))
+    }
+    Refresh(from) {
+        // the blocks past `from` are stale; the ones in view are refetched, the others dropped
+        for (const start of [...this.blocks.keys()]) {
+            if (start + GRID_BLOCK <= from) {
+                continue
+            }
+            if (start < this.last * 16 && start + GRID_BLOCK > this.first * 16) {
+                this.Fetch(start)
+            }
+            else {
+                this.blocks.delete(start)
+            }
+        }
+    }
+}
+function RenderAssembler(assembler) {
+    var container = document.getElementById("assembler-container");
+    container.textContent = ""
+    if (!Object.keys(assembler).length) {
+        return
+    }
+    var div = document.createElement("div");
+    div.className = "assembler rounded p-1 px-4"
+    var title = document.createElement("h5");
+    title.textContent = "Assembler Output"
+    var table = document.createElement("table");
+    table.className = "table table-striped table-hover table-dark"
+    var tbody = table.createTBody();
+    for (const [key, value] of Object.entries(assembler)) {
+        var row = tbody.insertRow();
+        row.insertCell().textContent = key
+        row.insertCell().textContent = value
+    }
+    div.append(title, table)
+    container.append(div)
+}
 function GetFlags() {
     var flags_dict = {}
     document.querySelectorAll(".flag-input").forEach(element => {
@@ -0,0 +1,48 @@
+import json
+import time
+
+MIN_FPS = 1
+MAX_FPS = 60
+HEARTBEAT = 15
+
+
+def sse(event: str, data: dict) -> str:
+    """Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def job_stream(job, fps: float = 30, since: int = None):
+    """
+    SSE messages with the state of the job's session at `fps` frames per second while it runs
+
+    The engine isn't throttled; every frame carries the delta since the previous frame, which
+    coalesces the states in between. Frames without changes are skipped, apart from a comment
+    every `HEARTBEAT` seconds. The last message is a `done` event with the job's final status.
+    """
+    fps = min(max(fps, MIN_FPS), MAX_FPS)
+    interval = 1 / fps
+    tracker = job.session.state
+    version = since
+    last_sent = 0
+    while True:
+        frame = time.monotonic()
+        done = job.done
+        if done:
+            # the final state is read under the session lock, once the job released it
+            with job.session.lock:
+                state = tracker.delta(version)
+        else:
+            # the job holds the session lock; the frame is a best-effort view of the running engine,
+            # `Memory` guards the write log the checkpoints of the delta touch
+            state = tracker.delta(version)
+        if state["version"] != version:
+            version = state["version"]
+            last_sent = frame
+            yield sse("state", {"job": job.todict(), "state": state})
+        elif frame - last_sent > HEARTBEAT:
+            last_sent = frame
+            yield ": heartbeat\n\n"
+        if done:
+            yield sse("done", job.todict())
+            return
+        time.sleep(max(0, interval - (time.monotonic() - frame)))
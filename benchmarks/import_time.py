@@ -0,0 +1,72 @@
+"""
+Cold import time of the WSGI app
+
+Imports the module in fresh interpreters with `python -X importtime`, reports the median
+cumulative import time and the modules with the largest self time, and exits non-zero above
+the target.
+
+    python benchmarks/import_time.py [--module api.index] [--runs 5] [--target-ms 100]
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> dict:
+    """{module: (self us, cumulative us)} of a cold `import module`"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.pop("SIM8051_TRACE", None)
+    # deploys ship the bytecode; without it the timing is mostly `compile`
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self, cumulative, name = line[len("import time:") :].split("|")
+        if not _self.strip().isdigit():
+            continue  # header
+        times[name.strip()] = (int(_self), int(cumulative))
+    return times
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="api.index")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=100)
+    parser.add_argument("--top", type=int, default=10, help="no. of modules listed by self time")
+    args = parser.parse_args(argv)
+
+    import_times(args.module)  # writes the bytecode
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    total = statistics.median(x[args.module][1] for x in runs) / 1000
+    first_party = statistics.median(
+        sum(_self for name, (_self, _) in x.items() if name.split(".")[0] in ("api", "core")) for x in runs
+    )
+
+    print(f"{args.module}: {total:.1f} ms (median of {args.runs}); target {args.target_ms:.0f} ms")
+    print(f"api/core modules (self): {first_party / 1000:.1f} ms")
+    print("largest self time:")
+    last = runs[-1]
+    for name, (_self, cumulative) in sorted(last.items(), key=lambda x: -x[1][0])[: args.top]:
+        print(f"  {_self / 1000:8.1f} ms {cumulative / 1000:8.1f} ms  {name}")
+    if "rich" in last:
+        print("note: `rich` is imported; it should only be with SIM8051_TRACE set")
+    return 0 if total <= args.target_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
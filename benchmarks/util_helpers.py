@@ -0,0 +1,93 @@
+"""
+Per call cost of the byte helpers; the string based implementations they replaced against the
+integer-first ones in `core.util`
+
+    python benchmarks/util_helpers.py [--number 100000]
+"""
+
+import os
+import sys
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import util  # noqa: E402
+
+
+def legacy_decompose_byte(data, nibble=False):
+    _bytes = int(len(util.sanatize_hex(data)) / 2)
+    mem_size = 8
+    if nibble:
+        mem_size = 4
+    binary_data = format(int(str(data), 16), f"0{_bytes*8}b")
+    return [
+        format(int(binary_data[mem_size * x : mem_size * (x + 1)], 2), f"#0{int(mem_size/2)}x")
+        for x in range(0, int(len(binary_data) / mem_size))
+    ]
+
+
+def legacy_construct_hex(hex1, hex2, _bytes=2):
+    bin1 = format(int(str(hex1), 16), f"0{_bytes * 4}b")
+    bin2 = format(int(str(hex2), 16), f"0{_bytes * 4}b")
+    bin_total = "".join(["0b", bin1, bin2])
+    return f'0x{format(int(bin_total, 2), f"0{_bytes * 2}x")}'
+
+
+def legacy_twos_complement(num, _base=16):
+    _bytes = int(len(format(int(num, _base), "x")) / 2) or 1
+    return format((1 << 8 * _bytes) - int(num, _base), f"#0{2 + _bytes*2}x")
+
+
+def legacy_get_byte_sequence(start, size, _bytes=1) -> list:
+    _ret_array = []
+    _hex_val = start
+    for _ in range(0, size):
+        _ret_array.append(_hex_val)
+        _hex_val = format(int(_hex_val, 16) + 1, f"#0{_bytes * 2 + 2}x")
+    return _ret_array
+
+
+CASES = [
+    ("decompose_byte(0x12ee)", lambda: legacy_decompose_byte("0x12ee"), lambda: util.decompose_byte("0x12ee")),
+    (
+        "decompose_byte(0xae, nibble)",
+        lambda: legacy_decompose_byte("0xae", nibble=True),
+        lambda: util.decompose_byte("0xae", nibble=True),
+    ),
+    (
+        "construct_hex(0x12, 0xee)",
+        lambda: legacy_construct_hex("0x12", "0xee"),
+        lambda: util.construct_hex("0x12", "0xee"),
+    ),
+    ("twos_complement(0x2e)", lambda: legacy_twos_complement("0x2e"), lambda: util.twos_complement("0x2e")),
+    (
+        "get_byte_sequence(0x08, 8)",
+        lambda: legacy_get_byte_sequence("0x08", 8),
+        lambda: util.get_byte_sequence("0x08", 8),
+    ),
+    ("format 8-bit", lambda: format(0xAE, "#04x"), lambda: util.hex8(0xAE)),
+    ("format 16-bit", lambda: format(0x12EE, "#06x"), lambda: util.hex16(0x12EE)),
+    ("join bytes", lambda: int(legacy_construct_hex("0x12", "0xee"), 16), lambda: util.join_word(0x12, 0xEE)),
+    ("split word", lambda: legacy_decompose_byte("0x12ee"), lambda: util.split_word(0x12EE)),
+    ("negate", lambda: int(legacy_twos_complement("0x2e"), 16), lambda: util.negate(0x2E)),
+]
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="per call cost of the byte helpers")
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    util.hex16(0)  # builds the 16-bit table
+    print(f"{'helper':32} {'old ns':>8} {'new ns':>8} {'speedup':>8}")
+    for name, old, new in CASES:
+        assert name.startswith(("format", "join", "split", "negate")) or old() == new(), name
+        old_ns = min(timeit.repeat(old, number=args.number, repeat=3)) / args.number * 1e9
+        new_ns = min(timeit.repeat(new, number=args.number, repeat=3)) / args.number * 1e9
+        print(f"{name:32} {old_ns:8.0f} {new_ns:8.0f} {old_ns / new_ns:7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import os
+import re
+import json
+import struct
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from core import snapshot
+
+# disk entries; magic, layout version, `core.snapshot.VERSION` of the program section, section size
+_DISK_MAGIC = b"S51A"
+_DISK_VERSION = 1
+_DISK_HEADER = struct.Struct("<4sBBI")
+
+
+class AssembledProgram:
+    """
+    Artifact of a single assemble; holds everything needed to rebuild the controller state
+    without parsing the source again.
+
+    program: list of `(opcode, args, kwargs)` callstack entries
+    instructions: (address, `OpcodeInfo`, operand values, command) per instruction
+    labels: label table
+    memory_rom/memory_ram: memory images after assembling
+    """
+
+    def __init__(
+        self,
+        key: str = None,
+        program: list = None,
+        instructions: list = None,
+        labels: dict = None,
+        memory_rom: dict = None,
+        memory_ram: dict = None,
+    ) -> None:
+        self.key = key
+        self.program = program or []
+        self.instructions = instructions or []
+        self.labels = labels or {}
+        self.memory_rom = memory_rom or {}
+        self.memory_ram = memory_ram or {}
+        return
+
+    def __repr__(self) -> str:
+        return f"<AssembledProgram key={self.key} instructions={len(self.program)} labels={len(self.labels)}>"
+
+    pass
+
+
+class AssemblyCache:
+    """
+    Content-addressed LRU cache of `AssembledProgram` artifacts.
+
+    The key is the hash of the normalised source and the initial flags; with `path` set, the
+    artifacts are also written to disk so they survive worker restarts, as a versioned header,
+    the binary program section of `core.snapshot` and the labels and memory deltas in JSON.
+    Nothing is unpickled; an entry of another version or a damaged one is a miss.
+    """
+
+    def __init__(self, maxsize: int = 128, path: str = None) -> None:
+        self.maxsize = maxsize
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+        return
+
+    def __repr__(self) -> str:
+        return f"<AssemblyCache size={len(self)} maxsize={self.maxsize} hits={self.hits} misses={self.misses}>"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    @staticmethod
+    def normalise(commands: str) -> str:
+        """Strip the lines, collapse the whitespace and drop empty lines"""
+        lines = [re.sub(r"\s+", " ", line.strip()) for line in commands.split("\n")]
+        return "\n".join([line for line in lines if line])
+
+    @classmethod
+    def key(cls, commands: str, flags: dict = None) -> str:
+        digest = hashlib.sha256(cls.normalise(commands).encode())
+        # flags are hashed in order; `ProgramStatusWord.set_flags` depends on it
+        digest.update(json.dumps(flags or {}).encode())
+        return digest.hexdigest()
+
+    def _disk_file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.s51a")
+
+    def _disk_get(self, key: str) -> AssembledProgram:
+        try:
+            with open(self._disk_file(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            magic, version, section_version, size = _DISK_HEADER.unpack_from(data)
+            if (magic, version, section_version) != (_DISK_MAGIC, _DISK_VERSION, snapshot.VERSION):
+                return None
+            program, instructions, offset = snapshot.decode_program(data, _DISK_HEADER.size)
+            if offset != _DISK_HEADER.size + size:
+                return None
+            meta = json.loads(data[offset:].decode())
+            return AssembledProgram(key, program, instructions, meta["labels"], meta["memory_rom"], meta["memory_ram"])
+        except Exception:
+            # damaged; the next assemble of the source writes it again
+            return None
+
+    def _disk_put(self, key: str, program: AssembledProgram) -> None:
+        section = snapshot.encode_entries(program.program, program.instructions)
+        meta = {"labels": program.labels, "memory_rom": program.memory_rom, "memory_ram": program.memory_ram}
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(_DISK_HEADER.pack(_DISK_MAGIC, _DISK_VERSION, snapshot.VERSION, len(section)))
+            f.write(section)
+            f.write(json.dumps(meta).encode())
+        os.replace(tmp, self._disk_file(key))
+        return
+
+    def get(self, key: str) -> AssembledProgram:
+        with self._lock:
+            program = self._entries.get(key)
+            if program:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return program
+        if self.path:
+            program = self._disk_get(key)
+            if program:
+                self._insert(key, program)
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return program
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _insert(self, key: str, program: AssembledProgram) -> None:
+        with self._lock:
+            self._entries[key] = program
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return
+
+    def put(self, key: str, program: AssembledProgram) -> bool:
+        self._insert(key, program)
+        if self.path:
+            self._disk_put(key, program)
+        return True
+
+    def clear(self) -> bool:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def assemble(self, controller, commands: str, flags: dict = None) -> bool:
+        """
+        Assemble `commands` into `controller`, cloning a cached artifact when possible.
+
+        Parsing depends on the program already in the controller, hence only a controller
+        with an empty callstack is served from the cache.
+        """
+        if controller.callstack:
+            if flags:
+                controller.set_flags(flags)
+            return controller.parse_all(commands)
+
+        key = self.key(commands, flags)
+        program = self.get(key)
+        if program:
+            controller.load_program(program)
+            if flags:
+                # the RAM delta only carries the PSW if it differed from the first assembler's
+                controller.set_flags(flags)
+            return True
+
+        baseline = controller.memory_image()
+        if flags:
+            controller.set_flags(flags)
+        controller.parse_all(commands)
+        self.put(key, controller.export_program(key=key, baseline=baseline))
+        return True
+
+    pass
@@ -0,0 +1,415 @@
+"""
+Control-flow graph of an assembled program
+
+The blocks split the callstack at the jump targets and after every instruction of
+`Operations._jump_instructions`. A call ends its block; the call target is an edge of `calls`
+and the instruction after the call is the successor, as the routine returns there. `RET`/`RETI`,
+an indirect `JMP` and the end of the program leave the block without successors.
+
+Loops are found with a single depth first search that tags every block with the header of its
+innermost loop, reducible or not (Wei et al., "A New Algorithm for Identifying Loops in
+Decompilation"). The whole build is linear in the no. of instructions, so the graph is built on
+every assemble and cached by the program hash; the graphs don't refer to the controller and are
+shared between the controllers running the same program.
+"""
+
+import threading
+from collections import OrderedDict
+
+from core.util import tohex
+
+CACHE_SIZE = 64
+
+_CALLS = frozenset(("LCALL", "ACALL"))
+_RETURNS = frozenset(("RET", "RETI"))
+_UNCONDITIONAL = frozenset(("SJMP", "AJMP", "LJMP", "JMP"))
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+class BasicBlock:
+    """
+    Instructions `start` to `end` (exclusive) of the callstack
+
+    address: address of the first instruction; `size` no. of bytes and `cycles` machine cycles
+    successors: ids of the blocks the control goes to; `calls` ids of the called routines
+    terminator: opcode of the jump ending the block; `None` if it falls through
+    loop: header of the innermost loop the block is in; `depth` the loop nesting depth
+    """
+
+    __slots__ = (
+        "id",
+        "start",
+        "end",
+        "label",
+        "address",
+        "size",
+        "cycles",
+        "successors",
+        "calls",
+        "terminator",
+        "loop",
+        "depth",
+        "reachable",
+    )
+
+    def __init__(self, id: int, start: int, end: int, label: str = None) -> None:
+        self.id = id
+        self.start = start
+        self.end = end
+        self.label = label
+        self.address = 0
+        self.size = 0
+        self.cycles = 0
+        self.successors = []
+        self.calls = []
+        self.terminator = None
+        self.loop = None
+        self.depth = 0
+        self.reachable = False
+        return
+
+    def __repr__(self) -> str:
+        return f"<BasicBlock {self.id} {self.address:#06x} instructions={self.end - self.start}>"
+
+    def todict(self) -> dict:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "address": format(self.address, "#06x"),
+            "instructions": self.end - self.start,
+            "bytes": self.size,
+            "cycles": self.cycles,
+            "successors": self.successors,
+            "calls": self.calls,
+            "loop": self.loop,
+            "depth": self.depth,
+            "reachable": self.reachable,
+        }
+
+    pass
+
+
+class Loop:
+    """
+    Loop at the block `header`; `blocks` are the blocks it's the innermost loop of, the nested
+    loops are in `children`
+    """
+
+    def __init__(self, header: int, parent: int = None, irreducible: bool = False) -> None:
+        self.header = header
+        self.parent = parent
+        self.irreducible = irreducible
+        self.depth = 1
+        self.blocks = []
+        self.children = []
+        return
+
+    def __repr__(self) -> str:
+        return f"<Loop header={self.header} depth={self.depth} blocks={len(self.blocks)}>"
+
+    def todict(self) -> dict:
+        return {
+            "header": self.header,
+            "parent": self.parent,
+            "depth": self.depth,
+            "irreducible": self.irreducible,
+            "blocks": self.blocks,
+            "children": self.children,
+        }
+
+    pass
+
+
+class ControlFlowGraph:
+    """
+    controller: `Controller` with the assembled program; only read while building
+    """
+
+    def __init__(self, controller) -> None:
+        self.key = controller._program_hash()
+        self.blocks = []
+        # block id of every callstack index
+        self.index = []
+        self.loops = {}
+        # entry blocks of the program (0) and of the called routines
+        self.routines = []
+        self._bounds = {}
+        # the graphs are shared between the threads; `bounds` fills `_bounds` under it
+        self._lock = threading.Lock()
+        self._build_blocks(controller)
+        self._find_loops()
+        self._mark_reachable()
+        return
+
+    def __repr__(self) -> str:
+        return f"<ControlFlowGraph blocks={len(self.blocks)} loops={len(self.loops)}>"
+
+    def _build_blocks(self, controller) -> None:
+        callstack = controller._callstack
+        instructions = controller.op._instructions
+        jumps = set(controller._jump_methods)
+        labels, addresses = controller._jump_table()
+        size = len(callstack)
+
+        # leaders; the first instruction, the jump targets and the instructions after the jumps
+        targets = [None] * size
+        leaders = [False] * (size + 1)
+        if size:
+            leaders[0] = True
+        for idx, (opcode, _, args, _) in enumerate(callstack):
+            if opcode not in jumps:
+                continue
+            leaders[idx + 1] = True
+            args = [x for x in args if x != "offset"]
+            target = labels.get(str(args[-1]).upper(), None) if args else None
+            if target is None and args and str(args[-1])[0].isdigit():  # target address, e.g. `SJMP 0x0004`
+                target = addresses.get(int(tohex(args[-1]), 16), None)
+            if target is not None:
+                targets[idx] = target
+                leaders[target] = True
+
+        for idx in range(size):
+            if leaders[idx]:
+                label = callstack[idx][3].get("label", None)
+                self.blocks.append(BasicBlock(len(self.blocks), idx, idx, label.upper() if label else None))
+            block = self.blocks[-1]
+            block.end = idx + 1
+            self.index.append(block.id)
+            addr, info, _, _ = instructions[idx]
+            if block.start == idx or (not block.size and not info.directive):
+                block.address = addr  # of the first instruction after the directives
+            if not info.directive:
+                block.size += info.length
+                block.cycles += info.cycles
+
+        routines = {0} if self.blocks else set()
+        for block in self.blocks:
+            last = block.end - 1
+            opcode = callstack[last][0]
+            target = targets[last]
+            follows = self.index[block.end] if block.end < size else None
+            if opcode not in jumps:
+                block.successors = [follows] if follows is not None else []
+                continue
+            block.terminator = opcode
+            target = self.index[target] if target is not None else None
+            if opcode in _CALLS:
+                block.calls = [target] if target is not None else []
+                block.successors = [follows] if follows is not None else []
+                if target is not None:
+                    routines.add(target)
+            elif opcode in _RETURNS:
+                block.successors = []
+            elif opcode in _UNCONDITIONAL:
+                block.successors = [target] if target is not None else []
+            else:
+                block.successors = [x for x in dict.fromkeys((target, follows)) if x is not None]
+        self.routines = sorted(routines)
+        return
+
+    def _find_loops(self) -> None:
+        successors = [x.successors for x in self.blocks]
+        size = len(self.blocks)
+        header = [None] * size  # header of the innermost loop
+        position = [0] * size  # depth on the current DFS path; 0 when off the path
+        traversed = [False] * size
+        headers, irreducible = set(), set()
+
+        def tag(block, head):
+            """Weave `head` into the loop header chain of `block`"""
+            if head is None or block == head:
+                return
+            while header[block] is not None:
+                inner = header[block]
+                if inner == head:
+                    return
+                if position[inner] < position[head]:
+                    header[block] = head
+                    block, head = head, inner
+                else:
+                    block = inner
+            header[block] = head
+            return
+
+        # the unreachable blocks are searched too; dead code has its loops as well
+        for root in [*self.routines, *range(size)]:
+            if traversed[root]:
+                continue
+            traversed[root] = True
+            position[root] = 1
+            stack = [(root, iter(successors[root]))]
+            while stack:
+                block, edges = stack[-1]
+                for succ in edges:
+                    if not traversed[succ]:
+                        traversed[succ] = True
+                        position[succ] = len(stack) + 1
+                        stack.append((succ, iter(successors[succ])))
+                        break
+                    if position[succ]:  # back edge
+                        headers.add(succ)
+                        tag(block, succ)
+                    elif header[succ] is not None:
+                        head = header[succ]
+                        if position[head]:
+                            tag(block, head)
+                            continue
+                        # re-entry into a loop past its header
+                        irreducible.add(head)
+                        while header[head] is not None:
+                            head = header[head]
+                            if position[head]:
+                                tag(block, head)
+                                break
+                            irreducible.add(head)
+                else:
+                    stack.pop()
+                    position[block] = 0
+                    if stack:
+                        tag(stack[-1][0], header[block])
+
+        for head in sorted(headers):
+            self.loops[head] = Loop(head, header[head], head in irreducible)
+        depths = {}
+        for head in self.loops:
+            # up the chain to a loop with a known depth, then down; each depth is set once
+            chain, parent = [], head
+            while parent is not None and parent not in depths:
+                chain.append(parent)
+                parent = header[parent]
+            depth = depths[parent] if parent is not None else 0
+            for x in reversed(chain):
+                depth = depths[x] = depth + 1
+        for head, loop in self.loops.items():
+            loop.depth = depths[head]
+            if loop.parent is not None:
+                self.loops[loop.parent].children.append(head)
+        for block in self.blocks:
+            block.loop = block.id if block.id in self.loops else header[block.id]
+            if block.loop is not None:
+                block.depth = self.loops[block.loop].depth
+                self.loops[block.loop].blocks.append(block.id)
+        return
+
+    def _mark_reachable(self) -> None:
+        stack = [0] if self.blocks else []
+        while stack:
+            block = self.blocks[stack.pop()]
+            if block.reachable:
+                continue
+            block.reachable = True
+            stack.extend(x for x in (*block.successors, *block.calls) if not self.blocks[x].reachable)
+        return
+
+    def block(self, key) -> BasicBlock:
+        """Block of a label or a block id; `index` maps the callstack indexes to the block ids"""
+        if isinstance(key, int):
+            return self.blocks[key]
+        for block in self.blocks:
+            if block.label == str(key).upper():
+                return block
+        raise KeyError(key)
+
+    @property
+    def dead(self) -> list:
+        """Blocks unreachable from the first instruction"""
+        return [x for x in self.blocks if not x.reachable]
+
+    def bounds(self, key=0):
+        """
+        (best, worst) machine cycles from the block `key`, a block id or a label, until its routine
+        returns or the program ends; `None` if a loop, an indirect jump or a recursive call is on
+        the way
+        """
+        block = self.block(key)
+        with self._lock:
+            return self._bounds_of(block)
+
+    def _bounds_of(self, block: BasicBlock):
+        if block.id in self._bounds:
+            return self._bounds[block.id]
+
+        # post-order over the successors and the called routines
+        pending = object()
+        bounds = self._bounds
+        stack = [block.id]
+        while stack:
+            current = self.blocks[stack[-1]]
+            if current.id not in bounds:
+                bounds[current.id] = pending
+                if current.loop is None:
+                    stack.extend(x for x in (*current.successors, *current.calls) if x not in bounds)
+                continue
+            stack.pop()
+            if bounds[current.id] is not pending:
+                continue
+            bounds[current.id] = self._block_bounds(current, pending)
+        return bounds[block.id]
+
+    def _block_bounds(self, block: BasicBlock, pending):
+        if block.loop is not None:
+            return None
+        if block.terminator == "JMP" and not block.successors:
+            return None  # indirect
+        best = worst = block.cycles
+        for call in block.calls:
+            bounds = self._bounds[call]
+            if bounds is None or bounds is pending:
+                return None  # recursion
+            best, worst = best + bounds[0], worst + bounds[1]
+        if not block.successors:
+            return best, worst
+        paths = [self._bounds[x] for x in block.successors]
+        if any(x is None or x is pending for x in paths):
+            return None
+        return best + min(x[0] for x in paths), worst + max(x[1] for x in paths)
+
+    def stats(self) -> dict:
+        reachable = [x for x in self.blocks if x.reachable]
+        dead = self.dead
+        return {
+            "blocks": len(self.blocks),
+            "edges": sum(len(x.successors) + len(x.calls) for x in self.blocks),
+            "loops": len(self.loops),
+            "max_depth": max((x.depth for x in self.loops.values()), default=0),
+            "reachable": {
+                "instructions": sum(x.end - x.start for x in reachable),
+                "bytes": sum(x.size for x in reachable),
+            },
+            "dead": {
+                "instructions": sum(x.end - x.start for x in dead),
+                "bytes": sum(x.size for x in dead),
+                "addresses": [format(x.address, "#06x") for x in dead],
+            },
+            "bounds": {
+                (self.blocks[x].label or format(self.blocks[x].address, "#06x")): self.bounds(x) for x in self.routines
+            },
+        }
+
+    def todict(self) -> dict:
+        return {
+            "blocks": [x.todict() for x in self.blocks],
+            "loops": [x.todict() for x in self.loops.values()],
+            "routines": self.routines,
+            "stats": self.stats(),
+        }
+
+    pass
+
+
+def build(controller) -> ControlFlowGraph:
+    """Control-flow graph of the program in `controller`; built once per program hash"""
+    key = controller._program_hash()
+    with _lock:
+        graph = _cache.get(key, None)
+        if graph is not None:
+            _cache.move_to_end(key)
+            return graph
+    graph = ControlFlowGraph(controller)
+    with _lock:
+        _cache[key] = graph
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return graph
@@ -0,0 +1,77 @@
+import sys
+import json
+import argparse
+
+from core.cache import AssemblyCache
+from core.controller import Controller
+from core.image import detect_format, load_image, save_image
+
+
+def _int(value: str) -> int:
+    return int(value, 0)
+
+
+def _block(value: str) -> tuple:
+    """`SPACE:START=DATA`; DATA is hex, or `@path` of a raw binary file"""
+    try:
+        target, data = value.split("=", 1)
+        space, start = target.split(":", 1)
+        return space, int(start, 0), data
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected SPACE:START=DATA, found `{value}`")
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sim8051", description="8051 microprocessor simulator")
+    parser.add_argument("source", nargs="?", help="assembly source file")
+    parser.add_argument("--run", action="store_true", help="run the assembled program")
+    parser.add_argument("--load-image", metavar="PATH", help="load an Intel HEX or raw binary image into ROM")
+    parser.add_argument("--save-image", metavar="PATH", help="save the ROM as an Intel HEX or raw binary image")
+    parser.add_argument("--image-format", choices=["hex", "bin"], help="image format; detected from the extension")
+    parser.add_argument("--image-start", type=_int, default=0, help="start address of the image")
+    parser.add_argument("--image-size", type=_int, default=None, help="no. of bytes to save")
+    parser.add_argument("--cache-dir", metavar="PATH", help="on-disk tier of the assembly cache")
+    parser.add_argument(
+        "--write",
+        metavar="SPACE:START=DATA",
+        type=_block,
+        action="append",
+        default=[],
+        help="write hex bytes (or `@path` of a binary file) into ram/rom/xram before running, e.g. ram:0x30=01020304",
+    )
+    parser.add_argument("--xram", metavar="PATH", help="map the 64kB external RAM onto a file; created if missing")
+    parser.add_argument("--trace", action="store_true", default=None, help="log every instruction to the console")
+    return parser
+
+
+def main(argv: list = None) -> int:
+    args = get_parser().parse_args(argv)
+    controller = Controller(trace=args.trace, xram=args.xram)
+
+    if args.load_image:
+        _format = args.image_format or detect_format(args.load_image)
+        with open(args.load_image, "rb") as f:
+            load_image(f, controller.op.memory_rom, fmt=_format, start=args.image_start)
+
+    for space, start, data in args.write:
+        if data.startswith("@"):
+            with open(data[1:], "rb") as f:
+                controller.op.super_memory.write_block(space, start, f.read())
+        else:
+            controller.op.super_memory.write_block(space, start, data, "hex")
+
+    if args.source:
+        with open(args.source) as f:
+            AssemblyCache(path=args.cache_dir).assemble(controller, f.read())
+        if args.run:
+            controller.run()
+
+    if args.save_image:
+        _format = args.image_format or detect_format(args.save_image)
+        with open(args.save_image, "w" if _format == "hex" else "wb") as f:
+            save_image(f, controller.op.memory_rom, fmt=_format, start=args.image_start, size=args.image_size)
+
+    controller.op.memory_xram.flush()
+    json.dump(controller.op.super_memory._registers_todict(), sys.stdout, indent=4)
+    sys.stdout.write("\n")
+    return 0
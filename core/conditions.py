@@ -0,0 +1,79 @@
+import re
+import operator
+
+from core.exceptions import InvalidCondition
+
+_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "<": operator.lt,
+    ">": operator.gt,
+}
+_REGISTERS = ("A", "B", "SP", "PC", "DPTR", "R0", "R1", "R2", "R3", "R4", "R5", "R6", "R7")
+_FLAGS = ("P", "OV", "RS0", "RS1", "F0", "AC", "CY", "C")
+_CONDITION = re.compile(r"^\s*([^\s=!<>]+)\s*(==|!=|<=|>=|<|>)\s*(\S+)\s*$")
+
+
+def _parse_value(value: str) -> int:
+    value = value.strip()
+    if re.fullmatch(r"0[xX][0-9a-fA-F]+", value):
+        return int(value, 16)
+    if re.fullmatch(r"[0-9a-fA-F]+[hH]", value):
+        return int(value[:-1], 16)
+    if value.isdigit():
+        return int(value)
+    raise ValueError(value)
+
+
+def _operand(name: str):
+    """Getter `func(controller) -> int` for a register, flag or RAM address"""
+    key = name.upper()
+    if key in _REGISTERS:
+        return lambda controller: int(str(getattr(controller.op.super_memory, key)), 16)
+    if key in _FLAGS:
+        flag = "CY" if key == "C" else key
+        return lambda controller: int(controller.op.super_memory.PSW.get(flag))
+    addr = _parse_value(name)
+    if addr > 0xFF:
+        raise ValueError(name)
+    return lambda controller: controller.op.memory_ram.buffer[addr - controller.op.memory_ram._offset]
+
+
+class Condition:
+    """
+    Break condition evaluated against a controller, e.g. `A == 0x05`, `R0 != 0`, `0x30 >= 10H`,
+    `CY` or `!CY`; values are hex (`0x12`, `12H`) or decimal
+    """
+
+    def __init__(self, expression: str) -> None:
+        self.expression = expression
+        try:
+            self._evaluate = self._parse(expression)
+        except ValueError:
+            raise InvalidCondition(expression)
+        return
+
+    def __repr__(self) -> str:
+        return f"<Condition {self.expression}>"
+
+    def __call__(self, controller) -> bool:
+        return bool(self._evaluate(controller))
+
+    @staticmethod
+    def _parse(expression: str):
+        match = _CONDITION.match(expression)
+        if match:
+            name, op, value = match.groups()
+            getter, compare, value = _operand(name), _OPERATORS[op], _parse_value(value)
+            return lambda controller: compare(getter(controller), value)
+        flag = expression.strip()
+        negate = flag.startswith("!")
+        flag = flag.lstrip("!").strip().upper()
+        if flag not in _FLAGS:
+            raise ValueError(expression)
+        getter = _operand(flag)
+        return (lambda controller: not getter(controller)) if negate else getter
+
+    pass
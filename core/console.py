@@ -0,0 +1,45 @@
+"""
+Console of the tracing logs
+
+`rich` is only imported once tracing is enabled, either per controller or for the whole process
+through the `SIM8051_TRACE` environment variable; otherwise the logs are dropped.
+"""
+
+import os
+
+TRACE_ENV = "SIM8051_TRACE"
+
+
+class NullConsole:
+    """Drops the logs; `print` still goes to stdout"""
+
+    tracing = False
+
+    def log(self, *args, **kwargs) -> None:
+        return None
+
+    def print(self, *args, **kwargs) -> None:
+        print(*args)
+        return None
+
+    pass
+
+
+NULL_CONSOLE = NullConsole()
+
+
+def tracing_enabled() -> bool:
+    return os.environ.get(TRACE_ENV, "").lower() not in ("", "0", "false", "no")
+
+
+def get_console(trace: bool = None):
+    """`rich` console if tracing is enabled, `NULL_CONSOLE` otherwise; `trace=None` reads `SIM8051_TRACE`"""
+    if trace is None:
+        trace = tracing_enabled()
+    if not trace:
+        return NULL_CONSOLE
+    from rich.console import Console
+
+    console = Console()
+    console.tracing = True
+    return console
@@ -1,38 +1,55 @@
 import re
-import inspect
-
-from rich.console import Console
-
-from core.exceptions import OPCODENotFound
+import time
+from copy import deepcopy
+from hashlib import sha256
+
+from core import cfg, metrics, snapshot
+from core.cache import AssembledProgram
+from core.console import get_console
+from core.disassembler import Disassembler
+from core.exceptions import OPCODENotFound, StackError, SyntaxError
 from core.flags import JumpFlag
 from core.instruction_set import Instructions
+from core.memoize import SubroutineMemoizer
 from core.operations import Operations
-from core.util import decompose_byte, ishex, tohex
+from core.util import ishex, tohex
+
+# public methods of the instruction set; the `lookup` table of every controller binds these names
+_INSTRUCTION_NAMES = tuple(name for name, value in vars(Instructions).items() if callable(value) and "_" not in name)
 
 
 class Controller:
-    def __init__(self, console=None) -> None:
-        self.console = console
-        if not console:
-            self.console = Console()
+    def __init__(self, console=None, trace: bool = None, xram=None) -> None:
+        self.console = console or get_console(trace)
+        # f-strings of the per-instruction logs are only built while tracing
+        self._tracing = getattr(self.console, "tracing", True)
         # operations
-        self.op = Operations()
+        self.op = Operations(console=self.console, xram=xram)
         # self.op.super_memory.PC("0x30")  # RAM general scratch pad area
         # instruction set
         self._jump_flag = False
         self._address_jump_flag = None
         self.instruct_set = Instructions(self.op)
-        self.lookup = {
-            name.upper(): call
-            for name, call in inspect.getmembers(self.instruct_set, inspect.ismethod)
-            if "_" not in name
-        }
+        self.lookup = {name.upper(): getattr(self.instruct_set, name) for name in _INSTRUCTION_NAMES}
         # callstack
         self._callstack = []
         self.ready = False
         self._jump_methods = self.op._jump_instructions
         self._wrap_bounceable_methods()
         self._run_idx = 0
+        self._disassembler = None
+        # executed instructions and machine cycles
+        self.instructions = 0
+        self.cycles = 0
+        # encoded program and its hash for the snapshots
+        self._program_cache = None
+        # label and address lookup tables of the jumps, calls and returns
+        self._jump_tables = None
+        # nesting of the subroutine calls
+        self.call_depth = 0
+        self.max_call_depth = 0
+        # `SubroutineMemoizer` installed by `memoize`
+        self._memoizer = None
         return
 
     def __repr__(self):
@@ -56,26 +73,76 @@ class Controller:
 
         def _func(*args, **kwargs):
             kwargs["bounce_to_label"] = self._bounce_to_label
+            kwargs["call_label"] = self._call_label
+            kwargs["bounce_to_address"] = self._bounce_to_address
             return func(*args, **kwargs)
 
         return _func
 
+    def _jump_table(self) -> tuple:
+        """
+        `({label: callstack index}, {address: callstack index})`, built once per program; the
+        address after the last instruction maps to the end of the callstack
+        """
+        if self._jump_tables is None:
+            labels, addresses = {}, {}
+            for idx, x in enumerate(self._callstack):
+                if x[3].get("label", None):
+                    labels.setdefault(str(x[3]["label"].upper()), idx)
+            instructions = [(idx, x[0], x[1]) for idx, x in enumerate(self.op._instructions) if not x[1].directive]
+            for idx, addr, _ in instructions:
+                addresses.setdefault(addr, idx)
+            for idx, addr, info in instructions:
+                addresses.setdefault(addr + info.length, idx + 1)
+            self._jump_tables = (labels, addresses)
+        return self._jump_tables
+
     def _bounce_to_label(self, label):
-        idx, _ = self._locate_jump_label(label)
+        idx = self._jump_table()[0].get(label.upper(), None)
+        if idx is None and label[0].isdigit():  # target address, e.g. of a disassembled listing
+            idx = self._jump_table()[1].get(int(tohex(label), 16), None)
+        if idx is None:
+            raise SyntaxError(msg=f"label `{label}` not found")
         print(f"JUMPING to label: {label} index: {idx}")
         self._run_idx = idx
         return True
 
+    def _call_label(self, label):
+        """Jump into the subroutine at `label`; the return address is already pushed"""
+        self.call_depth += 1
+        if self.call_depth > self.max_call_depth:
+            self.max_call_depth = self.call_depth
+        return self._bounce_to_label(label)
+
+    def _bounce_to_address(self, addr: int):
+        """Return to the instruction at `addr`, popped from the stack"""
+        idx = self._jump_table()[1].get(addr, None)
+        if idx is None:
+            raise StackError(f"return to {addr:#06x}; not the address of an instruction")
+        if self.call_depth:
+            self.call_depth -= 1
+        self._run_idx = idx
+        return True
+
+    @property
+    def stack_overflows(self) -> int:
+        """No. of pushes that wrapped the stack past `StackPointer.STACK_TOP` (0x7F) into the register banks"""
+        return self.op.super_memory.SP.overflows
+
     def _sync_PC(self) -> bool:
+        addr = self.op._instructions[self._run_idx - 1][0]
+        self.op.super_memory.PC(format(addr, "#06x"))
         for asm_instruct in self.op._internal_PC[self._run_idx - 1]:
-            if not asm_instruct:
-                return True
-            self.op.super_memory.PC.write(*asm_instruct)
-            self.console.log(f"Write PC: {asm_instruct}")
+            for byte in asm_instruct:
+                self.op.super_memory.PC.write(byte)
+            if self._tracing:
+                self.console.log(f"Write PC: {asm_instruct}")
         return True
 
     def _call(self, func, *args, **kwargs) -> bool:
         self._sync_PC()
+        self.instructions += 1
+        self.cycles += self.op._instructions[self._run_idx - 1][1].cycles
         return func(*args)
 
     def _get_jump_flags(self) -> list:
@@ -91,23 +158,20 @@ class Controller:
         return None, None
 
     def _target_label(self, label) -> bool:
+        """
+        Encode the address of `label` into every jump instruction targeting it, once the label is located
+        """
         self.console.log(f"======={label}========")
-        idx_t, x_t = self._locate_jump_label(label, key="target-label")
         idx_l, x_l = self._locate_jump_label(label)
-        if x_t:
-            if x_l:
-                _target_label = x_t[3].get("target-label")
-                _jump_label = x_l[3].get("label")
-                self.console.log(f"!YES! PC: {_jump_label._counter + 2}")
-                self.console.log(f"{_target_label._counter} {_target_label._counter}")
-                _data_to_write = decompose_byte(str(_jump_label._counter))
-                self.op.memory_write(str(_target_label._counter + 1), _data_to_write[1])
-                self.op.memory_write(str(_target_label._counter + 2), _data_to_write[0])
-                _assembler = self.op._assembler[_target_label._command].replace("oxff", "").strip()
-                self.op._assembler[_target_label._command] = " ".join(
-                    [_assembler, _data_to_write[1], _data_to_write[0]]
-                )
-        return
+        if not x_l:
+            return False
+        _addr = int(x_l[3].get("label")._counter)
+        for idx, x in enumerate(self._callstack):
+            _target_label = x[3].get("target-label", None)
+            if _target_label and _target_label == label.upper():
+                self.console.log(f"!YES! {_target_label} -> {_addr:#06x}")
+                self.op.resolve_target(idx, _addr)
+        return True
 
     def inspect(self):
         return self.console.print(self.__repr__())
@@ -122,9 +186,17 @@ class Controller:
     def callstack(self) -> list:
         return self._callstack
 
+    @property
+    def disassembler(self) -> Disassembler:
+        if not self._disassembler:
+            self._disassembler = Disassembler(self.op.memory_rom)
+        return self._disassembler
+
     def _addjob(self, opcode: str, func, args: tuple = (), kwargs: dict = {}) -> bool:
+        # the jump target stays as written; a label may look like a number, e.g. `F0`
+        target = len(args) - 2 if "target-label" in kwargs else None
         for idx, val in enumerate(args):
-            if not self.op.iskeyword(val):
+            if idx != target and not self.op.iskeyword(val):
                 if ishex(val):
                     args[idx] = tohex(val)
         self._callstack.append((opcode, func, args, kwargs))
@@ -137,10 +209,10 @@ class Controller:
         if command[0] == "#":  # Directive
             command = command[1:]
 
-        match = re.match("^[a-zA-Z]+:", command)
+        match = re.match("^[a-zA-Z_][a-zA-Z0-9_]*:", command)
         if match:
             label = match.group()[:-1]
-            kwargs["label"] = JumpFlag(label, self.op.super_memory.PC, command)
+            kwargs["label"] = JumpFlag(label, format(self.op._location, "#06x"), command)
             return self._parser(command.replace(f"{label}:", ""), *args, **kwargs)
 
         _proc_command = re.split(r",| ", command)
@@ -151,17 +223,21 @@ class Controller:
         return opcode.upper(), args, kwargs
 
     def parse(self, command):
-        self.console.log(command)
         opcode, args, kwargs = self._parser(command)
-        self.console.log(f"opcode: {opcode}; args: {args}; kwargs: {kwargs}")
+        if self._tracing:
+            self.console.log(command)
+            self.console.log(f"opcode: {opcode}; args: {args}; kwargs: {kwargs}")
         if self.instruct_set._is_jump_opcode(opcode):
             print("JUMP instruction")
             # if JNZ | JC | etc ** kwargs the target-label **
-            kwargs["target-label"] = JumpFlag(args[0], self.op.super_memory.PC + len(self.op._internal_PC), command)
+            if args and not self.op.iskeyword(args[-1]):
+                kwargs["target-label"] = JumpFlag(args[-1], format(self.op._location, "#06x"), command)
             args.append("offset")  # placeholder
             # kwargs["label"] = _label
             # args.append("offset")  # placeholder
         opcode_func = self._lookup_opcode_func(opcode)
+        self._program_cache = None
+        self._jump_tables = None
         self._addjob(opcode, opcode_func, args, kwargs)
         self.op.prepare_operation(command, opcode, *args)
         """
@@ -174,42 +250,222 @@ class Controller:
         `target-label` and `label`;
         if `target-tabel` is found then replace the placeholder obtained using the `PC` in `label`
         """
-        _label = kwargs.get("target-label", kwargs.get("label", None))
-        if _label:
-            self._target_label(_label)
+        for _label in [kwargs.get("label", None), kwargs.get("target-label", None)]:
+            if _label:
+                self._target_label(_label.upper())
         self.ready = True
         return True
 
     def parse_all(self, commands):
-        for command in commands.split("\n"):
-            if command:
-                self.parse(command)
+        with metrics.assemble_seconds.time():
+            for command in commands.split("\n"):
+                if command:
+                    self.parse(command)
+        return True
+
+    @property
+    def labels(self) -> dict:
+        """Label table; maps every label to its index in the callstack"""
+        return {str(x[3]["label"].upper()): idx for idx, x in enumerate(self._callstack) if x[3].get("label", None)}
+
+    def memory_image(self) -> tuple:
+        """ROM and RAM contents as `{addr: value}` dicts"""
+        return (
+            {str(addr): str(val) for addr, val in self.op.memory_rom.items()},
+            {str(addr): str(val) for addr, val in self.op.memory_ram.items()},
+        )
+
+    def export_program(self, key: str = None, baseline: tuple = None) -> AssembledProgram:
+        """
+        Capture the assembled state of the controller as a standalone `AssembledProgram`
+
+        baseline: `Controller.memory_image` taken before assembling; only the memory cells
+        changed since then are captured
+        """
+        memory_rom, memory_ram = self.memory_image()
+        if baseline:
+            memory_rom = {addr: val for addr, val in memory_rom.items() if baseline[0].get(addr) != val}
+            memory_ram = {addr: val for addr, val in memory_ram.items() if baseline[1].get(addr) != val}
+        return AssembledProgram(
+            key=key,
+            program=deepcopy([(opcode, args, kwargs) for opcode, _, args, kwargs in self._callstack]),
+            instructions=deepcopy(self.op._instructions),
+            labels=self.labels,
+            memory_rom=memory_rom,
+            memory_ram=memory_ram,
+        )
+
+    def load_program(self, program: AssembledProgram) -> bool:
+        """
+        Clone an `AssembledProgram` into the controller without parsing the source again
+        """
+        self._program_cache = None
+        self._jump_tables = None
+        for opcode, args, kwargs in deepcopy(program.program):
+            self._callstack.append((opcode, self._lookup_opcode_func(opcode), args, kwargs))
+        self.op.load_instructions(deepcopy(program.instructions))
+        for addr, val in program.memory_ram.items():
+            self.op.memory_ram.write(addr, val)
+        for addr, val in program.memory_rom.items():
+            self.op.memory_rom.write(addr, val)
+        self.ready = True
+        return True
+
+    def _program_section(self) -> bytes:
+        if self._program_cache is None:
+            section = snapshot.encode_program(self)
+            self._program_cache = (section, sha256(section).digest())
+        return self._program_cache[0]
+
+    def _program_hash(self) -> bytes:
+        self._program_section()
+        return self._program_cache[1]
+
+    def _load_program_section(self, program: list, instructions: list, section: bytes) -> bool:
+        self.reset_callstack()
+        self._callstack = [
+            (opcode, self._lookup_opcode_func(opcode), list(args), dict(kwargs)) for opcode, args, kwargs in program
+        ]
+        self.op.load_instructions(instructions)
+        self._program_cache = (section, sha256(section).digest())
         return True
 
+    def snapshot(self, program: bool = True) -> bytes:
+        """
+        Machine state as a versioned binary blob; see `core.snapshot`
+
+        program: include the program; otherwise the blob restores only into a controller running it
+        """
+        return snapshot.dump(self, program=program)
+
+    def restore(self, blob: bytes) -> bool:
+        """Restore a `Controller.snapshot`; the program is only reloaded if it differs"""
+        return snapshot.load(self, blob)
+
+    def cfg(self) -> cfg.ControlFlowGraph:
+        """Control-flow graph of the program; cached per program hash, see `core.cfg`"""
+        return cfg.build(self)
+
+    def memoize(self, labels: list, size: int = 1024, verify: bool = False) -> SubroutineMemoizer:
+        """Memoize the calls of the pure subroutines at `labels`; see `core.memoize`"""
+        if self._memoizer is not None:
+            self._memoizer.uninstall()
+        memoizer = self._memoizer = SubroutineMemoizer(self, labels, size=size, verify=verify)
+        memoizer.install()
+        return memoizer
+
+    def parse_rom(self, start: int, size: int) -> bool:
+        """Assemble the program already in the ROM, e.g. a loaded image, so that it can be run"""
+        return self.parse_all(self.disassembler.to_source(start, size, mnemonics=self.lookup))
+
     def run_once(self):
         if self._run_idx >= len(self._callstack):
             return False
         try:
-            self.console.log(self._callstack[self._run_idx])
+            if self._tracing:
+                self.console.log(self._callstack[self._run_idx])
             opcode, func, args, kwargs = self._callstack[self._run_idx]
             self._run_idx += 1
             print(self._run_idx)
+            cycles = self.cycles
             self._call(func, *args, **kwargs)
+            metrics.instructions.inc()
+            metrics.cycles.inc(self.cycles - cycles)
         except StopIteration:
             pass
         return True
 
-    def run(self):
-        while self._run_idx < len(self._callstack):
-            val = self._callstack[self._run_idx]
+    def run(self, stop=None, limit: int = None):
+        """
+        Run the program till the end of the callstack; `stop` is an optional `threading.Event`
+        checked before every instruction, `limit` an optional budget of instructions. Returns `False`
+        if the run was stopped or ran out of the budget
+        """
+        started, instructions, cycles = time.perf_counter(), self.instructions, self.cycles
+        budget = None if limit is None else instructions + limit
+        reason = "end"
+        try:
+            while self._run_idx < len(self._callstack):
+                if stop is not None and stop.is_set():
+                    reason = "stopped"
+                    return False
+                if budget is not None and self.instructions >= budget:
+                    reason = "limit"
+                    return False
+                val = self._callstack[self._run_idx]
+                self._run_idx += 1
+                # try:
+                # print(f"{self._run_idx} -- {val} ", end="")
+                opcode, func, args, kwargs = val
+                self._call(func, *args, **kwargs)
+                # except StopIteration:
+                #     pass
+            return True
+        except Exception:
+            reason = "error"
+            raise
+        finally:
+            self._record_run(started, instructions, cycles, reason)
+
+    def _record_run(self, started: float, instructions: int, cycles: int, reason: str) -> None:
+        elapsed = time.perf_counter() - started
+        metrics.record_run(self.instructions - instructions, self.cycles - cycles, elapsed, reason)
+        return
+
+    def _locate_until(self, until) -> int:
+        if until is None or isinstance(until, int):
+            return until
+        if str(until).isdigit():
+            return int(until)
+        idx = self.labels.get(str(until).upper(), None)
+        if idx is None:
+            raise ValueError(f"unknown label `{until}`")
+        return idx
+
+    def _trace_registers(self) -> dict:
+        super_memory = self.op.super_memory
+        registers = super_memory._registers_todict()
+        registers.update((f"R{i}", str(getattr(super_memory, f"R{i}"))) for i in range(8))
+        return registers
+
+    def run_steps(self, steps: int = None, until=None, condition=None, trace: bool = False, limit: int = 100000):
+        """
+        Run `steps` instructions, or until the callstack index or label `until` is reached, or until
+        `condition(controller)` holds after an instruction; at most `limit` instructions
+
+        returns: dict with the no. of `steps` executed, the `reason` the run stopped (`steps`, `until`,
+            `condition`, `end` or `limit`) and with `trace` a list of the executed callstack indexes,
+            their PC and the registers they changed
+        """
+        until = self._locate_until(until)
+        started, instructions, cycles = time.perf_counter(), self.instructions, self.cycles
+        max_steps = limit if steps is None else min(steps, limit)
+        executed = 0
+        reason = "steps" if steps is not None and steps <= limit else "limit"
+        _trace = [] if trace else None
+        registers = self._trace_registers() if trace else None
+        while executed < max_steps:
+            if self._run_idx >= len(self._callstack):
+                reason = "end"
+                break
+            if executed and self._run_idx == until:
+                reason = "until"
+                break
+            idx = self._run_idx
+            opcode, func, args, kwargs = self._callstack[idx]
             self._run_idx += 1
-            # try:
-            # print(f"{self._run_idx} -- {val} ", end="")
-            opcode, func, args, kwargs = val
             self._call(func, *args, **kwargs)
-            # except StopIteration:
-            #     pass
-        return True
+            executed += 1
+            if trace:
+                _registers = self._trace_registers()
+                changed = {key: val for key, val in _registers.items() if registers[key] != val}
+                _trace.append({"index": idx, "PC": format(self.op._instructions[idx][0], "#06x"), "changed": changed})
+                registers = _registers
+            if condition is not None and condition(self):
+                reason = "condition"
+                break
+        self._record_run(started, instructions, cycles, reason)
+        return {"steps": executed, "reason": reason, "trace": _trace}
 
     def set_flag(self, key, val):
         self.op.flags[key] = val
@@ -219,13 +475,29 @@ class Controller:
         return self.op.flags.set_flags(*args, **kwargs)
 
     def reset(self) -> bool:
-        self.__init__(console=self.console)
+        """
+        Power-on state in place; the memory is zeroed and the lookup tables, wrapped jump methods
+        and the memory objects are kept
+        """
+        self.reset_callstack()
+        self.op.reset()
+        self.ready = False
+        self._jump_flag = False
+        self._address_jump_flag = None
         return True
 
     def reset_callstack(self) -> None:
         self._callstack = []
         self._run_idx = 0
-        self.op._assembler = {}
+        self.instructions = 0
+        self.cycles = 0
+        self._program_cache = None
+        self._jump_tables = None
+        self.call_depth = 0
+        self.max_call_depth = 0
+        if self._memoizer is not None:  # drops a recording of the last run too
+            self._memoizer.clear()
+        self.op.reset_program()
         return True
 
     pass
@@ -0,0 +1,120 @@
+from core.opcodes import OPCODES
+
+
+class Disassembler:
+    """
+    Disassembler for the ROM; decodes with the same `core.opcodes` metadata as the assembler.
+
+    The decoded instructions are cached per address with their bytes and invalidated by the writes
+    that change them.
+    """
+
+    def __init__(self, memory) -> None:
+        self.memory = memory
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+        memory.add_listener(self._invalidate)
+        return
+
+    def __repr__(self) -> str:
+        return f"<Disassembler cached={len(self._cache)} hits={self.hits} misses={self.misses}>"
+
+    def _invalidate(self, addr: int, size: int) -> None:
+        if not self._cache:
+            return
+        if size > 64:
+            self._cache.clear()
+            return
+        buffer, offset = self.memory.buffer, self.memory._offset
+        # instructions are upto 3 bytes long; the two before the write may span it. The bytes of
+        # every executed instruction are rewritten with the same values while syncing the PC
+        for x in range(addr - 2, addr + size):
+            entry = self._cache.get(x, None)
+            if entry is not None and buffer[x - offset : x - offset + len(entry[1])] != entry[1]:
+                del self._cache[x]
+        return
+
+    def decode(self, addr: int) -> tuple:
+        """
+        Decode the instruction at `addr`
+
+        returns: (length, mnemonic, operands, target address or `None`)
+        """
+        entry = self._cache.get(addr, None)
+        if entry:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        buffer = self.memory.buffer
+        idx = addr - self.memory._offset
+        info = OPCODES[buffer[idx]]
+        if info is None or idx + info.length > len(buffer):
+            decoded = (1, "DB", [format(buffer[idx], "#04x")], None)
+        else:
+            operands, target = info.decode(bytes(buffer[idx : idx + info.length]), addr)
+            decoded = (info.length, info.mnemonic, operands, target)
+        self._cache[addr] = (decoded, bytes(buffer[idx : idx + decoded[0]]))
+        return decoded
+
+    def disassemble(self, start: int, size: int) -> list:
+        """
+        Decode the instructions starting in `start`...`start + size`; branch targets inside
+        the range are given labels
+        """
+        self.memory._verify_range(start, size)
+        listing = []
+        addr = start
+        end = start + size
+        while addr < end:
+            length, mnemonic, operands, target = self.decode(addr)
+            listing.append(
+                {
+                    "address": addr,
+                    "bytes": self.memory.dump(addr, min(length, end - addr)).hex(),
+                    "mnemonic": mnemonic,
+                    "operands": list(operands),
+                    "target": target,
+                    "label": None,
+                }
+            )
+            addr += length
+
+        addresses = {x["address"]: x for x in listing}
+        for x in listing:
+            if x["target"] is not None and x["target"] in addresses:
+                label = self.label(x["target"])
+                addresses[x["target"]]["label"] = label
+                x["operands"][-1] = label
+        return listing
+
+    @staticmethod
+    def label(addr: int) -> str:
+        return f"L{addr:04X}"
+
+    def to_source(self, start: int, size: int, mnemonics=None) -> str:
+        """
+        Listing of `start`...`start + size` as source for `Controller.parse_all`
+
+        mnemonics: the mnemonics the assembler takes; the other instructions, the undefined opcodes
+            and an instruction running past the range are written as `DB` bytes
+        """
+        lines = [] if start == self.memory._offset else [f"ORG {start:#06x}"]
+        for x in self.disassemble(start, size):
+            data = bytes.fromhex(x["bytes"])
+            raw = x["mnemonic"] == "DB" or len(data) < self.decode(x["address"])[0]
+            if raw or (mnemonics is not None and x["mnemonic"] not in mnemonics):
+                commands = [f"DB {value:#04x}" for value in data]
+            else:
+                commands = [" ".join([x["mnemonic"], ", ".join(x["operands"])]).strip()]
+            if x["label"]:
+                commands[0] = f"{x['label']}: {commands[0]}"
+            lines.extend(commands)
+        return "\n".join(lines)
+
+    def clear(self) -> bool:
+        self._cache.clear()
+        self.hits = self.misses = 0
+        return True
+
+    pass
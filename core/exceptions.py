@@ -22,3 +22,25 @@ class InvalidMemoryAddress(Exception):
 class ValueErrorHexRequired(ValueError):
     def __init__(self, value, msg="invalid valid; only hex supported!") -> None:
         super().__init__(f"{msg}({value})")
+
+
+class ImageFormatError(ValueError):
+    def __init__(self, msg="invalid memory image", line=None) -> None:
+        if line is not None:
+            msg = f"{msg} (line {line})"
+        super().__init__(msg)
+
+
+class InvalidCondition(ValueError):
+    def __init__(self, condition, msg="invalid condition") -> None:
+        super().__init__(f"{msg} `{condition}`")
+
+
+class SnapshotError(ValueError):
+    def __init__(self, msg="invalid snapshot") -> None:
+        super().__init__(msg)
+
+
+class StackError(Exception):
+    def __init__(self, msg="invalid return address") -> None:
+        super().__init__(msg)
@@ -0,0 +1,153 @@
+import os
+
+from core.exceptions import ImageFormatError
+
+"""
+Readers and writers for ROM images
+
+Intel HEX records: `:LLAAAATT<data>CC`
+    LL = data length, AAAA = address, TT = record type, CC = two's complement checksum
+
+Both formats copy straight to/from the `Memory` buffer with `Memory.load` and `Memory.dump`.
+"""
+
+IHEX_DATA = 0x00
+IHEX_EOF = 0x01
+IHEX_EXTENDED_SEGMENT_ADDRESS = 0x02
+IHEX_START_SEGMENT_ADDRESS = 0x03
+IHEX_EXTENDED_LINEAR_ADDRESS = 0x04
+IHEX_START_LINEAR_ADDRESS = 0x05
+
+IMAGE_FORMATS = {
+    ".hex": "hex",
+    ".ihx": "hex",
+    ".ihex": "hex",
+    ".bin": "bin",
+}
+
+
+def detect_format(filename: str, default: str = "bin") -> str:
+    """
+    Helper method to detect the image format from the file extension
+    """
+    return IMAGE_FORMATS.get(os.path.splitext(str(filename))[1].lower(), default)
+
+
+def _ihex_record(record_type: int, addr: int, data: bytes = b"") -> str:
+    record = bytes([len(data), (addr >> 8) & 0xFF, addr & 0xFF, record_type]) + data
+    checksum = (-sum(record)) & 0xFF
+    return f":{record.hex().upper()}{checksum:02X}\n"
+
+
+def read_ihex(stream, memory) -> tuple:
+    """
+    Load an Intel HEX stream into `memory`
+
+    stream: iterable of lines; `str` or `bytes`
+    returns: (lowest address, highest address, no. of data bytes)
+    """
+    base = 0
+    low, high, count = None, None, 0
+    for lineno, line in enumerate(stream, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("ascii", errors="replace")
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] != ":":
+            raise ImageFormatError("missing record mark", line=lineno)
+        try:
+            record = bytes.fromhex(line[1:])
+        except ValueError:
+            raise ImageFormatError("invalid hex digits", line=lineno)
+        if len(record) < 5 or len(record) != record[0] + 5:
+            raise ImageFormatError("invalid record length", line=lineno)
+        if sum(record) & 0xFF:
+            raise ImageFormatError("checksum mismatch", line=lineno)
+
+        record_type = record[3]
+        data = record[4:-1]
+        if record_type == IHEX_DATA:
+            addr = base + ((record[1] << 8) | record[2])
+            memory.load(addr, data)
+            low = addr if low is None else min(low, addr)
+            high = addr + len(data) - 1 if high is None else max(high, addr + len(data) - 1)
+            count += len(data)
+        elif record_type == IHEX_EOF:
+            break
+        elif record_type == IHEX_EXTENDED_SEGMENT_ADDRESS:
+            base = int.from_bytes(data, "big") << 4
+        elif record_type == IHEX_EXTENDED_LINEAR_ADDRESS:
+            base = int.from_bytes(data, "big") << 16
+        elif record_type not in (IHEX_START_SEGMENT_ADDRESS, IHEX_START_LINEAR_ADDRESS):
+            raise ImageFormatError(f"unknown record type {record_type:#04x}", line=lineno)
+    return low, high, count
+
+
+def write_ihex(memory, stream, start: int = 0, size: int = None, record_size: int = 16) -> int:
+    """
+    Write `memory` as Intel HEX into the text `stream`
+
+    Without `size` the image is trimmed after the last non-zero byte; returns the no. of data bytes.
+    """
+    data = _image_data(memory, start, size)
+    segment = 0
+    idx = 0
+    while idx < len(data):
+        addr = start + idx
+        if addr >> 16 != segment:
+            segment = addr >> 16
+            stream.write(_ihex_record(IHEX_EXTENDED_LINEAR_ADDRESS, 0, segment.to_bytes(2, "big")))
+        chunk = data[idx : idx + min(record_size, 0x10000 - (addr & 0xFFFF))]
+        stream.write(_ihex_record(IHEX_DATA, addr & 0xFFFF, chunk))
+        idx += len(chunk)
+    stream.write(_ihex_record(IHEX_EOF, 0))
+    return len(data)
+
+
+def read_bin(stream, memory, start: int = 0, chunk_size: int = 65536) -> tuple:
+    """
+    Load a raw binary stream into `memory` from the address `start`
+
+    returns: (lowest address, highest address, no. of data bytes)
+    """
+    addr = start
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        addr += memory.load(addr, chunk)
+    return start, addr - 1, addr - start
+
+
+def write_bin(memory, stream, start: int = 0, size: int = None) -> int:
+    """
+    Write `memory` as a raw binary into `stream`
+
+    Without `size` the image is trimmed after the last non-zero byte; returns the no. of data bytes.
+    """
+    data = _image_data(memory, start, size)
+    stream.write(data)
+    return len(data)
+
+
+def _image_data(memory, start: int, size: int = None) -> bytes:
+    if size is not None:
+        return memory.dump(start, size)
+    return memory.dump(start).rstrip(b"\x00")
+
+
+def load_image(stream, memory, fmt: str = "hex", start: int = 0) -> tuple:
+    if fmt == "hex":
+        return read_ihex(stream, memory)
+    if fmt == "bin":
+        return read_bin(stream, memory, start=start)
+    raise ImageFormatError(f"unknown image format `{fmt}`")
+
+
+def save_image(stream, memory, fmt: str = "hex", start: int = 0, size: int = None) -> int:
+    if fmt == "hex":
+        return write_ihex(memory, stream, start=start, size=size)
+    if fmt == "bin":
+        return write_bin(memory, stream, start=start, size=size)
+    raise ImageFormatError(f"unknown image format `{fmt}`")
@@ -99,7 +99,17 @@ class Instructions:
                 data = self.op.memory_read(data)
         return addr, data
 
+    def _bit_operand(self, bit: str) -> bool:
+        """Value of a bit operand; `/bit` is the complement"""
+        if bit[0] == "/":
+            return not self.op.bit_read(bit[1:])
+        return self.op.bit_read(bit)
+
     def mov(self, addr, data) -> bool:
+        if addr.upper() == "C":  # MOV C, bit
+            return self.op.bit_write("C", self.op.bit_read(data))
+        if data.upper() == "C":  # MOV bit, C
+            return self.op.bit_write(addr, self.op.bit_read("C"))
         addr, data = self._resolve_addressing_mode(addr, data)
         return self.op.memory_write(addr, data)
 
@@ -119,6 +129,8 @@ class Instructions:
         return self.op.memory_write(addr, result_hex)
 
     def anl(self, addr_1, addr_2) -> bool:
+        if addr_1.upper() == "C":  # ANL C, bit / ANL C, /bit
+            return self.op.bit_write("C", self.op.bit_read("C") and self._bit_operand(addr_2))
         addr_1, _ = self._resolve_addressing_mode(addr_1)
         addr_2, _ = self._resolve_addressing_mode(addr_2)
 
@@ -129,6 +141,8 @@ class Instructions:
         return self._check_flags(format(int(result, self._base), "08b"))
 
     def orl(self, addr_1, addr_2) -> bool:
+        if addr_1.upper() == "C":  # ORL C, bit / ORL C, /bit
+            return self.op.bit_write("C", self.op.bit_read("C") or self._bit_operand(addr_2))
         addr_1, _ = self._resolve_addressing_mode(addr_1)
         addr_2, _ = self._resolve_addressing_mode(addr_2)
 
@@ -138,7 +152,30 @@ class Instructions:
         self.op.memory_write(addr_1, result)
         return self._check_flags(format(int(result, self._base), "08b"))
 
+    def _xram_address(self, addr: str) -> int:
+        """
+        XRAM address of `@DPTR` or `@Ri`; `@Ri` is the low byte and P2 the high byte, as on the bus
+        """
+        if addr.upper() == "@DPTR":
+            return int(self.op.super_memory.DPTR)
+        return self.op.super_memory.read_direct(0xA0) << 8 | int(self.op.memory_read(addr[1:]))
+
+    def movx(self, addr, data) -> bool:
+        """Move from/to the external RAM"""
+        if addr.upper() == "A":  # MOVX A, @DPTR / @Ri
+            return self.op.memory_write("A", self.op.memory_xram.read_byte(self._xram_address(data)))
+        return self.op.memory_xram.write_byte(self._xram_address(addr), int(self.op.memory_read(data)))
+
+    def movc(self, addr, data) -> bool:
+        """Move code byte; `@A+DPTR` or `@A+PC`, PC of the next instruction"""
+        base = self.op.super_memory.DPTR if data.upper() == "@A+DPTR" else self.op.super_memory.PC
+        offset = int(self.op.memory_read("A"))
+        return self.op.memory_write(addr, self.op.memory_rom.read_byte((int(base) + offset) & 0xFFFF))
+
     def inc(self, addr) -> bool:
+        if addr.upper() == "DPTR":
+            next(self.op.super_memory.DPTR)
+            return True
         addr, _ = self._resolve_addressing_mode(addr)
         data = self.op.memory_read(addr)
         return self.op.memory_write(addr, data + 1)
@@ -188,20 +225,32 @@ class Instructions:
         data_decimal = int(str(data), 16)
         return self.op.memory_write(addr, f"0x{data_decimal}")
 
+    def nop(self) -> bool:
+        """No operation"""
+        return True
+
     def org(self, addr) -> bool:
         """Database directive origin"""
         return self.op.super_memory.PC(addr)
 
+    def db(self, data) -> bool:
+        """Data byte directive; the byte is in the ROM, nothing is executed"""
+        return True
+
     def setb(self, bit: str) -> bool:
         """Set a bit to true"""
         return self.op.bit_write(bit, True)
 
     def clr(self, bit: str) -> bool:
-        """Clears a bit"""
+        """Clears a bit, or the accumulator"""
+        if bit.upper() == "A":
+            return self.op.memory_write("A", 0x00)
         return self.op.bit_write(bit, False)
 
     def cpl(self, bit: str) -> bool:
-        """Complements a bit"""
+        """Complements a bit, or the accumulator"""
+        if bit.upper() == "A":
+            return self.op.memory_write("A", int(self.op.memory_read("A")) ^ 0xFF)
         _data = self.op.bit_read(bit)
         return self.op.bit_write(bit, not _data)
 
@@ -275,21 +324,54 @@ class Instructions:
         self.flags.CY = False
         return True
 
-    def jb(self, addr, label, *args, **kwargs) -> bool:
-        """Jump if bit is true"""
-        raise NotImplemented
+    def sjmp(self, label, *args, **kwargs) -> bool:
+        """Short jump"""
+        return kwargs.get("bounce_to_label")(label)
+
+    def ajmp(self, label, *args, **kwargs) -> bool:
+        """Absolute jump within the 2kB page"""
+        return kwargs.get("bounce_to_label")(label)
+
+    def ljmp(self, label, *args, **kwargs) -> bool:
+        """Long jump"""
+        return kwargs.get("bounce_to_label")(label)
+
+    def lcall(self, label, *args, **kwargs) -> bool:
+        """Long call; pushes the return address, the PC of the next instruction"""
+        self.op.super_memory.SP.push_word(int(self.op.super_memory.PC))
+        return kwargs.get("call_label")(label)
+
+    def acall(self, label, *args, **kwargs) -> bool:
+        """Absolute call within the 2kB page; same as `LCALL` once assembled"""
+        return self.lcall(label, *args, **kwargs)
+
+    def ret(self, *args, **kwargs) -> bool:
+        """Return from subroutine; pops the return address"""
+        return kwargs.get("bounce_to_address")(self.op.super_memory.SP.pop_word())
+
+    def reti(self, *args, **kwargs) -> bool:
+        """Return from interrupt; the interrupt priority logic isn't modelled, same as `RET`"""
+        return self.ret(*args, **kwargs)
+
+    def jb(self, bit, label, *args, **kwargs) -> bool:
+        """Jump if bit is set"""
         bounce_to_label = kwargs.get("bounce_to_label")
-        data = self.op.memory_read(addr)
-        if data:
+        if self.op.bit_read(bit):
             return bounce_to_label(label)
         return True
 
-    def jnb(self, addr, label, *args, **kwargs) -> bool:
-        """Jump if bit is false"""
-        raise NotImplemented
+    def jnb(self, bit, label, *args, **kwargs) -> bool:
+        """Jump if bit is not set"""
         bounce_to_label = kwargs.get("bounce_to_label")
-        data = self.op.memory_read(addr)
-        if data:
+        if not self.op.bit_read(bit):
+            return bounce_to_label(label)
+        return True
+
+    def jbc(self, bit, label, *args, **kwargs) -> bool:
+        """Jump if bit is set and clear the bit"""
+        bounce_to_label = kwargs.get("bounce_to_label")
+        if self.op.bit_read(bit):
+            self.op.bit_write(bit, False)
             return bounce_to_label(label)
         return True
 
@@ -0,0 +1,338 @@
+"""
+Opt-in memoization of pure subroutines
+
+`SubroutineMemoizer` sits on the calls of a controller. The first call of a routine runs it as
+usual while recording its inputs, the RAM locations its instructions read before writing them,
+and by the time it returns the bytes it changed, the instructions and the machine cycles. A later
+call with the same input values skips the routine: the changes are written back, the
+instructions and cycles are counted and the run goes on after the call.
+
+A, B, PSW (flags, register bank) and SP (stack frame) are always inputs. A routine that touches
+an SFR other than these and DPL/DPH, an SFR with a hook, or the external RAM (`MOVX`) is impure
+and isn't cached again; a write to the code memory drops every entry. With `verify` a hit runs
+the routine anyway and compares the outcome with the entry; a mismatch marks the routine impure.
+A reset of the controller drops the entries and a call being recorded; `ControllerPool.release`
+uninstalls the memoizer.
+"""
+
+from collections import OrderedDict
+
+from core.exceptions import SyntaxError
+from core.sfr import BIT_ADDRESSES, SFR_BASE
+
+# SFRs without side effects
+_PLAIN_SFRS = frozenset((0xE0, 0xF0, 0xD0, 0x81, 0x82, 0x83))
+# A, B, PSW, SP
+_BASE_INPUTS = (0xE0, 0xF0, 0xD0, 0x81)
+_SP = 0x81
+_DPTR = (0x82, 0x83)
+_IMPURE_OPCODES = frozenset(("MOVX",))
+_CALLS = frozenset(("LCALL", "ACALL"))
+_RETURNS = frozenset(("RET", "RETI"))
+
+
+class _Impure(Exception):
+    pass
+
+
+class _Routine:
+    def __init__(self, label: str) -> None:
+        self.label = label
+        # input locations of the recorded entries; a routine has one per path through it
+        self.shapes = []
+        self.impure = False
+        return
+
+    def __repr__(self) -> str:
+        return f"<Routine {self.label} shapes={len(self.shapes)} impure={self.impure}>"
+
+    pass
+
+
+class _Entry:
+    def __init__(self, changes: tuple, instructions: int, cycles: int, depth: int) -> None:
+        self.changes = changes
+        self.instructions = instructions
+        self.cycles = cycles
+        self.depth = depth
+        return
+
+    def __eq__(self, other) -> bool:
+        return (self.changes, self.instructions, self.cycles) == (other.changes, other.instructions, other.cycles)
+
+    pass
+
+
+class _Recording:
+    def __init__(self, routine: _Routine, controller, expected: _Entry = None) -> None:
+        self.routine = routine
+        self.before = bytes(controller.op.memory_ram.buffer)
+        self.instructions = controller.instructions
+        self.cycles = controller.cycles
+        # `call_depth` inside the routine; it has returned once the depth drops below
+        self.depth = controller.call_depth
+        self.max_depth = controller.call_depth
+        self.inputs = dict.fromkeys(_BASE_INPUTS)
+        self.written = set()
+        self.expected = expected
+        return
+
+    pass
+
+
+class SubroutineMemoizer:
+    """
+    controller: `Controller` whose calls are memoized
+    labels: labels of the routines to memoize
+    size: max. no. of cached calls; least recently used are dropped
+    verify: run the routines on hits too and compare the outcome with the entries
+    """
+
+    def __init__(self, controller, labels: list, size: int = 1024, verify: bool = False) -> None:
+        self.controller = controller
+        self.size = size
+        self.verify = verify
+        self._routines = {str(x).upper(): _Routine(str(x).upper()) for x in labels}
+        self._cache = OrderedDict()
+        self._recording = None
+        self._program = None
+        # code memory the entries were recorded against
+        self._code = None
+        self.metrics = {"hits": 0, "misses": 0, "recorded": 0, "invalidated": 0, "verified": 0, "mismatches": 0}
+        self._installed = False
+        return
+
+    def __repr__(self) -> str:
+        return f"<SubroutineMemoizer routines={len(self._routines)} entries={len(self._cache)}>"
+
+    def install(self) -> bool:
+        """Start memoizing the calls of the controller"""
+        if not self._installed:
+            self.controller._call_label = self._call_label
+            self.controller.op.memory_rom.add_listener(self._code_written)
+            self._installed = True
+        return True
+
+    def uninstall(self) -> bool:
+        if self._installed:
+            self._stop_recording()
+            del self.controller._call_label
+            self.controller.op.memory_rom.remove_listener(self._code_written)
+            self._installed = False
+        if self.controller._memoizer is self:
+            self.controller._memoizer = None
+        return True
+
+    def clear(self) -> bool:
+        """Drop the entries and forget which routines are impure"""
+        self._stop_recording()
+        self._cache.clear()
+        self._code = None
+        for routine in self._routines.values():
+            routine.shapes = []
+            routine.impure = False
+        return True
+
+    def stats(self) -> dict:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "entries": len(self._cache),
+            "impure": sorted(x.label for x in self._routines.values() if x.impure),
+            "hit_rate": self.metrics["hits"] / lookups if lookups else 0.0,
+        }
+
+    def _code_written(self, addr: int, size: int) -> None:
+        # every instruction rewrites its own bytes while syncing the PC; only a change counts
+        code = self._code
+        if code is None or self.controller.op.memory_rom.buffer[addr : addr + size] == code[addr : addr + size]:
+            return
+        self._code = None
+        if self._cache:
+            self._cache.clear()
+            for routine in self._routines.values():
+                routine.shapes = []
+            self.metrics["invalidated"] += 1
+        return
+
+    def _check_program(self) -> None:
+        program = self.controller._program_hash()
+        if program != self._program:
+            self.clear()
+            self._program = program
+        return
+
+    def _call_label(self, label):
+        controller = self.controller
+        routine = self._routines.get(label.upper(), None)
+        if routine is None or routine.impure or self._recording is not None:
+            return type(controller)._call_label(controller, label)
+        self._check_program()
+
+        buffer = controller.op.memory_ram.buffer
+        for shape in routine.shapes:
+            key = (routine.label, shape, bytes(buffer[x] for x in shape))
+            entry = self._cache.get(key, None)
+            if entry is None:
+                continue
+            self._cache.move_to_end(key)
+            self.metrics["hits"] += 1
+            if self.verify:
+                return self._start_recording(routine, label, entry)
+            return self._replay(entry)
+        self.metrics["misses"] += 1
+        return self._start_recording(routine, label)
+
+    def _replay(self, entry: _Entry) -> bool:
+        controller = self.controller
+        super_memory = controller.op.super_memory
+        buffer = controller.op.memory_ram.buffer
+        # return address pushed by the call; the changes restore SP as the `RET` would
+        sp = buffer[_SP]
+        addr = buffer[sp] << 8 | buffer[(sp - 1) & 0xFF]
+        idx = controller._jump_table()[1].get(addr, None)
+        if idx is None:
+            return controller._bounce_to_address(addr)
+        for x, value in entry.changes:
+            super_memory.write_direct(x, value)
+        controller._run_idx = idx
+        controller.instructions += entry.instructions
+        controller.cycles += entry.cycles
+        controller.max_call_depth = max(controller.max_call_depth, controller.call_depth + entry.depth)
+        return True
+
+    def _start_recording(self, routine: _Routine, label: str, expected: _Entry = None) -> bool:
+        controller = self.controller
+        result = type(controller)._call_label(controller, label)
+        self._recording = _Recording(routine, controller, expected)
+        controller._call = self._recording_call
+        return result
+
+    def _stop_recording(self) -> None:
+        if self._recording is not None:
+            self._recording = None
+            del self.controller._call
+        return
+
+    def _recording_call(self, func, *args, **kwargs) -> bool:
+        controller = self.controller
+        recording = self._recording
+        opcode = controller._callstack[controller._run_idx - 1][0]
+        try:
+            self._observe(recording, opcode, args)
+        except _Impure:
+            recording.routine.impure = True
+            self._stop_recording()
+            return controller._call(func, *args, **kwargs)
+        result = type(controller)._call(controller, func, *args, **kwargs)
+        recording.max_depth = max(recording.max_depth, controller.call_depth)
+        if controller.call_depth < recording.depth:
+            self._finish(recording)
+        return result
+
+    def _read(self, recording: _Recording, addr: int) -> None:
+        if addr >= SFR_BASE:
+            sfr = self.controller.op.super_memory.sfr
+            if addr not in _PLAIN_SFRS or sfr.read_hooks[addr - SFR_BASE] or sfr.write_hooks[addr - SFR_BASE]:
+                raise _Impure()
+        if addr not in recording.written:
+            recording.inputs[addr] = None
+        return
+
+    def _locations(self, arg: str) -> list:
+        """RAM locations of the operand `arg`; `[Ri, target]` of `@Ri`"""
+        op = self.controller.op
+        key = arg.upper()
+        if arg[0] == "#" or key == "@A+PC":
+            return []
+        if key in ("DPTR", "@DPTR", "@A+DPTR"):
+            return list(_DPTR)
+        if arg[0] == "@":
+            ri = op._direct_address(arg[1:])
+            return [ri, op.memory_ram.buffer[ri]]
+        if arg[0] == "/":
+            arg = arg[1:]
+        direct = op._direct_address(arg)
+        if direct is not None:
+            return [direct]
+        try:
+            return [BIT_ADDRESSES[op._bit(arg)][0]]
+        except (SyntaxError, ValueError, IndexError):
+            return []
+
+    def _observe(self, recording: _Recording, opcode: str, args: tuple) -> None:
+        """Record the inputs of the instruction about to run"""
+        if opcode in _IMPURE_OPCODES:
+            raise _Impure()
+        buffer = self.controller.op.memory_ram.buffer
+        args = [x for x in args if x != "offset"]
+        if opcode in _RETURNS:
+            return
+        if opcode in self.controller._jump_methods and args:
+            args = args[:-1]  # the target label
+        if opcode in _CALLS:
+            recording.written.update(((buffer[_SP] + 1) & 0xFF, (buffer[_SP] + 2) & 0xFF))
+        elif opcode == "PUSH":
+            recording.written.add((buffer[_SP] + 1) & 0xFF)
+        elif opcode == "POP":
+            self._read(recording, buffer[_SP])
+
+        # `MOV dest, src` and `POP dest` overwrite the destination; `MOV bit, C` doesn't
+        write_only = opcode == "POP" or (opcode == "MOV" and len(args) == 2 and args[1].upper() != "C")
+        for idx, arg in enumerate(args):
+            locations = self._locations(arg)
+            if idx == 0 and write_only:
+                if arg[0] == "@":
+                    self._read(recording, locations[0])
+                    locations = locations[1:]
+                for addr in locations:
+                    if addr >= SFR_BASE:
+                        self._read(recording, addr)  # impure SFRs
+                    recording.written.add(addr)
+                continue
+            for addr in locations:
+                self._read(recording, addr)
+        return
+
+    def _finish(self, recording: _Recording) -> None:
+        controller = self.controller
+        self._stop_recording()
+        after = controller.op.memory_ram.buffer
+        before = recording.before
+        # a location written with the value it had still has to be written on a replay
+        changed = {x for x in range(len(before)) if after[x] != before[x]}
+        changes = tuple((x, after[x]) for x in sorted(changed | recording.written))
+        sfr = controller.op.super_memory.sfr
+        for x, _ in changes:
+            if x >= SFR_BASE and (x not in _PLAIN_SFRS or sfr.write_hooks[x - SFR_BASE]):
+                recording.routine.impure = True
+                return
+        entry = _Entry(
+            changes,
+            controller.instructions - recording.instructions,
+            controller.cycles - recording.cycles,
+            recording.max_depth - recording.depth + 1,
+        )
+        routine = recording.routine
+        shape = tuple(sorted(recording.inputs))
+        key = (routine.label, shape, bytes(before[x] for x in shape))
+        if recording.expected is not None:
+            if self._cache.get(key, None) == entry:
+                self.metrics["verified"] += 1
+            else:
+                self.metrics["mismatches"] += 1
+                routine.impure = True
+                for x in [x for x in self._cache if x[0] == routine.label]:
+                    del self._cache[x]
+            return
+        if shape not in routine.shapes:
+            routine.shapes.append(shape)
+        if self._code is None:
+            self._code = bytes(controller.op.memory_rom.buffer)
+        self._cache[key] = entry
+        self.metrics["recorded"] += 1
+        while len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+        return
+
+    pass
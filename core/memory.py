@@ -1,15 +1,21 @@
+import os
 import re
+import mmap
 import textwrap
+import threading
+from bisect import bisect_right
 
 # from core.flags import flags
 from core.basic_memory import Byte
 from core.exceptions import InvalidMemoryAddress, MemoryLimitExceeded
-from core.util import decompose_byte, get_byte_sequence
+from core.sfr import BIT_ADDRESSES, SFR_BASE, SFRMap
+from core.util import HEX8, decode_bytes, hex16, hexconvert, join_word, split_word
 
 """
 8051 has
 
-4kB ROM = 0000-0FFF
+4kB ROM = 0000-0FFF; the simulator models the full 64kB code space = 0000-FFFF
+64kB external RAM (XRAM) = 0000-FFFF; MOVX
 128 Bytes RAM = 00-7F
 Another 128 Bytes RAM for accumulator and SFR = 7f-FF
 4 Register Banks = R0-R7 = 32 general purpose registers = 32 Bytes
@@ -18,8 +24,78 @@ Another 128 Bytes RAM for accumulator and SFR = 7f-FF
 """
 
 
+class MemoryCell(Byte):
+    """
+    `Byte` view into a single cell of the `Memory` buffer
+    """
+
+    _bytes = 1
+    _base = 16
+    _format_spec = "#04x"
+    _format_spec_bin = "#010b"
+    _memory_limit_hex = "FF"
+    _memory_limit = 255
+
+    def __init__(self, memory, index: int) -> None:
+        self._memory = memory
+        self._buffer = memory._buffer
+        self._index = index
+        self._page = index >> memory._PAGE_SHIFT
+        return
+
+    def _mark(self) -> None:
+        # slow path of the writes; the dirty bit is already set
+        memory = self._memory
+        if memory._page_generation[self._page] != memory._generation:
+            memory._log_page(self._page)
+        if memory._listeners:
+            memory._notify(self._index, 1)
+        return
+
+    @property
+    def _data(self) -> str:
+        return HEX8[self._buffer[self._index]]
+
+    @_data.setter
+    def _data(self, val: str) -> None:
+        self._buffer[self._index] = int(val, self._base) & 0xFF
+        memory = self._memory
+        memory._dirty[self._page] = 1
+        if memory._page_generation[self._page] != memory._generation or memory._listeners:
+            self._mark()
+
+    @property
+    def data(self) -> str:
+        return self._data
+
+    @data.setter
+    def data(self, val: str) -> None:
+        val = hexconvert(val)
+        self._verify(val)
+        self._buffer[self._index] = int(str(val), self._base)
+        memory = self._memory
+        memory._dirty[self._page] = 1
+        if memory._page_generation[self._page] != memory._generation or memory._listeners:
+            self._mark()
+        return
+
+    pass
+
+
 class Memory(dict):
-    def __init__(self, memory_size=65536, starting_address="0x0000", _bytes=2, *args, **kwargs) -> None:
+    """
+    Memory space backed by a `bytearray`; the cells are materialized as `MemoryCell` views on
+    access, while `Memory.load` and `Memory.dump` copy raw bytes straight to/from the buffer.
+
+    Writes are tracked per page of `PAGE_SIZE` bytes (a row of the UI grid): a dirty bitmap
+    cleared on demand, and the generation of the last write to every page. `checkpoint` starts
+    a new generation; `changed_pages` lists the pages written since a generation.
+    """
+
+    PAGE_SIZE = 16
+    _PAGE_SHIFT = 4
+
+    def __init__(self, memory_size=65536, starting_address="0x0000", _bytes=2, *args, buffer=None, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self._bytes = 1
         self._base = 16
@@ -31,19 +107,32 @@ class Memory(dict):
         self._format_spec_bin = f"#0{2 + _bytes * 4}b"
         self._memory_limit = int(starting_address, 16) + self._memory_size
         self._memory_limit_hex = format(self._memory_limit, self._format_spec)
+        self._offset = int(starting_address, 16)
+        # a `bytearray`, or any writable buffer of `memory_size` bytes e.g. an `mmap` of a file
+        self._buffer = bytearray(memory_size) if buffer is None else buffer
+        if len(self._buffer) != memory_size:
+            raise MemoryLimitExceeded()
+        self._listeners = []
+
+        _pages = (memory_size + self.PAGE_SIZE - 1) >> self._PAGE_SHIFT
+        self._dirty = bytearray(_pages)
+        self._generation = 1
+        self._page_generation = [0] * _pages
+        # pages in the order of their first write in every generation; sorted by generation
+        self._log_generations = []
+        self._log_pages = []
+        # guards the log against a reader checkpointing while a run writes, e.g. a job's stream
+        self._log_lock = threading.Lock()
         return
 
     def __getitem__(self, addr: str) -> str:
         addr = self._verify(addr)
         if addr not in self:
-            super().__setitem__(addr, Byte(self._default_mem))
+            super().__setitem__(addr, MemoryCell(self, int(addr, self._base) - self._offset))
         return super().__getitem__(addr)
 
     def __setitem__(self, addr: str, value: str) -> None:
-        addr = self._verify(addr)
-        if addr not in self:
-            super().__setitem__(addr, Byte(value))
-        return super().__getitem__(addr).write(value)
+        return self.__getitem__(addr).write(value)
 
     def _verify(self, value: str) -> None:
         if not re.fullmatch("^0[x|X][0-9a-fA-F]+", str(value)):
@@ -52,9 +141,130 @@ class Memory(dict):
             raise MemoryLimitExceeded()
         return format(int(str(value), self._base), self._format_spec)
 
+    def _verify_range(self, start: int, size: int) -> int:
+        if start < self._offset or size < 0:
+            raise InvalidMemoryAddress()
+        if start + size - 1 > self._memory_limit:
+            raise MemoryLimitExceeded()
+        return start - self._offset
+
+    def _log_page(self, page: int) -> None:
+        with self._log_lock:
+            self._page_generation[page] = self._generation
+            self._log_generations.append(self._generation)
+            self._log_pages.append(page)
+        return
+
+    def _mark(self, idx: int, size: int) -> None:
+        first, last = idx >> self._PAGE_SHIFT, (idx + size - 1) >> self._PAGE_SHIFT
+        self._dirty[first : last + 1] = b"\x01" * (last - first + 1)
+        for page in range(first, last + 1):
+            if self._page_generation[page] != self._generation:
+                self._log_page(page)
+        if self._listeners:
+            self._notify(idx, size)
+        return
+
+    def _compact_log(self) -> None:
+        pages = [x for x in range(len(self._page_generation)) if self._page_generation[x]]
+        pages.sort(key=self._page_generation.__getitem__)
+        self._log_generations = [self._page_generation[x] for x in pages]
+        self._log_pages = pages
+        return
+
+    @property
+    def generation(self) -> int:
+        """Generation the writes are currently recorded in"""
+        return self._generation
+
+    def checkpoint(self) -> int:
+        """
+        Close the current generation; returns it for `changed_pages`
+        """
+        with self._log_lock:
+            generation = self._generation
+            self._generation += 1
+            if len(self._log_pages) > 2 * len(self._page_generation) + 64:
+                self._compact_log()
+        return generation
+
+    def changed_pages(self, since: int) -> list:
+        """
+        Start addresses of the pages written after the generation `since`, in ascending order
+        """
+        with self._log_lock:
+            idx = bisect_right(self._log_generations, since)
+            pages = sorted(set(self._log_pages[idx:]))
+        return [(x << self._PAGE_SHIFT) + self._offset for x in pages]
+
+    def dirty_pages(self, clear: bool = False) -> list:
+        """
+        Start addresses of the pages written since the dirty bitmap was last cleared
+        """
+        pages = []
+        page = self._dirty.find(1)
+        while page != -1:
+            pages.append((page << self._PAGE_SHIFT) + self._offset)
+            page = self._dirty.find(1, page + 1)
+        if clear:
+            self.clear_dirty()
+        return pages
+
+    def clear_dirty(self) -> bool:
+        self._dirty[:] = bytes(len(self._dirty))
+        return True
+
+    def _notify(self, idx: int, size: int) -> None:
+        for listener in self._listeners:
+            listener(idx + self._offset, size)
+        return
+
+    def add_listener(self, listener) -> bool:
+        """
+        Register `listener(addr, size)` to be called after every write to the memory
+        """
+        self._listeners.append(listener)
+        return True
+
+    def remove_listener(self, listener) -> bool:
+        self._listeners.remove(listener)
+        return True
+
+    @property
+    def buffer(self) -> bytearray:
+        return self._buffer
+
     def get(self, addr: str) -> Byte:
         return self.__getitem__(addr)
 
+    def read_byte(self, addr: int) -> int:
+        """Value at the integer address `addr`; no `MemoryCell` is materialized"""
+        return self._buffer[addr - self._offset]
+
+    def write_byte(self, addr: int, value: int) -> bool:
+        """Write the int `value` at the integer address `addr`; no `MemoryCell` is materialized"""
+        idx = addr - self._offset
+        self._buffer[idx] = value & 0xFF
+        page = idx >> self._PAGE_SHIFT
+        self._dirty[page] = 1
+        if self._page_generation[page] != self._generation or self._listeners:
+            self._mark(idx, 1)
+        return True
+
+    def flush(self) -> bool:
+        """Write a file backed buffer back to its file"""
+        flush = getattr(self._buffer, "flush", None)
+        if flush is not None:
+            flush()
+        return True
+
+    def cell(self, addr: int) -> MemoryCell:
+        """`MemoryCell` of the integer address `addr`"""
+        cell = dict.get(self, format(addr, self._format_spec), None)
+        if cell is None:
+            return self.__getitem__(format(addr, "#x"))
+        return cell
+
     def sort(self):
         return dict(sorted(self.items(), key=lambda x: int(str(x[0]), 16)))
 
@@ -64,6 +274,49 @@ class Memory(dict):
     def write(self, *args, **kwargs):
         return self.__setitem__(*args, **kwargs)
 
+    def load(self, start: int, data: bytes) -> int:
+        """
+        Copy raw `data` into the memory starting at the integer address `start`
+
+        The range is validated once; returns the number of bytes written.
+        """
+        idx = self._verify_range(start, len(data))
+        self._buffer[idx : idx + len(data)] = data
+        if data:
+            self._mark(idx, len(data))
+        return len(data)
+
+    def replace(self, data: bytes) -> int:
+        """
+        Overwrite the whole memory with `data`; only the pages that differ are written, returns
+        the no. of pages written
+        """
+        buffer = self._buffer
+        if len(data) != len(buffer):
+            raise MemoryLimitExceeded()
+        if buffer == data:
+            return 0
+        written = 0
+        chunk = self.PAGE_SIZE * 64
+        for x in range(0, len(buffer), chunk):
+            if buffer[x : x + chunk] == data[x : x + chunk]:
+                continue
+            for page in range(x, min(x + chunk, len(buffer)), self.PAGE_SIZE):
+                if buffer[page : page + self.PAGE_SIZE] != data[page : page + self.PAGE_SIZE]:
+                    buffer[page : page + self.PAGE_SIZE] = data[page : page + self.PAGE_SIZE]
+                    self._mark(page, self.PAGE_SIZE)
+                    written += 1
+        return written
+
+    def dump(self, start: int = None, size: int = None) -> bytes:
+        """Copy of the raw memory contents from the integer address `start`"""
+        if start is None:
+            start = self._offset
+        if size is None:
+            size = self._memory_limit - start + 1
+        idx = self._verify_range(start, size)
+        return bytes(self._buffer[idx : idx + size])
+
     pass
 
 
@@ -96,23 +349,19 @@ class RegisterPair:
         return self._registers.get(str(addr).upper())
 
     def read_pair(self) -> str:
-        bin1 = format(int(str(self._registers.get(self._reg_1).read()), self._base), f"0{self._bytes * 4}b")
-        bin2 = format(int(str(self._registers.get(self._reg_2).read()), self._base), f"0{self._bytes * 4}b")
-        bin_total = "".join(["0b", bin1, bin2])
-        return f'0x{format(int(bin_total, 2), f"0{self._bytes * 2}x")}'
+        high, low = self._registers.get(self._reg_1).read(), self._registers.get(self._reg_2).read()
+        return hex16(join_word(int(high), int(low)))
 
     def write(self, data, addr) -> bool:
         return self._registers.get(str(addr).upper()).__call__(data)
 
     def write_pair(self, data) -> bool:
-        mem_size = 8
-        binary_data = format(int(str(data), self._base), f"0{self._bytes*8}b")
-        data_1, data_2 = [
-            format(int(binary_data[mem_size * x : mem_size * (x + 1)], 2), f"#0{int(mem_size/2)}x")
-            for x in range(0, int(len(binary_data) / mem_size))
-        ]
-        self._registers.get(str(self._reg_1).upper()).__call__(data_1)
-        self._registers.get(str(self._reg_2).upper()).__call__(data_2)
+        value = int(str(data), self._base)
+        if value > 0xFFFF:
+            raise MemoryLimitExceeded()
+        data_1, data_2 = split_word(value)
+        self._registers.get(str(self._reg_1).upper()).__call__(HEX8[data_1])
+        self._registers.get(str(self._reg_2).upper()).__call__(HEX8[data_2])
         return True
 
 
@@ -180,31 +429,30 @@ class LinkedRegister:
         return self.read().bin()
 
     def bit_get(self, bit: str) -> bool:
-        _binary_data = format(self.read(), "08b")
-        bit = len(_binary_data) - int(bit) - 1
-        _data = bool(int(_binary_data[int(bit)]))
-        print(f"Getting {_binary_data[int(bit)]} / {_data} from {_binary_data}")
-        return _data
+        return bool(int(self.read()) & 1 << int(bit))
 
     def bit_set(self, bit: str, val: str) -> bool:
-        val = str(int(val))
-        _binary_data = format(self.read(), "08b")
-        bit = len(_binary_data) - int(bit) - 1
-        print(f"Setting {_binary_data[int(bit)]} -> {val}")
-        _new_binary_data = _binary_data[: int(bit)] + val + _binary_data[int(bit) + 1 :]
-        print(f"Setting {_binary_data} -> {_new_binary_data}")
-        _hex_data = format(int(_new_binary_data, 2), "#04x")
-        return self.write(_hex_data)
+        cell = self.read()
+        mask = 1 << int(bit)
+        cell._data = HEX8[int(cell) | mask if int(val) else int(cell) & ~mask]
+        return True
 
     pass
 
 
 class DataPointer:
+    """
+    16-bit `DPTR`; an integer register over `DPH`/`DPL`, the SFRs it's stored in
+    """
+
     def __init__(self, memory_ram: dict, addr: list, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.memory_ram = memory_ram
         self._DPL = LinkedRegister(memory_ram, addr[0])
         self._DPH = LinkedRegister(memory_ram, addr[1])
+        self._low = memory_ram.cell(int(addr[0], 16))
+        self._high = memory_ram.cell(int(addr[1], 16))
+        self._buffer = memory_ram.buffer
         self._bytes = 2
         self._base = 16
         return
@@ -215,45 +463,46 @@ class DataPointer:
     def __str__(self) -> str:
         return self.__repr__()
 
-    def __add__(self, val: int, *args, **kwargs) -> str:
+    def __int__(self) -> int:
+        return self.value
+
+    def __index__(self) -> int:
+        return self.value
+
+    @property
+    def value(self) -> int:
+        return self._buffer[self._high._index] << 8 | self._buffer[self._low._index]
+
+    @value.setter
+    def value(self, value: int) -> None:
+        self._low._data = HEX8[value & 0xFF]
+        self._high._data = HEX8[value >> 8 & 0xFF]
+
+    def __add__(self, val: int, *args, **kwargs):
         """
-        val: `int`
+        val: `int`; in place, wraps around at 0xFFFF
         """
-        data_int = int(self._data, self._base) + val
-        if data_int > self._memory_limit:
-            data_int -= self._memory_limit
-        elif data_int < 0:
-            data_int += self._memory_limit
-        self._data = format(data_int, self._format_spec)
-        return self._data
+        self.value = self.value + val
+        return self
 
-    def __sub__(self, val: int, *args, **kwargs) -> str:
+    def __sub__(self, val: int, *args, **kwargs):
         """
-        val: `int`
+        val: `int`; in place, wraps around at 0x0000
         """
-        data_int = int(self._data, self._base) - val
-        if data_int > self._memory_limit:
-            data_int -= self._memory_limit
-        elif data_int < 0:
-            data_int += self._memory_limit
-        self._data = format(data_int, self._format_spec)
-        return self._data
+        self.value = self.value - val
+        return self
 
     def __next__(self):
         return self.__add__(1)
 
-    def read(self, *args, **kwargs) -> Byte:
-        bin1 = format(int(str(self._DPL.read()), self._base), f"0{8*self._bytes}b")  # single byte
-        bin2 = format(int(str(self._DPH.read()), self._base), f"0{8*self._bytes}b")  # single byte
-        bin_total = "".join(["0b", bin2, bin1])
-        return format(int(bin_total, 2), f"#0{self._bytes*2 + 2}x")
+    def read(self, *args, **kwargs) -> str:
+        return hex16(self.value)
 
-    def write(self, data, *args) -> Byte:
-        data = decompose_byte(data)
-        if len(data) != 2:
+    def write(self, data, *args) -> bool:
+        value = data if isinstance(data, int) else int(str(data), self._base)
+        if not 0 <= value <= 0xFFFF:
             raise InvalidMemoryAddress
-        self._DPL.write(data[0])
-        self._DPH.write(data[1])
+        self.value = value
         return True
 
 
@@ -371,15 +620,25 @@ class ProgramStatusWord:
 
 
 class StackPointer:
+    """
+    `SP`; the stack grows upwards in the internal RAM at 0x00-0x7F, a push past 0x7F (into the
+    SFRs) wraps around into the register banks and is counted in `overflows`
+    """
+
+    STACK_TOP = 0x7F
+
     def __init__(self, memory, addr, _bytes=1, _default="0x07", *args, **kwargs) -> None:
         self.memory = memory
         self._SP = LinkedRegister(memory, addr)
         self._SP.write(_default)
+        self._cell = memory.cell(int(addr, 16))
+        self._buffer = memory.buffer
         self._memory_limit = 256
         self._base = 16
         self._bytes = _bytes
         self._format_spec = f"#0{2 + _bytes * 2}x"
         self._format_spec_bin = f"#0{2 + _bytes * 4}b"
+        self.overflows = 0
 
     def __repr__(self) -> str:
         return str(self._SP)
@@ -389,8 +648,9 @@ class StackPointer:
         val: `int`
         """
         data_int = int(str(self._SP), self._base) + val
-        if data_int >= self._memory_limit:
-            data_int -= self._memory_limit
+        if data_int > self.STACK_TOP:
+            data_int = 0
+            self.overflows += 1
         elif data_int < 0:
             data_int += self._memory_limit
         self._SP.write(format(data_int, self._format_spec))
@@ -401,10 +661,8 @@ class StackPointer:
         val: `int`
         """
         data_int = int(str(self._SP), self._base) - val
-        if data_int > self._memory_limit:
-            data_int -= self._memory_limit
-        elif data_int < 0:
-            data_int += self._memory_limit
+        if data_int < 0:
+            data_int = self.STACK_TOP
         self._SP.write(format(data_int, self._format_spec))
         return self._SP
 
@@ -422,11 +680,190 @@ class StackPointer:
         self.__next__()
         return self.memory.write(self._SP, data)
 
+    def push(self, value: int) -> bool:
+        """Push the int `value`"""
+        sp = self._buffer[self._cell._index] + 1
+        if sp > self.STACK_TOP:
+            sp = 0
+            self.overflows += 1
+        self._cell._data = HEX8[sp]
+        return self.memory.write_byte(sp, value)
+
+    def pop(self) -> int:
+        """Pop an int"""
+        sp = self._buffer[self._cell._index]
+        self._cell._data = HEX8[sp - 1 if sp else self.STACK_TOP]
+        return self._buffer[sp]
+
+    def push_word(self, value: int) -> bool:
+        """Push a 16-bit address; the low byte first, as `LCALL`/`ACALL`"""
+        self.push(value & 0xFF)
+        return self.push(value >> 8 & 0xFF)
+
+    def pop_word(self) -> int:
+        """Pop a 16-bit address pushed by `push_word`, as `RET`/`RETI`"""
+        high = self.pop()
+        return high << 8 | self.pop()
+
+
+class RegisterFile:
+    """
+    `R0`-`R7` of the 4 register banks at 0x00-0x1F
+
+    The bank is selected by `RS1`/`RS0`, bits 4 and 3 of the PSW, so the base address of the
+    active bank is `PSW & 0x18`; it's read straight from the RAM buffer, which stays right
+    whichever way the PSW is written (cells, `Memory.load`, snapshots).
+    """
+
+    PSW = 0xD0
+    BANK_MASK = 0x18
+
+    def __init__(self, memory_ram) -> None:
+        self._buffer = memory_ram.buffer
+        # `MemoryCell` of every register; `cells[bank * 8 + n]`
+        self.cells = [memory_ram[HEX8[x]] for x in range(32)]
+        return
+
+    def __repr__(self) -> str:
+        return f"<RegisterFile bank={self.bank}>"
+
+    @property
+    def bank(self) -> int:
+        return (self._buffer[self.PSW] & self.BANK_MASK) >> 3
+
+    @property
+    def bank_base(self) -> int:
+        return self._buffer[self.PSW] & self.BANK_MASK
+
+    def index(self, n: int) -> int:
+        """RAM address of `Rn` in the active bank"""
+        return (self._buffer[self.PSW] & self.BANK_MASK) + n
+
+    def cell(self, n: int) -> MemoryCell:
+        return self.cells[(self._buffer[self.PSW] & self.BANK_MASK) + n]
+
+    def read(self, n: int) -> int:
+        return self._buffer[(self._buffer[self.PSW] & self.BANK_MASK) + n]
+
+    def write(self, n: int, value: int) -> bool:
+        self.cells[(self._buffer[self.PSW] & self.BANK_MASK) + n]._data = HEX8[value & 0xFF]
+        return True
+
+    def banks(self) -> dict:
+        """`{"00": {"R0": cell, ...}, ...}` by `RS1`/`RS0`"""
+        return {format(bank, "02b"): {f"R{x}": self.cells[bank * 8 + x] for x in range(8)} for bank in range(4)}
+
+    pass
+
+
+class GeneralPurposeRegister:
+    """
+    `Rn` of the register bank selected by `RS1` and `RS0`
+    """
+
+    def __init__(self, register_file: RegisterFile, n: int) -> None:
+        self._register_file = register_file
+        self._cells = register_file.cells
+        self._buffer = register_file._buffer
+        self._n = n
+        return
+
+    def __repr__(self) -> str:
+        return f"{self.read()}"
+
+    def read(self, *args) -> Byte:
+        return self._cells[(self._buffer[RegisterFile.PSW] & RegisterFile.BANK_MASK) + self._n]
+
+    def write(self, data, *args) -> bool:
+        return self.read().update(data)
+
+    pass
+
+
+class CarryBit:
+    """
+    `C` bit; the `CY` flag of the `PSW`
+    """
+
+    def __init__(self, PSW: ProgramStatusWord) -> None:
+        self._PSW = PSW
+        return
+
+    def __repr__(self) -> str:
+        return f"{self.bit_get()}"
+
+    def bit_get(self, *args) -> bool:
+        return self._PSW.get("CY")
+
+    def bit_set(self, val, *args) -> bool:
+        return self._PSW._setitem_flag("CY", val)
+
+    pass
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("numpy is needed for the array views of the memory; `pip install numpy`")
+    return numpy
+
+
+def diff(image_a, image_b) -> tuple:
+    """
+    Bytes that differ between two images of a memory space; `Memory.dump`/`read_block` copies,
+    `as_numpy` views or any other buffers of the same size
+
+    returns: (addresses, values in `image_a`, values in `image_b`); `numpy` arrays when numpy is
+    installed, lists otherwise
+    """
+    if len(image_a) != len(image_b):
+        raise MemoryLimitExceeded()
+    try:
+        numpy = _numpy()
+    except ImportError:
+        numpy = None
+    if numpy is not None:
+        a = numpy.frombuffer(image_a, dtype=numpy.uint8)
+        b = numpy.frombuffer(image_b, dtype=numpy.uint8)
+        addresses = numpy.flatnonzero(a != b)
+        return addresses, a[addresses], b[addresses]
+
+    a, b = memoryview(image_a).cast("B"), memoryview(image_b).cast("B")
+    addresses = []
+    chunk = Memory.PAGE_SIZE * 64
+    for x in range(0, len(a), chunk):
+        if a[x : x + chunk] != b[x : x + chunk]:
+            addresses.extend(y for y in range(x, min(x + chunk, len(a))) if a[y] != b[y])
+    return addresses, [a[x] for x in addresses], [b[x] for x in addresses]
+
+
+def map_file(path: str, size: int = 65536) -> mmap.mmap:
+    """
+    Shared writable `mmap` of the file `path`, created or extended to `size` bytes; the writes go
+    straight to the file
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT)
+    try:
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        return mmap.mmap(fd, size)
+    finally:
+        os.close(fd)
+
 
 class SuperMemory:
-    def __init__(self) -> None:
-        self.memory_rom = Memory(4096, "0x0000")
+    """
+    xram: backing of the 64kB external RAM; `None` for a `bytearray`, the path of a file to
+    `mmap`, or a writable buffer of 64kB
+    """
+
+    def __init__(self, xram=None) -> None:
+        self.memory_rom = Memory(65536, "0x0000")
         self.memory_ram = Memory(256, "0x00")
+        if isinstance(xram, (str, os.PathLike)):
+            xram = map_file(xram)
+        self.memory_xram = Memory(65536, "0x0000", buffer=xram)
 
         self.A = LinkedRegister(self.memory_ram, "0xE0")
         self.B = LinkedRegister(self.memory_ram, "0xF0")
@@ -438,152 +875,136 @@ class SuperMemory:
         self.PSW = ProgramStatusWord(self.memory_ram, "0x0D0")
         self._define_general_purpose_registers()
         self._define_flag_bits()
+        self._define_special_function_registers()
+        # power-on contents of the RAM; SFR defaults e.g. SP
+        self._reset_ram = bytes(self.memory_ram.buffer)
 
     def __repr__(self) -> str:
         return "<SuperMemory>"
 
+    @property
+    def spaces(self) -> dict:
+        """Memory spaces by name"""
+        return {"rom": self.memory_rom, "ram": self.memory_ram, "xram": self.memory_xram}
+
+    def space(self, name: str) -> Memory:
+        memory = self.spaces.get(str(name).lower(), None)
+        if memory is None:
+            raise InvalidMemoryAddress(f"unknown memory space `{name}`")
+        return memory
+
+    def as_numpy(self, space: str, writable: bool = False):
+        """
+        Zero-copy `numpy.uint8` view of the memory space `space`; indexed by offset from the start
+        of the space. Read-only unless `writable`; writes through the view aren't page tracked
+        """
+        numpy = _numpy()
+        view = numpy.frombuffer(self.space(space).buffer, dtype=numpy.uint8)
+        view.flags.writeable = writable
+        return view
+
+    def read_block(self, space: str, start: int, size: int) -> bytes:
+        """
+        Raw bytes of the memory space `space` from the integer address `start`; `size` is clamped
+        to the end of the space
+        """
+        memory = self.space(space)
+        end = memory._offset + len(memory.buffer)
+        return memory.dump(start, max(0, min(size, end - start)))
+
+    def write_block(self, space: str, start: int, data, encoding: str = "raw") -> int:
+        """
+        Copy `data` into the memory space `space` from the integer address `start`; raw bytes, or a
+        `hex`/`base64` string. The range is validated once and the bytes are copied with a single
+        slice assignment; returns the no. of bytes written
+        """
+        return self.space(space).load(start, decode_bytes(data, encoding))
+
+    def direct_cell(self, addr: int) -> Byte:
+        """
+        Byte at the direct address `addr`; the `MemoryCell` unless the SFR has a read hook, then
+        a copy of the value it returns
+        """
+        if addr >= SFR_BASE:
+            hook = self._sfr_read_hooks[addr - SFR_BASE]
+            if hook is not None:
+                return Byte(HEX8[hook(self._ram_buffer[addr]) & 0xFF])
+        cell = self._direct_cells[addr]
+        if cell is None:
+            cell = self._direct_cells[addr] = self.memory_ram.cell(addr)
+        return cell
+
+    def read_direct(self, addr: int) -> int:
+        """Value at the direct address `addr`, 0x00-0xFF"""
+        if addr >= SFR_BASE:
+            hook = self._sfr_read_hooks[addr - SFR_BASE]
+            if hook is not None:
+                return hook(self._ram_buffer[addr]) & 0xFF
+        return self._ram_buffer[addr]
+
+    def write_direct(self, addr: int, value) -> bool:
+        """
+        Write `value` to the direct address `addr`; an int, or a hex string / `Byte` validated
+        like a cell write
+        """
+        if addr >= SFR_BASE:
+            hook = self._sfr_write_hooks[addr - SFR_BASE]
+            if hook is not None:
+                value = hook(value if isinstance(value, int) else int(Byte(str(value))))
+                if value is None:
+                    return True
+        cell = self._direct_cells[addr]
+        if cell is None:
+            cell = self._direct_cells[addr] = self.memory_ram.cell(addr)
+        if isinstance(value, int):
+            cell._data = HEX8[value & 0xFF]
+            return True
+        return cell.update(value)
+
+    def bit_read(self, bit: int) -> bool:
+        """Bit at the bit address `bit`"""
+        addr, mask = BIT_ADDRESSES[bit]
+        return bool(self.read_direct(addr) & mask)
+
+    def bit_write(self, bit: int, value) -> bool:
+        """Set/clear the bit at the bit address `bit`; read-modify-write of the stored byte"""
+        addr, mask = BIT_ADDRESSES[bit]
+        data = self._ram_buffer[addr]
+        return self.write_direct(addr, data | mask if value else data & ~mask)
+
+    def reset(self) -> bool:
+        """Power-on state in place; the registers and the memory objects are kept, the SFR hooks dropped"""
+        self.memory_ram.replace(self._reset_ram)
+        self.memory_rom.replace(bytes(len(self.memory_rom.buffer)))
+        if isinstance(self.memory_xram.buffer, bytearray):  # a mapped file keeps its data
+            self.memory_xram.replace(bytes(len(self.memory_xram.buffer)))
+        self.SP.overflows = 0
+        self.PC("0x0000")
+        # a pooled controller must not call the peripherals of its last user
+        self.sfr = SFRMap()
+        self._sfr_read_hooks = self.sfr.read_hooks
+        self._sfr_write_hooks = self.sfr.write_hooks
+        return True
+
     def _define_flag_bits(self):
         """Method to define the `C` bit for the `CY` flag."""
         # Define `C` carry flag
-        setattr(self.C.__func__, "bit_get", lambda *args: self.PSW.get("CY"))
-        setattr(self.C.__func__, "bit_set", lambda val, *args: self.PSW._setitem_flag("CY", val))
+        self.C = CarryBit(self.PSW)
 
-    def _define_general_purpose_registers(self):
-        self._general_purpose_registers = {
-            "00": {f"R{i}": self.memory_ram[x] for i, x in enumerate(get_byte_sequence("0x00", 8))},
-            "01": {f"R{i}": self.memory_ram[x] for i, x in enumerate(get_byte_sequence("0x08", 8))},
-            "10": {f"R{i}": self.memory_ram[x] for i, x in enumerate(get_byte_sequence("0x10", 8))},
-            "11": {f"R{i}": self.memory_ram[x] for i, x in enumerate(get_byte_sequence("0x18", 8))},
-        }
-        setattr(
-            self.R0.__func__,
-            "read",
-            lambda *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            ).get("R0"),
-        )
-        setattr(
-            self.R1.__func__,
-            "read",
-            lambda *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            ).get("R1"),
-        )
-        setattr(
-            self.R2.__func__,
-            "read",
-            lambda *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            ).get("R2"),
-        )
-        setattr(
-            self.R3.__func__,
-            "read",
-            lambda *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            ).get("R3"),
-        )
-        setattr(
-            self.R4.__func__,
-            "read",
-            lambda *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            ).get("R4"),
-        )
-        setattr(
-            self.R5.__func__,
-            "read",
-            lambda *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            ).get("R5"),
-        )
-        setattr(
-            self.R6.__func__,
-            "read",
-            lambda *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            ).get("R6"),
-        )
-        setattr(
-            self.R7.__func__,
-            "read",
-            lambda *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            ).get("R7"),
-        )
+    def _define_special_function_registers(self):
+        self.sfr = SFRMap()
+        self._sfr_read_hooks = self.sfr.read_hooks
+        self._sfr_write_hooks = self.sfr.write_hooks
+        self._ram_buffer = self.memory_ram.buffer
+        self._direct_cells = [None] * len(self._ram_buffer)
+        for addr, value in self.sfr.reset_values().items():
+            self.memory_ram.load(addr, bytes((value,)))
 
-        setattr(
-            self.R0.__func__,
-            "write",
-            lambda data, *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            )
-            .__getitem__("R0")
-            .update(data),
-        )
-        setattr(
-            self.R1.__func__,
-            "write",
-            lambda data, *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            )
-            .__getitem__("R1")
-            .update(data),
-        )
-        setattr(
-            self.R2.__func__,
-            "write",
-            lambda data, *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            )
-            .__getitem__("R2")
-            .update(data),
-        )
-        setattr(
-            self.R3.__func__,
-            "write",
-            lambda data, *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            )
-            .__getitem__("R3")
-            .update(data),
-        )
-        setattr(
-            self.R4.__func__,
-            "write",
-            lambda data, *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            )
-            .__getitem__("R4")
-            .update(data),
-        )
-        setattr(
-            self.R5.__func__,
-            "write",
-            lambda data, *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            )
-            .__getitem__("R5")
-            .update(data),
-        )
-        setattr(
-            self.R6.__func__,
-            "write",
-            lambda data, *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            )
-            .__getitem__("R6")
-            .update(data),
-        )
-        setattr(
-            self.R7.__func__,
-            "write",
-            lambda data, *args: self._general_purpose_registers.get(
-                "".join([str(int(self.PSW.RS1)), str(int(self.PSW.RS0))])
-            )
-            .__getitem__("R7")
-            .update(data),
-        )
+    def _define_general_purpose_registers(self):
+        self.registers = RegisterFile(self.memory_ram)
+        self._general_purpose_registers = self.registers.banks()
+        for i in range(8):
+            setattr(self, f"R{i}", GeneralPurposeRegister(self.registers, i))
 
     def _reg_inspect(self):
         return textwrap.dedent(
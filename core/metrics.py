@@ -0,0 +1,256 @@
+"""
+In-process metrics registry, exposed in the Prometheus text format
+
+No metrics server or client library is needed; `REGISTRY.render()` is served at `/metrics` by the
+web app and can be scraped or read by hand. The counters are guarded by a lock per metric and are
+updated once per run / assemble / request, never per instruction. Gauges can be backed by a
+function that is called at render time, e.g. for the no. of live sessions.
+"""
+
+import time
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds; assembling, rendering and requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# instructions per second of a run
+IPS_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        return
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name}>"
+
+    def _key(self, labels: dict) -> tuple:
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.name} takes the labels {self.labels}")
+        return tuple(labels[x] for x in self.labels)
+
+    def samples(self) -> list:
+        """[(suffix, label values, extra label, value), ...]"""
+        with self._lock:
+            return [("", key, "", value) for key, value in self._values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.labels, key, extra)} {_number(value)}")
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+        return
+
+    pass
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, value: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+        return
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    pass
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._functions = {}
+        return
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+        return
+
+    def set_function(self, function, **labels) -> None:
+        """Read the value from `function()` at render time"""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+        return
+
+    def get(self, **labels) -> float:
+        key = self._key(labels)
+        function = self._functions.get(key, None)
+        return function() if function else self._values.get(key, 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        values.update((key, function()) for key, function in functions.items())
+        return [("", key, "", value) for key, value in values.items()]
+
+    pass
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        return
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key, None)
+            if state is None:
+                # per bucket counts (not cumulative; the last one is +Inf), sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0]
+            state[0][idx] += 1
+            state[1] += value
+        return
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels), None)
+        return sum(state[0]) if state else 0
+
+    def samples(self) -> list:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                samples.append(("_bucket", key, f'le="{_number(bound)}"', cumulative))
+            samples.append(("_sum", key, "", total))
+            samples.append(("_count", key, "", cumulative))
+        return samples
+
+    pass
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict) -> None:
+        self.histogram = histogram
+        self.labels = labels
+        return
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+    pass
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._lock = threading.Lock()
+        return
+
+    def __repr__(self) -> str:
+        return f"<Registry metrics={len(self._metrics)}>"
+
+    def __getitem__(self, name: str) -> Metric:
+        return self._metrics[name]
+
+    def _register(self, cls, name: str, *args, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name, None)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"{name} is already registered as a {metric.type}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels: tuple = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labels, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(x.render() for x in metrics) + "\n"
+
+    def clear(self) -> None:
+        """Drop the recorded values; the metrics and the gauge functions are kept"""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+        return
+
+    pass
+
+
+REGISTRY = Registry()
+
+instructions = REGISTRY.counter("sim8051_instructions_total", "Instructions executed")
+cycles = REGISTRY.counter("sim8051_cycles_total", "Machine cycles executed")
+runs = REGISTRY.counter("sim8051_runs_total", "Runs by the reason they stopped", ("reason",))
+budget_exhausted = REGISTRY.counter(
+    "sim8051_runs_budget_exhausted_total", "Runs stopped by the instruction budget before the program ended"
+)
+run_ips = REGISTRY.histogram(
+    "sim8051_run_instructions_per_second", "Instructions per second of every run", buckets=IPS_BUCKETS
+)
+assemble_seconds = REGISTRY.histogram("sim8051_assemble_seconds", "Time spent assembling a program")
+render_seconds = REGISTRY.histogram("sim8051_render_seconds", "Time spent rendering a template", ("template",))
+
+
+def record_run(executed: int, executed_cycles: int, seconds: float, reason: str = "end") -> None:
+    """Account for a run of `executed` instructions that took `seconds`"""
+    instructions.inc(executed)
+    cycles.inc(executed_cycles)
+    runs.inc(reason=reason)
+    if reason == "limit":
+        budget_exhausted.inc()
+    if executed and seconds > 0:
+        run_ips.observe(executed / seconds)
+    return
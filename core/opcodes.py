@@ -1,271 +1,328 @@
-opcodes_lookup = {
-    "NOP": "0x00",
-    "AJMP addr11": "0x01",
-    "LJMP addr16": "0x02",
-    "RR A": "0x03",
-    "INC A": "0x04",
-    "INC DIRECT": "0x05",
-    "INC @R0": "0x06",
-    "INC @R1": "0x07",
-    "INC R0": "0x08",
-    "INC R1": "0x09",
-    "INC R2": "0x0A",
-    "INC R3": "0x0B",
-    "INC R4": "0x0C",
-    "INC R5": "0x0D",
-    "INC R6": "0x0E",
-    "INC R7": "0x0F",
-    "JBC BIT DIRECT DIRECT": "0x10",
-    "ACALL addr11": "0x11",
-    "LCALL addr16": "0x12",
-    "RRC A": "0x13",
-    "DEC A": "0x14",
-    "DEC DIRECT": "0x15",
-    "DEC @R0": "0x16",
-    "DEC @R1": "0x17",
-    "DEC R0": "0x18",
-    "DEC R1": "0x19",
-    "DEC R2": "0x1A",
-    "DEC R3": "0x1B",
-    "DEC R4": "0x1C",
-    "DEC R5": "0x1D",
-    "DEC R6": "0x1E",
-    "DEC R7": "0x1F",
-    "JB BIT DIRECT DIRECT": "0x20",
-    "AJMP addr11": "0x21",
-    "RET": "0x22",
-    "RL A": "0x23",
-    "ADD A #IMMED": "0x24",
-    "ADD A DIRECT": "0x25",
-    "ADD A @R0": "0x26",
-    "ADD A @R1": "0x27",
-    "ADD A R0": "0x28",
-    "ADD A R1": "0x29",
-    "ADD A R2": "0x2A",
-    "ADD A R3": "0x2B",
-    "ADD A R4": "0x2C",
-    "ADD A R5": "0x2D",
-    "ADD A R6": "0x2E",
-    "ADD A R7": "0x2F",
-    "JNB BIT DIRECT DIRECT": "0x30",
-    "ACALL addr11": "0x31",
-    "RETI": "0x32",
-    "RLC A": "0x33",
-    "ADDC A #IMMED": "0x34",
-    "ADDC A DIRECT": "0x35",
-    "ADDC A @R0": "0x36",
-    "ADDC A @R1": "0x37",
-    "ADDC A R0": "0x38",
-    "ADDC A R1": "0x39",
-    "ADDC A R2": "0x3A",
-    "ADDC A R3": "0x3B",
-    "ADDC A R4": "0x3C",
-    "ADDC A R5": "0x3D",
-    "ADDC A R6": "0x3E",
-    "ADDC A R7": "0x3F",
-    "JC DIRECT DIRECT": "0x40",
-    "AJMP addr11": "0x41",
-    "ORL DIRECT A": "0x42",
-    "ORL DIRECT #IMMED": "0x43",
-    "ORL A #IMMED": "0x44",
-    "ORL A DIRECT": "0x45",
-    "ORL A @R0": "0x46",
-    "ORL A @R1": "0x47",
-    "ORL A R0": "0x48",
-    "ORL A R1": "0x49",
-    "ORL A R2": "0x4A",
-    "ORL A R3": "0x4B",
-    "ORL A R4": "0x4C",
-    "ORL A R5": "0x4D",
-    "ORL A R6": "0x4E",
-    "ORL A R7": "0x4F",
-    "JNC DIRECT DIRECT": "0x50",
-    "ACALL addr11": "0x51",
-    "ANL DIRECT A": "0x52",
-    "ANL DIRECT #IMMED": "0x53",
-    "ANL A #IMMED": "0x54",
-    "ANL A DIRECT": "0x55",
-    "ANL A @R0": "0x56",
-    "ANL A @R1": "0x57",
-    "ANL A R0": "0x58",
-    "ANL A R1": "0x59",
-    "ANL A R2": "0x5A",
-    "ANL A R3": "0x5B",
-    "ANL A R4": "0x5C",
-    "ANL A R5": "0x5D",
-    "ANL A R6": "0x5E",
-    "ANL A R7": "0x5F",
-    "JZ DIRECT DIRECT": "0x60",
-    "AJMP addr11": "0x61",
-    "XRL DIRECT A": "0x62",
-    "XRL DIRECT #IMMED": "0x63",
-    "XRL A #IMMED": "0x64",
-    "XRL A DIRECT": "0x65",
-    "XRL A @R0": "0x66",
-    "XRL A @R1": "0x67",
-    "XRL A R0": "0x68",
-    "XRL A R1": "0x69",
-    "XRL A R2": "0x6A",
-    "XRL A R3": "0x6B",
-    "XRL A R4": "0x6C",
-    "XRL A R5": "0x6D",
-    "XRL A R6": "0x6E",
-    "XRL A R7": "0x6F",
-    "JNZ DIRECT DIRECT": "0x70",
-    "ACALL addr11": "0x71",
-    "ORL C BIT": "0x72",
-    "JMP @A+DPTR": "0x73",
-    "MOV A #IMMED": "0x74",
-    "MOV DIRECT #IMMED": "0x75",
-    "MOV @R0 #IMMED": "0x76",
-    "MOV @R1 #IMMED": "0x77",
-    "MOV R0 #IMMED": "0x78",
-    "MOV R1 #IMMED": "0x79",
-    "MOV R2 #IMMED": "0x7A",
-    "MOV R3 #IMMED": "0x7B",
-    "MOV R4 #IMMED": "0x7C",
-    "MOV R5 #IMMED": "0x7D",
-    "MOV R6 #IMMED": "0x7E",
-    "MOV R7 #IMMED": "0x7F",
-    "SJMP DIRECT DIRECT": "0x80",
-    "AJMP addr11": "0x81",
-    "ANL C BIT": "0x82",
-    "MOVC A @A+PC": "0x83",
-    "DIV AB": "0x84",
-    "MOV DIRECT DIRECT": "0x85",
-    "MOV DIRECT @R0": "0x86",
-    "MOV DIRECT @R1": "0x87",
-    "MOV DIRECT R0": "0x88",
-    "MOV DIRECT R1": "0x89",
-    "MOV DIRECT R2": "0x8A",
-    "MOV DIRECT R3": "0x8B",
-    "MOV DIRECT R4": "0x8C",
-    "MOV DIRECT R5": "0x8D",
-    "MOV DIRECT R6": "0x8E",
-    "MOV DIRECT R7": "0x8F",
-    "MOV DPTR #IMMED": "0x90",
-    "ACALL addr11": "0x91",
-    "MOV BIT C": "0x92",
-    "MOVC A @A+DPTR": "0x93",
-    "SUBB A #IMMED": "0x94",
-    "SUBB A DIRECT": "0x95",
-    "SUBB A @R0": "0x96",
-    "SUBB A @R1": "0x97",
-    "SUBB A R0": "0x98",
-    "SUBB A R1": "0x99",
-    "SUBB A R2": "0x9A",
-    "SUBB A R3": "0x9B",
-    "SUBB A R4": "0x9C",
-    "SUBB A R5": "0x9D",
-    "SUBB A R6": "0x9E",
-    "SUBB A R7": "0x9F",
-    "ORL C /BIT": "0xA0",
-    "AJMP addr11": "0xA1",
-    "MOV C BIT": "0xA2",
-    "INC DPTR": "0xA3",
-    "MUL AB": "0xA4",
-    "undefined": "0xA5",
-    "MOV @R0 DIRECT": "0xA6",
-    "MOV @R1 DIRECT": "0xA7",
-    "MOV R0 DIRECT": "0xA8",
-    "MOV R1 DIRECT": "0xA9",
-    "MOV R2 DIRECT": "0xAA",
-    "MOV R3 DIRECT": "0xAB",
-    "MOV R4 DIRECT": "0xAC",
-    "MOV R5 DIRECT": "0xAD",
-    "MOV R6 DIRECT": "0xAE",
-    "MOV R7 DIRECT": "0xAF",
-    "ANL C /BIT": "0xB0",
-    "ACALL addr11": "0xB1",
-    "CPL BIT": "0xB2",
-    "CPL C": "0xB3",
-    "CJNE A #IMMED DIRECT DIRECT": "0xB4",
-    "CJNE A DIRECT DIRECT DIRECT": "0xB5",
-    "CJNE @R0 #IMMED DIRECT DIRECT": "0xB6",
-    "CJNE @R1 #IMMED DIRECT DIRECT": "0xB7",
-    "CJNE R0 #IMMED DIRECT DIRECT": "0xB8",
-    "CJNE R1 #IMMED DIRECT DIRECT": "0xB9",
-    "CJNE R2 #IMMED DIRECT DIRECT": "0xBA",
-    "CJNE R3 #IMMED DIRECT DIRECT": "0xBB",
-    "CJNE R4 #IMMED DIRECT DIRECT": "0xBC",
-    "CJNE R5 #IMMED DIRECT DIRECT": "0xBD",
-    "CJNE R6 #IMMED DIRECT DIRECT": "0xBE",
-    "CJNE R7 #IMMED DIRECT DIRECT": "0xBF",
-    "PUSH DIRECT": "0xC0",
-    "AJMP addr11": "0xC1",
-    "CLR BIT": "0xC2",
-    "CLR C": "0xC3",
-    "SWAP A": "0xC4",
-    "XCH A DIRECT": "0xC5",
-    "XCH A @R0": "0xC6",
-    "XCH A @R1": "0xC7",
-    "XCH A R0": "0xC8",
-    "XCH A R1": "0xC9",
-    "XCH A R2": "0xCA",
-    "XCH A R3": "0xCB",
-    "XCH A R4": "0xCC",
-    "XCH A R5": "0xCD",
-    "XCH A R6": "0xCE",
-    "XCH A R7": "0xCF",
-    "POP DIRECT": "0xD0",
-    "ACALL addr11": "0xD1",
-    "SETB BIT": "0xD2",
-    "SETB C": "0xD3",
-    "DA A": "0xD4",
-    "DJNZ DIRECT DIRECT": "0xD5",
-    "XCHD A @R0": "0xD6",
-    "XCHD A @R1": "0xD7",
-    "DJNZ R0 DIRECT DIRECT": "0xD8",
-    "DJNZ R1 DIRECT DIRECT": "0xD9",
-    "DJNZ R2 DIRECT DIRECT": "0xDA",
-    "DJNZ R3 DIRECT DIRECT": "0xDB",
-    "DJNZ R4 DIRECT DIRECT": "0xDC",
-    "DJNZ R5 DIRECT DIRECT": "0xDD",
-    "DJNZ R6 DIRECT DIRECT": "0xDE",
-    "DJNZ R7 DIRECT DIRECT": "0xDF",
-    "MOVX A @DPTR": "0xE0",
-    "AJMP addr11": "0xE1",
-    "MOVX A @R0": "0xE2",
-    "MOVX A @R1": "0xE3",
-    "CLR A": "0xE4",
-    "MOV A DIRECT": "0xE5",
-    "MOV A @R0": "0xE6",
-    "MOV A @R1": "0xE7",
-    "MOV A R0": "0xE8",
-    "MOV A R1": "0xE9",
-    "MOV A R2": "0xEA",
-    "MOV A R3": "0xEB",
-    "MOV A R4": "0xEC",
-    "MOV A R5": "0xED",
-    "MOV A R6": "0xEE",
-    "MOV A R7": "0xEF",
-    "MOVX @DPTR A": "0xF0",
-    "ACALL addr11": "0xF1",
-    "MOVX @R0 A": "0xF2",
-    "MOVX @R1 A": "0xF3",
-    "CPL A": "0xF4",
-    "MOV DIRECT A": "0xF5",
-    "MOV @R0 A": "0xF6",
-    "MOV @R1 A": "0xF7",
-    "MOV R0 A": "0xF8",
-    "MOV R1 A": "0xF9",
-    "MOV R2 A": "0xFA",
-    "MOV R3 A": "0xFB",
-    "MOV R4 A": "0xFC",
-    "MOV R5 A": "0xFD",
-    "MOV R6 A": "0xFE",
-    "MOV R7 A": "0xFF",
-    "ORG DIRECT": "0xFFFFFFDB",  # Database directive trick
-    # custome intructions; now sure about anyother way
-    "PUSH A": "0xC0",
-    "PUSH B": "0xC0",
-    "PUSH R0": "0xC0",
-    "PUSH R1": "0xC0",
-    "PUSH R2": "0xC0",
-    "PUSH R3": "0xC0",
-    "PUSH R4": "0xC0",
-    "PUSH R5": "0xC0",
-    "PUSH R6": "0xC0",
-    "PUSH R7": "0xC0",
-    "MOV SP #IMMED": "0x75",
+"""
+8051 opcode metadata
+
+The table is generated once at import from the compact specification below:
+
+`OPCODES`       256-entry reverse table; `OPCODES[0x24]` -> `OpcodeInfo` of `ADD A #IMMED`
+`OPCODE_TRIE`   forward trie of operand tokens used by the assembler;
+                `OPCODE_TRIE["ADD"]["A"]["#IMMED"][None]` -> `OpcodeInfo`
+`opcodes_lookup` space-joined `"ADD A #IMMED"` -> `"0x24"` view kept for compatibility
+
+Operand kinds are the tokens produced by `Operations._opcode_fetch`; the jump/call targets
+(`REL`, `ADDR11` and `ADDR16`) are all matched by the `LABEL` token.
+"""
+
+# Operand kinds with the no. of bytes they take in the instruction
+OPERAND_BYTES = {
+    "DIRECT": 1,
+    "#IMMED": 1,
+    "#IMMED16": 2,
+    "BIT": 1,
+    "/BIT": 1,
+    "REL": 1,
+    "ADDR11": 1,
+    "ADDR16": 2,
 }
+
+# Parser token that selects the operand kind in the trie
+OPERAND_TOKENS = {
+    "#IMMED16": "#IMMED",
+    "REL": "LABEL",
+    "ADDR11": "LABEL",
+    "ADDR16": "LABEL",
+}
+
+TARGET_OPERANDS = ("REL", "ADDR11", "ADDR16")
+
+# (mnemonic, operands, opcode, bytes, cycles)
+# `Rn` expands to R0-R7 over 8 consecutive opcodes and `@Ri` to @R0-@R1 over 2
+_OPCODE_SPECS = [
+    ("NOP", (), 0x00, 1, 1),
+    ("LJMP", ("ADDR16",), 0x02, 3, 2),
+    ("RR", ("A",), 0x03, 1, 1),
+    ("INC", ("A",), 0x04, 1, 1),
+    ("INC", ("DIRECT",), 0x05, 2, 1),
+    ("INC", ("@Ri",), 0x06, 1, 1),
+    ("INC", ("Rn",), 0x08, 1, 1),
+    ("JBC", ("BIT", "REL"), 0x10, 3, 2),
+    ("LCALL", ("ADDR16",), 0x12, 3, 2),
+    ("RRC", ("A",), 0x13, 1, 1),
+    ("DEC", ("A",), 0x14, 1, 1),
+    ("DEC", ("DIRECT",), 0x15, 2, 1),
+    ("DEC", ("@Ri",), 0x16, 1, 1),
+    ("DEC", ("Rn",), 0x18, 1, 1),
+    ("JB", ("BIT", "REL"), 0x20, 3, 2),
+    ("RET", (), 0x22, 1, 2),
+    ("RL", ("A",), 0x23, 1, 1),
+    ("ADD", ("A", "#IMMED"), 0x24, 2, 1),
+    ("ADD", ("A", "DIRECT"), 0x25, 2, 1),
+    ("ADD", ("A", "@Ri"), 0x26, 1, 1),
+    ("ADD", ("A", "Rn"), 0x28, 1, 1),
+    ("JNB", ("BIT", "REL"), 0x30, 3, 2),
+    ("RETI", (), 0x32, 1, 2),
+    ("RLC", ("A",), 0x33, 1, 1),
+    ("ADDC", ("A", "#IMMED"), 0x34, 2, 1),
+    ("ADDC", ("A", "DIRECT"), 0x35, 2, 1),
+    ("ADDC", ("A", "@Ri"), 0x36, 1, 1),
+    ("ADDC", ("A", "Rn"), 0x38, 1, 1),
+    ("JC", ("REL",), 0x40, 2, 2),
+    ("ORL", ("DIRECT", "A"), 0x42, 2, 1),
+    ("ORL", ("DIRECT", "#IMMED"), 0x43, 3, 2),
+    ("ORL", ("A", "#IMMED"), 0x44, 2, 1),
+    ("ORL", ("A", "DIRECT"), 0x45, 2, 1),
+    ("ORL", ("A", "@Ri"), 0x46, 1, 1),
+    ("ORL", ("A", "Rn"), 0x48, 1, 1),
+    ("JNC", ("REL",), 0x50, 2, 2),
+    ("ANL", ("DIRECT", "A"), 0x52, 2, 1),
+    ("ANL", ("DIRECT", "#IMMED"), 0x53, 3, 2),
+    ("ANL", ("A", "#IMMED"), 0x54, 2, 1),
+    ("ANL", ("A", "DIRECT"), 0x55, 2, 1),
+    ("ANL", ("A", "@Ri"), 0x56, 1, 1),
+    ("ANL", ("A", "Rn"), 0x58, 1, 1),
+    ("JZ", ("REL",), 0x60, 2, 2),
+    ("XRL", ("DIRECT", "A"), 0x62, 2, 1),
+    ("XRL", ("DIRECT", "#IMMED"), 0x63, 3, 2),
+    ("XRL", ("A", "#IMMED"), 0x64, 2, 1),
+    ("XRL", ("A", "DIRECT"), 0x65, 2, 1),
+    ("XRL", ("A", "@Ri"), 0x66, 1, 1),
+    ("XRL", ("A", "Rn"), 0x68, 1, 1),
+    ("JNZ", ("REL",), 0x70, 2, 2),
+    ("ORL", ("C", "BIT"), 0x72, 2, 2),
+    ("JMP", ("@A+DPTR",), 0x73, 1, 2),
+    ("MOV", ("A", "#IMMED"), 0x74, 2, 1),
+    ("MOV", ("DIRECT", "#IMMED"), 0x75, 3, 2),
+    ("MOV", ("@Ri", "#IMMED"), 0x76, 2, 1),
+    ("MOV", ("Rn", "#IMMED"), 0x78, 2, 1),
+    ("SJMP", ("REL",), 0x80, 2, 2),
+    ("ANL", ("C", "BIT"), 0x82, 2, 2),
+    ("MOVC", ("A", "@A+PC"), 0x83, 1, 2),
+    ("DIV", ("AB",), 0x84, 1, 4),
+    ("MOV", ("DIRECT", "DIRECT"), 0x85, 3, 2),
+    ("MOV", ("DIRECT", "@Ri"), 0x86, 2, 2),
+    ("MOV", ("DIRECT", "Rn"), 0x88, 2, 2),
+    ("MOV", ("DPTR", "#IMMED16"), 0x90, 3, 2),
+    ("MOV", ("BIT", "C"), 0x92, 2, 2),
+    ("MOVC", ("A", "@A+DPTR"), 0x93, 1, 2),
+    ("SUBB", ("A", "#IMMED"), 0x94, 2, 1),
+    ("SUBB", ("A", "DIRECT"), 0x95, 2, 1),
+    ("SUBB", ("A", "@Ri"), 0x96, 1, 1),
+    ("SUBB", ("A", "Rn"), 0x98, 1, 1),
+    ("ORL", ("C", "/BIT"), 0xA0, 2, 2),
+    ("MOV", ("C", "BIT"), 0xA2, 2, 1),
+    ("INC", ("DPTR",), 0xA3, 1, 2),
+    ("MUL", ("AB",), 0xA4, 1, 4),
+    ("MOV", ("@Ri", "DIRECT"), 0xA6, 2, 2),
+    ("MOV", ("Rn", "DIRECT"), 0xA8, 2, 2),
+    ("ANL", ("C", "/BIT"), 0xB0, 2, 2),
+    ("CPL", ("BIT",), 0xB2, 2, 1),
+    ("CPL", ("C",), 0xB3, 1, 1),
+    ("CJNE", ("A", "#IMMED", "REL"), 0xB4, 3, 2),
+    ("CJNE", ("A", "DIRECT", "REL"), 0xB5, 3, 2),
+    ("CJNE", ("@Ri", "#IMMED", "REL"), 0xB6, 3, 2),
+    ("CJNE", ("Rn", "#IMMED", "REL"), 0xB8, 3, 2),
+    ("PUSH", ("DIRECT",), 0xC0, 2, 2),
+    ("CLR", ("BIT",), 0xC2, 2, 1),
+    ("CLR", ("C",), 0xC3, 1, 1),
+    ("SWAP", ("A",), 0xC4, 1, 1),
+    ("XCH", ("A", "DIRECT"), 0xC5, 2, 1),
+    ("XCH", ("A", "@Ri"), 0xC6, 1, 1),
+    ("XCH", ("A", "Rn"), 0xC8, 1, 1),
+    ("POP", ("DIRECT",), 0xD0, 2, 2),
+    ("SETB", ("BIT",), 0xD2, 2, 1),
+    ("SETB", ("C",), 0xD3, 1, 1),
+    ("DA", ("A",), 0xD4, 1, 1),
+    ("DJNZ", ("DIRECT", "REL"), 0xD5, 3, 2),
+    ("XCHD", ("A", "@Ri"), 0xD6, 1, 1),
+    ("DJNZ", ("Rn", "REL"), 0xD8, 2, 2),
+    ("MOVX", ("A", "@DPTR"), 0xE0, 1, 2),
+    ("MOVX", ("A", "@Ri"), 0xE2, 1, 2),
+    ("CLR", ("A",), 0xE4, 1, 1),
+    ("MOV", ("A", "DIRECT"), 0xE5, 2, 1),
+    ("MOV", ("A", "@Ri"), 0xE6, 1, 1),
+    ("MOV", ("A", "Rn"), 0xE8, 1, 1),
+    ("MOVX", ("@DPTR", "A"), 0xF0, 1, 2),
+    ("MOVX", ("@Ri", "A"), 0xF2, 1, 2),
+    ("CPL", ("A",), 0xF4, 1, 1),
+    ("MOV", ("DIRECT", "A"), 0xF5, 2, 1),
+    ("MOV", ("@Ri", "A"), 0xF6, 1, 1),
+    ("MOV", ("Rn", "A"), 0xF8, 1, 1),
+]
+# AJMP/ACALL carry the upper 3 bits of the 11 bit address in the opcode
+_OPCODE_SPECS.extend(("AJMP", ("ADDR11",), (page << 5) | 0x01, 2, 2) for page in range(8))
+_OPCODE_SPECS.extend(("ACALL", ("ADDR11",), (page << 5) | 0x11, 2, 2) for page in range(8))
+
+# Assembler directives; no opcode; (mnemonic, operands, no. of bytes)
+_DIRECTIVE_SPECS = [
+    ("ORG", ("DIRECT",), 0),
+    ("DB", ("DIRECT",), 1),  # a data byte
+]
+
+
+def _signed(value: int) -> int:
+    return value - 256 if value > 127 else value
+
+
+class OpcodeInfo:
+    """
+    Metadata of a single opcode
+
+    code: opcode byte; `None` for directives
+    operands: operand kinds
+    length: no. of bytes
+    cycles: no. of machine cycles
+    """
+
+    __slots__ = ("code", "mnemonic", "operands", "length", "cycles", "hex", "key")
+
+    def __init__(self, code: int, mnemonic: str, operands: tuple, length: int, cycles: int) -> None:
+        self.code = code
+        self.mnemonic = mnemonic
+        self.operands = operands
+        self.length = length
+        self.cycles = cycles
+        self.hex = format(code, "#04x") if code is not None else None
+        self.key = " ".join([mnemonic, *operands])
+        return
+
+    def __repr__(self) -> str:
+        return f"<OpcodeInfo {self.hex} {self.key} bytes={self.length} cycles={self.cycles}>"
+
+    def __reduce__(self):
+        # copies and pickles resolve back to the entries of the table
+        return _opcode_info, (self.code, self.mnemonic, self.operands)
+
+    @property
+    def directive(self) -> bool:
+        return self.code is None
+
+    @property
+    def target(self) -> str:
+        """Kind of the jump/call target operand, if any"""
+        for kind in self.operands:
+            if kind in TARGET_OPERANDS:
+                return kind
+        return None
+
+    def encode(self, values: list, addr: int = 0) -> list:
+        """
+        Encode the instruction at `addr` into a list of bytes
+
+        values: operand values (`int`) in the order of the operands; `None` for the register
+        operands and for unresolved targets
+        """
+        code = self.code
+        data = []
+        for kind, value in zip(self.operands, values):
+            size = OPERAND_BYTES.get(kind)
+            if not size:
+                continue
+            value = value or 0
+            if kind == "REL":
+                if values[-1] is not None:
+                    value = value - (addr + self.length)
+                    if not -128 <= value <= 127:
+                        raise ValueError(f"relative jump out of range ({value})")
+                value &= 0xFF
+            elif kind == "ADDR11":
+                if values[-1] is not None and (value & 0xF800) != ((addr + self.length) & 0xF800):
+                    raise ValueError("absolute jump out of the 2kB page")
+                code = (code & 0x1F) | ((value >> 3) & 0xE0)
+                value &= 0xFF
+            data.extend(value.to_bytes(size, "big"))
+        if code == 0x85:  # MOV DIRECT DIRECT is encoded source first
+            data.reverse()
+        return [code, *data]
+
+    def decode(self, data: bytes, addr: int = 0) -> tuple:
+        """
+        Decode the operand bytes of the instruction at `addr`
+
+        data: the instruction bytes including the opcode
+        returns: (operands as text, jump/call target address or `None`)
+        """
+        operand_bytes = list(data[1 : self.length])
+        if self.code == 0x85:
+            operand_bytes.reverse()
+        operands = []
+        target = None
+        idx = 0
+        for kind in self.operands:
+            size = OPERAND_BYTES.get(kind)
+            if not size:
+                operands.append(kind)
+                continue
+            value = int.from_bytes(bytes(operand_bytes[idx : idx + size]), "big")
+            idx += size
+            if kind == "REL":
+                target = (addr + self.length + _signed(value)) & 0xFFFF
+                operands.append(format(target, "#06x"))
+            elif kind == "ADDR11":
+                target = ((addr + self.length) & 0xF800) | ((data[0] & 0xE0) << 3) | value
+                operands.append(format(target, "#06x"))
+            elif kind == "ADDR16":
+                target = value
+                operands.append(format(target, "#06x"))
+            elif kind in ("BIT", "/BIT"):
+                byte, bit = (0x20 + (value >> 3), value & 0x07) if value < 0x80 else (value & 0xF8, value & 0x07)
+                operands.append(f"{'/' if kind == '/BIT' else ''}{format(byte, '#04x')}.{bit}")
+            elif kind == "#IMMED16":
+                operands.append(f"#{format(value, '#06x')}")
+            elif kind == "#IMMED":
+                operands.append(f"#{format(value, '#04x')}")
+            else:
+                operands.append(format(value, "#04x"))
+        return operands, target
+
+    pass
+
+
+def _expand(operands: tuple) -> list:
+    """Expand `Rn` and `@Ri` into the register operands; returns `(offset, operands)` pairs"""
+    for idx, kind in enumerate(operands):
+        if kind == "Rn":
+            return [(x, (*operands[:idx], f"R{x}", *operands[idx + 1 :])) for x in range(8)]
+        if kind == "@Ri":
+            return [(x, (*operands[:idx], f"@R{x}", *operands[idx + 1 :])) for x in range(2)]
+    return [(0, operands)]
+
+
+def _insert(trie: dict, info: OpcodeInfo) -> None:
+    node = trie.setdefault(info.mnemonic, {})
+    for kind in info.operands:
+        node = node.setdefault(OPERAND_TOKENS.get(kind, kind), {})
+    node.setdefault(None, info)
+    return
+
+
+def _generate_tables() -> tuple:
+    opcodes = [None] * 256
+    trie = {}
+    for mnemonic, operands, code, length, cycles in _OPCODE_SPECS:
+        for offset, _operands in _expand(operands):
+            info = OpcodeInfo(code + offset, mnemonic, _operands, length, cycles)
+            opcodes[info.code] = info
+            _insert(trie, info)
+    for mnemonic, operands, length in _DIRECTIVE_SPECS:
+        _insert(trie, OpcodeInfo(None, mnemonic, operands, length, 0))
+    return tuple(opcodes), trie
+
+
+OPCODES, OPCODE_TRIE = _generate_tables()
+
+
+def _opcode_info(code: int, mnemonic: str, operands: tuple) -> OpcodeInfo:
+    if code is not None:
+        return OPCODES[code]
+    node = OPCODE_TRIE[mnemonic]
+    for kind in operands:
+        node = node[OPERAND_TOKENS.get(kind, kind)]
+    return node[None]
+
+
+# operand tokens that are keywords of the assembly language; `A`, `C`, `R0`, `@R0`, ...
+OPERAND_KEYWORDS = frozenset(kind for info in OPCODES if info for kind in info.operands if kind not in OPERAND_BYTES)
+
+opcodes_lookup = {}
+for _info in OPCODES:
+    if _info:
+        opcodes_lookup.setdefault(_info.key, _info.hex)
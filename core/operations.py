@@ -1,17 +1,31 @@
-from rich.console import Console
+import re
 
-from core.exceptions import OPCODENotFound, SyntaxError
+from core.console import get_console
+from core.exceptions import InvalidMemoryAddress, MemoryLimitExceeded, OPCODENotFound, SyntaxError
 from core.memory import Byte, SuperMemory
-from core.opcodes import opcodes_lookup
-from core.util import decompose_byte, tohex
+from core.opcodes import OPCODE_TRIE, OPERAND_KEYWORDS, opcodes_lookup
+from core.sfr import BIT_NAMES, SFR_ADDRESSES, bit_address
+from core.util import ishex, tohex
+
+# `R0`-`R7` by their no. in the bank
+_BANK_REGISTERS = {f"R{x}": x for x in range(8)}
+# Registers that are also directly addressable; `R0`-`R7` assume register bank 0
+_DIRECT_ADDRESSES = {**SFR_ADDRESSES, **_BANK_REGISTERS}
+_HEX_ADDRESS = re.compile(r"0[xX][0-9a-fA-F]+")
+
+
+# opcodes and operand kinds; `Operations._keywords` adds the registers
+_OPCODE_KEYWORDS = frozenset({*OPCODE_TRIE.keys(), *OPERAND_KEYWORDS})
 
 
 class Operations:
-    def __init__(self) -> None:
-        self.console = Console()
-        self.super_memory = SuperMemory()
+    def __init__(self, console=None, xram=None) -> None:
+        self.console = console or get_console()
+        self._tracing = getattr(self.console, "tracing", True)
+        self.super_memory = SuperMemory(xram=xram)
         self.memory_rom = self.super_memory.memory_rom
         self.memory_ram = self.super_memory.memory_ram
+        self.memory_xram = self.super_memory.memory_xram
         self.flags = self.super_memory.PSW
         self.flags.reset()
         self.super_memory.PC("0x0000")
@@ -23,8 +37,8 @@ class Operations:
             "C": self.super_memory.C,
             "SP": self.super_memory.SP,  # Stack Pointer
             "PC": self.super_memory.PC,  # Program Counter
-            "DPL": self.super_memory.DPTR,  # Data pointer low
-            "DPH": self.super_memory.DPTR,  # Data pointer high
+            "DPL": self.super_memory.DPL,  # Data pointer low
+            "DPH": self.super_memory.DPH,  # Data pointer high
             "DPTR": self.super_memory.DPTR,  # Data pointer
             "R0": self.super_memory.R0,
             "R1": self.super_memory.R1,
@@ -38,11 +52,18 @@ class Operations:
         # General purpose registers
         self._register_banks = self.super_memory._general_purpose_registers
         self._lookup_opcodes_dir = opcodes_lookup
+        # direct address of the hex operands, e.g. `0x30`
+        self._direct_addresses = {}
+        # bit address of the bit operands, e.g. `ACC.7`
+        self._bit_addresses = {}
 
         self._keywords = []
         self._generate_keywords()
         self._assembler = {}
         self._internal_PC = []
+        # (address, `OpcodeInfo`, operand values, command) of every assembled instruction
+        self._instructions = []
+        self._location = 0  # location counter
 
         # Jump instructions
         self._jump_instructions = [
@@ -59,14 +80,15 @@ class Operations:
             "JNZ",
             "DJNZ",
             "CJNE",
+            "LCALL",
+            "ACALL",
+            "RET",
+            "RETI",
         ]  # Add later
         pass
 
     def _generate_keywords(self):
-        _keywords = [*self._lookup_opcodes_dir.keys(), *self._registers_list.keys()]
-        for key in _keywords:
-            self._keywords.extend(key.split(" "))
-        self._keywords = set(self._keywords)
+        self._keywords = _OPCODE_KEYWORDS.union(self._registers_list)
         return
 
     def iskeyword(self, arg):
@@ -91,67 +113,205 @@ class Operations:
             return _register
         raise SyntaxError(msg="next link not found; check the instruction")
 
-    def _opcode_fetch(self, opcode, *args, **kwargs) -> None:
-        # _args_params = [x for x in args if self.iskeyword(x)]
-        _args_params = []
-        _args_hexs = []
-        for x in args:
-            if self.iskeyword(x) or self.iskeyword(x[1:]):
-                if x[0] == "@":
-                    print("Register indirect")
-                    _args_params.append(x)
-                elif x == "B":
-                    print("B")
-                    _args_params.append("DIRECT")
-                    _args_hexs.append(["0xF0"])  # memory location for `B`
-                else:
-                    _args_params.append(x)
-            else:
-                print(f"`{x}` not a key word")
-                if x[0] == "#":  # immediate
-                    x = x[1:]
-                    print("#immed")
-                    _args_params.append("#IMMED")
-                    _args_hexs.append(decompose_byte(tohex(x)))
-                elif "." in x:
-                    print("bit")
-                    _args_params.append("BIT")
-                else:
-                    print("direct")
-                    _args_params.append("DIRECT")
-                    if opcode not in self._jump_instructions:
-                        _args_hexs.append(decompose_byte(tohex(x)))
-
-        print(_args_params)
-        print(_args_hexs)
-
-        _opcode_search_params = " ".join([opcode, *_args_params]).upper()
-        _opcode_hex = self._lookup_opcodes_dir.get(_opcode_search_params)
-        self.console.log(f"OPCODE: {_opcode_search_params} = {_opcode_hex}")
-        if _opcode_hex:
-            if _opcode_hex == "0xFFFFFFDB":  # trick to accomodate database directives
-                _opcode_hex = None
-            return _opcode_hex, _args_hexs
+    def _direct_address(self, addr: str) -> int:
+        """
+        Direct address of the operand `addr`; an SFR name, `R0`-`R7` of the active bank or a hex
+        address. `None` for the other registers (`C`, `PC`, `DPTR`) and the invalid operands
+        """
+        direct = self._direct_addresses.get(addr, None)
+        if direct is not None:
+            return direct
+        key = addr.upper()
+        if key in _BANK_REGISTERS:
+            return self.super_memory.registers.index(_BANK_REGISTERS[key])
+        direct = self.super_memory.sfr.get(key)
+        if direct is not None:
+            return direct
+        if not _HEX_ADDRESS.fullmatch(addr):
+            return None
+        direct = int(addr, 16)
+        if direct >= len(self.memory_ram.buffer):
+            raise MemoryLimitExceeded()
+        self._direct_addresses[addr] = direct
+        return direct
+
+    def _bit_address(self, arg: str) -> int:
+        """Bit address of `BYTE.BIT`; `ACC.7`, `0x20.1`, `20H.1`"""
+        addr, bit = arg.split(".")
+        addr = _DIRECT_ADDRESSES.get(addr.upper(), None)
+        if addr is None:
+            addr = int(tohex(arg.split(".")[0]), 16)
+        try:
+            return bit_address(addr, int(bit))
+        except InvalidMemoryAddress:
+            raise SyntaxError(msg=f"`{arg}` is not bit addressable")
+
+    def _bit(self, addr: str) -> int:
+        """Bit address of the operand `addr`; `C`, a named bit e.g. `TR0`, `BYTE.BIT` or a bit address"""
+        bit = self._bit_addresses.get(addr, None)
+        if bit is not None:
+            return bit
+        key = addr.upper()
+        if key in BIT_NAMES:
+            bit = BIT_NAMES[key]
+        elif "." in key:
+            bit = self._bit_address(key)
+        elif ishex(key) and int(tohex(key), 16) <= 0xFF:
+            bit = int(tohex(key), 16)
+        else:
+            raise SyntaxError(msg=f"`{addr}` is not a bit")
+        self._bit_addresses[addr] = bit
+        return bit
+
+    def _operand(self, opcode: str, arg: str) -> tuple:
+        """Classify an operand into its trie token and value"""
+        if arg.upper() in BIT_NAMES and not self.iskeyword(arg):  # named bit, e.g. `TR0`
+            return "BIT", BIT_NAMES[arg.upper()]
+        if self.iskeyword(arg) or self.iskeyword(arg[1:]):
+            return arg.upper(), None
+        if arg[0] == "#":  # immediate
+            return "#IMMED", int(tohex(arg[1:]), 16)
+        if arg[0] == "/":
+            return "/BIT", self._bit(arg[1:])
+        if "." in arg:
+            return "BIT", self._bit_address(arg)
+        if arg.upper() in _DIRECT_ADDRESSES:  # SFR without a register object, e.g. `P1`
+            return "DIRECT", _DIRECT_ADDRESSES[arg.upper()]
+        if ishex(arg):
+            return "DIRECT", int(tohex(arg), 16)
+        return "LABEL", None
+
+    def _opcode_fetch(self, opcode, *args, **kwargs) -> tuple:
+        """
+        Walk the opcode trie with the operands
+
+        returns: (`OpcodeInfo`, operand values)
+        """
+        node, values, retry = self._walk(opcode, args)
+        if retry is not None and not (node and None in node):
+            # a direct address led to a dead end, e.g. `MOV 0x31, C`; it's a bit address there
+            node, values, _ = self._walk(opcode, args, bit=retry)
+
+        info = node.get(None, None) if node else None
+        if self._tracing:
+            self.console.log(f"OPCODE: {opcode} {args} = {info}")
+        if info:
+            return info, values
         raise OPCODENotFound(" ".join([opcode, *args]))
 
+    def _walk(self, opcode, args: tuple, bit: int = None) -> tuple:
+        """
+        Follow the operands down the opcode trie; the operand `bit` is taken as a bit address
+
+        returns: (trie node or `None`, operand values, operand that may be a bit address instead)
+        """
+        node = OPCODE_TRIE.get(opcode.upper(), None)
+        values = []
+        retry = None
+        for idx, x in enumerate(args):
+            if node is None:
+                break
+            if x == "offset" and opcode in self._jump_instructions:  # label placeholder
+                continue
+            token, value = self._operand(opcode, x)
+            if token == "DIRECT" and "BIT" in node and value <= 0xFF:
+                if idx == bit:
+                    token = "BIT"
+                elif "DIRECT" in node:
+                    retry = idx
+            if token not in node:
+                if token in _DIRECT_ADDRESSES and "DIRECT" in node:  # register as direct address
+                    token, value = "DIRECT", _DIRECT_ADDRESSES[token]
+                elif token == "DIRECT" and "BIT" in node and value <= 0xFF:  # bit address, e.g. `SETB 0x05`
+                    token = "BIT"
+                elif token == "BIT" and "LABEL" in node and x.upper() in BIT_NAMES:  # label named as a bit, e.g. `OV`
+                    token, value = "LABEL", None
+                elif token == "DIRECT" and "LABEL" in node:
+                    # a number is the target address, e.g. `LJMP 0x1234`; otherwise a hex-like label
+                    token, value = "LABEL", value if x[0].isdigit() else None
+            node = node.get(token, None)
+            values.append(value)
+        return node, values, retry
+
+    def _write_instruction(self, idx: int) -> bool:
+        """Encode the instruction `idx` into `_internal_PC`, the assembler listing and the ROM"""
+        addr, info, values, command = self._instructions[idx]
+        try:
+            encoded = info.encode(values, addr)
+        except (ValueError, OverflowError) as e:
+            raise SyntaxError(msg=f"{command}: {e}")
+        self._internal_PC[idx] = [[format(encoded[0], "#04x")], [format(x, "#04x") for x in encoded[1:]]]
+        self._assembler[command] = " ".join(self._internal_PC[idx][0] + self._internal_PC[idx][1])
+        self.memory_rom.load(addr, bytes(encoded))
+        return True
+
+    def _write_data(self, idx: int) -> bool:
+        """Write the byte of the `DB` directive `idx` into the ROM"""
+        addr, info, values, command = self._instructions[idx]
+        if values[0] > 0xFF:
+            raise SyntaxError(msg=f"{command}: not a byte")
+        self.memory_rom.write_byte(addr, values[0])
+        return True
+
     def prepare_operation(self, command: str, opcode: str, *args, **kwargs) -> bool:
-        _opcode_hex, _args_hex = self._opcode_fetch(opcode, *args)
-        if not _opcode_hex:
+        info, values = self._opcode_fetch(opcode, *args)
+        self._instructions.append((self._location, info, values, command))
+        self._internal_PC.append([])
+        if info.directive:
             """Database directive"""
             self.console.log("Database directive")
-            self._internal_PC.append([])
+            if info.mnemonic == "ORG":
+                self._location = values[0]
+            elif info.mnemonic == "DB":
+                self._write_data(len(self._instructions) - 1)
+                self._location += info.length
             return True
 
-        self._internal_PC.append([[_opcode_hex], *_args_hex])
-        _assembler = [_opcode_hex]
-        for x in _args_hex:
-            for y in x[::-1]:
-                _assembler.append(y)
-        self._assembler[command] = " ".join(_assembler).lower()
+        self._location += info.length
+        return self._write_instruction(len(self._instructions) - 1)
+
+    def resolve_target(self, idx: int, addr: int) -> bool:
+        """Encode the jump/call target `addr` into the instruction `idx`"""
+        _addr, info, values, command = self._instructions[idx]
+        values = [*values[:-1], addr]
+        self._instructions[idx] = (_addr, info, values, command)
+        return self._write_instruction(idx)
+
+    def load_instructions(self, instructions: list) -> bool:
+        """Append already assembled instructions; see `Controller.load_program`"""
+        for instruction in instructions:
+            self._instructions.append(instruction)
+            self._internal_PC.append([])
+            addr, info, values, _ = instruction
+            if info.directive:
+                if info.mnemonic == "ORG":
+                    self._location = values[0]
+                elif info.mnemonic == "DB":
+                    self._write_data(len(self._instructions) - 1)
+                    self._location = addr + info.length
+                continue
+            self._location = addr + info.length
+            self._write_instruction(len(self._instructions) - 1)
+        return True
+
+    def reset(self) -> bool:
+        """Clear the memory, registers and the assembled program in place"""
+        self.super_memory.reset()
+        return self.reset_program()
+
+    def reset_program(self) -> bool:
+        self._assembler = {}
+        self._internal_PC = []
+        self._instructions = []
+        self._location = 0
         return True
 
     def memory_read(self, addr: str, RAM: bool = True) -> Byte:
         print(f"memory read {addr}")
+        if RAM:
+            direct = self._direct_address(str(addr))
+            if direct is not None:
+                return self.super_memory.direct_cell(direct)
         _parsed_addr = self._parse_addr(addr)
         if _parsed_addr:
             return _parsed_addr.read(addr)
@@ -162,38 +322,22 @@ class Operations:
     def memory_write(self, addr: str, data, RAM: bool = True) -> bool:
         addr = str(addr)
         print(f"memory write {addr}|{data}")
+        if RAM:
+            direct = self._direct_address(addr)
+            if direct is not None:
+                return self.super_memory.write_direct(direct, data)
         _parsed_addr = self._parse_addr(addr)
         if _parsed_addr:
-            if addr == "SP":
-                return _parsed_addr._SP.write(data)
             return _parsed_addr.write(data, addr)
         if RAM:
             return self.memory_ram.write(addr, data)
         return self.memory_rom.write(addr, data)
 
     def bit_read(self, addr: str) -> bool:
-        bit = None
-        if "." in addr:
-            addr, bit = addr.split(".")
-        _parsed_addr = self._parse_addr(addr)
-        if _parsed_addr:
-            print(addr, _parsed_addr)
-            if bit:
-                return _parsed_addr.bit_get(bit)
-            return _parsed_addr.bit_get()
-        return False
+        return self.super_memory.bit_read(self._bit(addr))
 
-    def bit_write(self, addr: str, val: str) -> bool:
-        bit = None
-        if "." in addr:
-            addr, bit = addr.split(".")
-        _parsed_addr = self._parse_addr(addr)
-        if _parsed_addr:
-            print(addr, _parsed_addr)
-            if bit:
-                return _parsed_addr.bit_set(bit, val)
-            return _parsed_addr.bit_set(val)
-        return False
+    def bit_write(self, addr: str, val) -> bool:
+        return self.super_memory.bit_write(self._bit(addr), val)
 
     def register_pair_read(self, addr) -> Byte:
         print(f"register pair read {addr}")
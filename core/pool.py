@@ -0,0 +1,81 @@
+import threading
+from collections import deque
+
+from core.controller import Controller
+
+
+class ControllerPool:
+    """
+    Pool of pre-built controllers; `acquire` hands out a controller in its power-on state and
+    `release` resets it in place for reuse, so sessions and batch runs skip building one
+
+    size: no. of idle controllers kept; `prewarm` builds them up front
+    refill: rebuild the idle controllers in a background thread once half of them are taken
+    """
+
+    def __init__(self, size: int = 4, factory=Controller, prewarm: bool = True, refill: bool = False) -> None:
+        self.size = size
+        self.factory = factory
+        self.refill = refill
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+        self.metrics = {"acquired": 0, "built": 0, "released": 0, "discarded": 0}
+        if prewarm:
+            self.prewarm()
+        return
+
+    def __repr__(self) -> str:
+        return f"<ControllerPool idle={len(self._idle)} size={self.size}>"
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    def prewarm(self, count: int = None) -> int:
+        """Build controllers till `count` (default `size`) are idle; returns the no. built"""
+        count = self.size if count is None else count
+        built = 0
+        while len(self._idle) < count:
+            self._idle.append(self.factory())
+            built += 1
+        with self._lock:
+            self.metrics["built"] += built
+        return built
+
+    def _refill(self) -> None:
+        try:
+            self.prewarm()
+        finally:
+            self._refilling = False
+        return
+
+    def acquire(self) -> Controller:
+        with self._lock:
+            self.metrics["acquired"] += 1
+            controller = self._idle.pop() if self._idle else None
+            if self.refill and not self._refilling and len(self._idle) < self.size / 2:
+                self._refilling = True
+                threading.Thread(target=self._refill, name="sim8051-pool", daemon=True).start()
+            if controller is None:
+                self.metrics["built"] += 1
+        return controller if controller is not None else self.factory()
+
+    def release(self, controller: Controller) -> bool:
+        """Reset `controller` in place and keep it for reuse; the caller must not use it afterwards"""
+        if len(self._idle) >= self.size:
+            with self._lock:
+                self.metrics["discarded"] += 1
+            return False
+        controller.reset()
+        if controller._memoizer is not None:
+            controller._memoizer.uninstall()
+        with self._lock:
+            self.metrics["released"] += 1
+            self._idle.append(controller)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"idle": len(self._idle), "size": self.size, **self.metrics}
+
+    pass
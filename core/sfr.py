@@ -0,0 +1,168 @@
+"""
+Special function registers; the upper 128 bytes of the internal RAM, 0x80-0xFF
+
+`SFRMap` has an entry for every one of the 128 direct addresses, `None` where no register is
+mapped. A register may carry a read and a write hook; the peripherals (timers, UART, ports)
+register theirs with `SFRMap.hook` and the accesses without a hook take the fast path of a
+plain RAM byte.
+
+    read(value) -> int    called with the stored value; returns the value read
+    write(value) -> int   called with the value written; returns the value stored, `None` to keep
+                          the stored value
+"""
+
+from core.exceptions import InvalidMemoryAddress
+
+SFR_BASE = 0x80
+SFR_SIZE = 128
+
+# (name, address, reset value) of the standard 8051 registers
+SFR_SPECS = (
+    ("P0", 0x80, 0xFF),
+    ("SP", 0x81, 0x07),
+    ("DPL", 0x82, 0x00),
+    ("DPH", 0x83, 0x00),
+    ("PCON", 0x87, 0x00),
+    ("TCON", 0x88, 0x00),
+    ("TMOD", 0x89, 0x00),
+    ("TL0", 0x8A, 0x00),
+    ("TL1", 0x8B, 0x00),
+    ("TH0", 0x8C, 0x00),
+    ("TH1", 0x8D, 0x00),
+    ("P1", 0x90, 0xFF),
+    ("SCON", 0x98, 0x00),
+    ("SBUF", 0x99, 0x00),
+    ("P2", 0xA0, 0xFF),
+    ("IE", 0xA8, 0x00),
+    ("P3", 0xB0, 0xFF),
+    ("IP", 0xB8, 0x00),
+    ("PSW", 0xD0, 0x00),
+    ("ACC", 0xE0, 0x00),
+    ("B", 0xF0, 0x00),
+)
+SFR_ALIASES = {"A": "ACC"}
+SFR_ADDRESSES = {name: addr for name, addr, _ in SFR_SPECS}
+SFR_ADDRESSES.update((alias, SFR_ADDRESSES[name]) for alias, name in SFR_ALIASES.items())
+
+# (byte address, mask) by bit address; 0x00-0x7F are the bytes 0x20-0x2F, 0x80-0xFF the bit
+# addressable SFRs, the ones at the addresses divisible by 8
+BIT_ADDRESSES = tuple((0x20 + (x >> 3) if x < 0x80 else x & 0xF8, 1 << (x & 0x07)) for x in range(256))
+# bit addresses of the named bits of PSW, TCON, SCON and IE
+_BIT_SPECS = (
+    (0xD0, ("P", None, "OV", "RS0", "RS1", "F0", "AC", "CY")),
+    (0x88, ("IT0", "IE0", "IT1", "IE1", "TR0", "TF0", "TR1", "TF1")),
+    (0x98, ("RI", "TI", "RB8", "TB8", "REN", "SM2", "SM1", "SM0")),
+    (0xA8, ("EX0", "ET0", "EX1", "ET1", "ES", None, None, "EA")),
+)
+BIT_NAMES = {name: addr + x for addr, names in _BIT_SPECS for x, name in enumerate(names) if name}
+BIT_NAMES["C"] = BIT_NAMES["CY"]
+
+
+def bit_address(addr: int, bit: int) -> int:
+    """Bit address of the bit `bit` of the byte at the direct address `addr`"""
+    if 0x20 <= addr <= 0x2F and 0 <= bit <= 7:
+        return (addr - 0x20) * 8 + bit
+    if addr >= 0x80 and addr % 8 == 0 and 0 <= bit <= 7:
+        return addr + bit
+    raise InvalidMemoryAddress(f"`{addr:#04x}.{bit}` is not bit addressable")
+
+
+class SFR:
+    """
+    Entry of the SFR map; the registers at the addresses divisible by 8 are bit addressable
+    """
+
+    def __init__(self, name: str, address: int, reset: int = 0, read=None, write=None) -> None:
+        self.name = name
+        self.address = address
+        self.reset = reset
+        self.bit_addressable = address % 8 == 0
+        self.read = read
+        self.write = write
+        return
+
+    def __repr__(self) -> str:
+        return f"<SFR {self.name} {self.address:#04x}>"
+
+    pass
+
+
+class SFRMap:
+    """
+    128-entry table of the SFRs by `address - 0x80`
+
+    `read_hooks`/`write_hooks` mirror the hooks of the entries, so the access path checks a
+    single list slot for `None`.
+    """
+
+    def __init__(self, specs: tuple = SFR_SPECS) -> None:
+        self.entries = [None] * SFR_SIZE
+        self.read_hooks = [None] * SFR_SIZE
+        self.write_hooks = [None] * SFR_SIZE
+        self._names = {}
+        for name, address, reset in specs:
+            self.define(name, address, reset)
+        for alias, name in SFR_ALIASES.items():
+            if name in self._names:
+                self._names[alias] = self._names[name]
+        return
+
+    def __repr__(self) -> str:
+        return f"<SFRMap registers={len(self.registers())}>"
+
+    def __getitem__(self, key) -> SFR:
+        entry = self.entries[self.address(key) - SFR_BASE]
+        if entry is None:
+            raise InvalidMemoryAddress(f"no SFR at `{key}`")
+        return entry
+
+    def __contains__(self, key) -> bool:
+        try:
+            self.__getitem__(key)
+        except InvalidMemoryAddress:
+            return False
+        return True
+
+    def define(self, name: str, address: int, reset: int = 0, read=None, write=None) -> SFR:
+        """Map the register `name` at `address`, e.g. of a derivative's peripheral"""
+        if not SFR_BASE <= address < SFR_BASE + SFR_SIZE:
+            raise InvalidMemoryAddress(f"`{address:#x}` is not in the SFR space")
+        entry = self.entries[address - SFR_BASE] = SFR(name.upper(), address, reset, read, write)
+        self._names[entry.name] = address
+        self.read_hooks[address - SFR_BASE] = read
+        self.write_hooks[address - SFR_BASE] = write
+        return entry
+
+    def address(self, key) -> int:
+        """Direct address of the register `key`; a name or an address"""
+        if isinstance(key, int):
+            if not SFR_BASE <= key < SFR_BASE + SFR_SIZE:
+                raise InvalidMemoryAddress(f"`{key:#x}` is not in the SFR space")
+            return key
+        address = self._names.get(str(key).upper(), None)
+        if address is None:
+            raise InvalidMemoryAddress(f"unknown SFR `{key}`")
+        return address
+
+    def get(self, name: str, default: int = None) -> int:
+        """Direct address of the register `name`, `default` if there's none"""
+        return self._names.get(name, default)
+
+    def hook(self, key, read=None, write=None) -> SFR:
+        """
+        Set the read/write hooks of the register `key`; a `None` hook clears it
+        """
+        entry = self.__getitem__(key)
+        entry.read, entry.write = read, write
+        self.read_hooks[entry.address - SFR_BASE] = read
+        self.write_hooks[entry.address - SFR_BASE] = write
+        return entry
+
+    def registers(self) -> list:
+        return [x for x in self.entries if x is not None]
+
+    def reset_values(self) -> dict:
+        """{address: reset value}"""
+        return {x.address: x.reset for x in self.registers()}
+
+    pass
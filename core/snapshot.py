@@ -0,0 +1,308 @@
+"""
+Versioned binary snapshots of the controller state
+
+Layout (little endian):
+
+    header      magic, version, flags, PC, run index, instructions, cycles, call depth, max. call
+                depth, stack overflows, program hash
+    spaces      per memory space: name, size, no. of non-zero pages, page indexes, page bytes;
+                `images` decodes them and `diff` compares two snapshots
+    program     optional; string table + one record per instruction
+
+Memory is copied as raw `bytearray` slices of `Memory.PAGE_SIZE` pages; only the non-zero pages
+are stored, so a typical snapshot is a few KB. The program is identified by the sha256 of its
+encoded section; restoring into a controller that already runs the same program skips it.
+"""
+
+import struct
+import threading
+from hashlib import sha256
+from collections import OrderedDict
+
+from core import memory as _memory
+from core.exceptions import SnapshotError
+from core.flags import JumpFlag
+from core.opcodes import _opcode_info
+
+MAGIC = b"S51S"
+VERSION = 2
+
+_HAS_PROGRAM = 0x01
+_READY = 0x02
+
+_HEADER = struct.Struct("<4sBBHIQQIII32s")
+_SPACE = struct.Struct("<8sII")
+_COUNT = struct.Struct("<I")
+_STRING = struct.Struct("<H")
+_INSTRUCTION = struct.Struct("<HHHHHHHBB")
+_NONE = 0xFFFF
+_NONE_VALUE = -(1 << 31)
+
+# decoded program sections by hash; forks and restores of the same program skip decoding
+_PROGRAMS = OrderedDict()
+_PROGRAMS_SIZE = 32
+_lock = threading.Lock()
+
+
+def _spaces(controller) -> list:
+    return [("ram", controller.op.memory_ram), ("rom", controller.op.memory_rom), ("xram", controller.op.memory_xram)]
+
+
+def _encode_space(name: str, memory) -> bytes:
+    buffer = memory.buffer
+    size = memory.PAGE_SIZE
+    chunk = size * 64
+    zero_chunk = bytes(chunk)
+    zero = bytes(size)
+    pages = []
+    for x in range(0, len(buffer), chunk):
+        if buffer[x : x + chunk] != zero_chunk[: len(buffer) - x]:
+            pages.extend(y for y in range(x, min(x + chunk, len(buffer)), size) if buffer[y : y + size] != zero)
+    return b"".join(
+        [
+            _SPACE.pack(name.encode(), len(buffer), len(pages)),
+            struct.pack(f"<{len(pages)}I", *(x // size for x in pages)),
+            *(bytes(buffer[x : x + size]) for x in pages),
+        ]
+    )
+
+
+def encode_program(controller) -> bytes:
+    """Program section; the callstack and the assembled instructions"""
+    return encode_entries(((x[0], x[2], x[3]) for x in controller._callstack), controller.op._instructions)
+
+
+def encode_entries(program, instructions: list) -> bytes:
+    """Program section of the `(opcode, args, kwargs)` entries and their instructions, e.g. of an `AssembledProgram`"""
+    strings = {}
+
+    def _string(value) -> int:
+        if value is None:
+            return _NONE
+        return strings.setdefault(str(value), len(strings))
+
+    records = []
+    for (opcode, args, kwargs), (addr, info, values, command) in zip(program, instructions):
+        record = _INSTRUCTION.pack(
+            addr,
+            _NONE if info.directive else info.code,
+            _string(opcode),
+            _string(info.mnemonic if info.directive else None),
+            _string(" ".join(info.operands) if info.directive else None),
+            _string(command),
+            _string(kwargs["label"].upper() if kwargs.get("label", None) else None),
+            len(args),
+            len(values),
+        )
+        target_label = _string(kwargs["target-label"].upper() if kwargs.get("target-label", None) else None)
+        records.append(
+            b"".join(
+                [
+                    record,
+                    struct.pack(f"<{len(args)}H", *(_string(x) for x in args)),
+                    struct.pack(f"<{len(values)}i", *(_NONE_VALUE if x is None else x for x in values)),
+                    struct.pack("<H", target_label),
+                ]
+            )
+        )
+    encoded_strings = [x.encode() for x in strings]
+    return b"".join(
+        [
+            _COUNT.pack(len(encoded_strings)),
+            *(_STRING.pack(len(x)) + x for x in encoded_strings),
+            _COUNT.pack(len(records)),
+            *records,
+        ]
+    )
+
+
+def decode_program(data: bytes, offset: int = 0) -> tuple:
+    """
+    Decode a program section
+
+    returns: ([(opcode, args, kwargs), ...], [(addr, info, values, command), ...], offset past the section)
+    """
+    (count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    strings = []
+    for _ in range(count):
+        (size,) = _STRING.unpack_from(data, offset)
+        offset += _STRING.size
+        strings.append(data[offset : offset + size].decode())
+        offset += size
+
+    def _string(idx: int) -> str:
+        return None if idx == _NONE else strings[idx]
+
+    (count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    program, instructions = [], []
+    for _ in range(count):
+        addr, code, opcode, mnemonic, operands, command, label, n_args, n_values = _INSTRUCTION.unpack_from(
+            data, offset
+        )
+        offset += _INSTRUCTION.size
+        args = [strings[x] for x in struct.unpack_from(f"<{n_args}H", data, offset)]
+        offset += 2 * n_args
+        values = [None if x == _NONE_VALUE else x for x in struct.unpack_from(f"<{n_values}i", data, offset)]
+        offset += 4 * n_values
+        (target_label,) = struct.unpack_from("<H", data, offset)
+        offset += 2
+
+        if code == _NONE:
+            info = _opcode_info(None, _string(mnemonic), tuple(_string(operands).split()))
+        else:
+            info = _opcode_info(code, None, None)
+        command = _string(command)
+        kwargs = {}
+        counter = format(addr, "#06x")
+        if label != _NONE:
+            kwargs["label"] = JumpFlag(strings[label], counter, command)
+        if target_label != _NONE:
+            kwargs["target-label"] = JumpFlag(strings[target_label], counter, command)
+        program.append((_string(opcode), args, kwargs))
+        instructions.append((addr, info, values, command))
+    return program, instructions, offset
+
+
+def dump(controller, program: bool = True) -> bytes:
+    """
+    Snapshot of the controller; without `program` only the hash of the program is kept and the
+    snapshot can only be restored into a controller running the same program
+    """
+    program_section = controller._program_section()
+    flags = (_HAS_PROGRAM if program else 0) | (_READY if controller.ready else 0)
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        flags,
+        int(str(controller.op.super_memory.PC), 16),
+        controller._run_idx,
+        controller.instructions,
+        controller.cycles,
+        controller.call_depth,
+        controller.max_call_depth,
+        controller.op.super_memory.SP.overflows,
+        sha256(program_section).digest(),
+    )
+    spaces = _spaces(controller)
+    return b"".join(
+        [
+            header,
+            _COUNT.pack(len(spaces)),
+            *(_encode_space(name, memory) for name, memory in spaces),
+            program_section if program else b"",
+        ]
+    )
+
+
+def _header(blob: bytes) -> tuple:
+    try:
+        header = _HEADER.unpack_from(blob)
+    except struct.error:
+        raise SnapshotError("truncated header")
+    if header[0] != MAGIC:
+        raise SnapshotError("not a controller snapshot")
+    if header[1] != VERSION:
+        raise SnapshotError(f"unsupported snapshot version {header[1]}")
+    return header
+
+
+def load(controller, blob: bytes) -> bool:
+    """Restore the snapshot `blob` into the controller"""
+    magic, version, flags, PC, run_idx, instructions, cycles, depth, max_depth, overflows, program_hash = _header(blob)
+
+    try:
+        offset = _HEADER.size
+        (count,) = _COUNT.unpack_from(blob, offset)
+        offset += _COUNT.size
+        spaces = dict(_spaces(controller))
+        pages = []
+        for _ in range(count):
+            name, size, n_pages = _SPACE.unpack_from(blob, offset)
+            offset += _SPACE.size
+            name = name.rstrip(b"\0").decode()
+            memory = spaces.get(name, None)
+            if memory is None or len(memory.buffer) != size:
+                raise SnapshotError(f"memory space `{name}` doesn't match")
+            page_idx = struct.unpack_from(f"<{n_pages}I", blob, offset)
+            offset += 4 * n_pages
+            pages.append((memory, page_idx, offset))
+            offset += n_pages * memory.PAGE_SIZE
+            if offset > len(blob):
+                raise SnapshotError("truncated memory pages")
+
+        if controller._program_hash() != program_hash:
+            if not flags & _HAS_PROGRAM:
+                raise SnapshotError("snapshot without its program; restore into a controller running it")
+            with _lock:
+                decoded = _PROGRAMS.get(program_hash, None)
+                if decoded is not None:
+                    _PROGRAMS.move_to_end(program_hash)
+            if decoded is None:
+                program, _instructions, end = decode_program(blob, offset)
+                decoded = (program, _instructions, blob[offset:end])
+                with _lock:
+                    _PROGRAMS[program_hash] = decoded
+                    while len(_PROGRAMS) > _PROGRAMS_SIZE:
+                        _PROGRAMS.popitem(last=False)
+            controller._load_program_section(*decoded)
+    except (struct.error, IndexError, KeyError, UnicodeDecodeError) as e:
+        raise SnapshotError(f"corrupt snapshot; {e}")
+
+    for memory, page_idx, offset in pages:
+        size = memory.PAGE_SIZE
+        data = bytearray(len(memory.buffer))
+        for x in page_idx:
+            data[x * size : (x + 1) * size] = blob[offset : offset + size]
+            offset += size
+        memory.replace(data)
+    controller.op.super_memory.PC(format(PC, "#06x"))
+    controller._run_idx = run_idx
+    controller.instructions = instructions
+    controller.cycles = cycles
+    controller.call_depth = depth
+    controller.max_call_depth = max_depth
+    controller.op.super_memory.SP.overflows = overflows
+    controller.ready = bool(flags & _READY)
+    return True
+
+
+def images(blob: bytes) -> dict:
+    """Memory images of the snapshot `blob`; `{space: bytearray}`"""
+    _header(blob)
+    size = _memory.Memory.PAGE_SIZE
+    spaces = {}
+    try:
+        offset = _HEADER.size
+        (count,) = _COUNT.unpack_from(blob, offset)
+        offset += _COUNT.size
+        for _ in range(count):
+            name, length, n_pages = _SPACE.unpack_from(blob, offset)
+            offset += _SPACE.size
+            page_idx = struct.unpack_from(f"<{n_pages}I", blob, offset)
+            offset += 4 * n_pages
+            data = spaces[name.rstrip(b"\0").decode()] = bytearray(length)
+            for x in page_idx:
+                data[x * size : (x + 1) * size] = blob[offset : offset + size]
+                offset += size
+            if offset > len(blob):
+                raise SnapshotError("truncated memory pages")
+    except (struct.error, UnicodeDecodeError) as e:
+        raise SnapshotError(f"corrupt snapshot; {e}")
+    return spaces
+
+
+def diff(snapshot_a: bytes, snapshot_b: bytes) -> dict:
+    """
+    Changed bytes between two snapshots, see `core.memory.diff`; `{space: (addresses, values in
+    snapshot_a, values in snapshot_b)}` of the spaces that differ
+    """
+    images_a, images_b = images(snapshot_a), images(snapshot_b)
+    changes = {}
+    for name, image_a in images_a.items():
+        image_b = images_b.get(name, None)
+        if image_b is None or image_a == image_b:
+            continue
+        changes[name] = _memory.diff(image_a, image_b)
+    return changes
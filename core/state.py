@@ -0,0 +1,105 @@
+from collections import OrderedDict
+
+
+class StateTracker:
+    """
+    Versioned view of the controller state for incremental updates of the clients.
+
+    Every `delta` records a new version; a client passing the version it last saw gets
+    back only the registers, flags and memory rows that changed since then, found through
+    the write generations of `Memory`. Unknown or expired versions get the full state.
+
+    history: no. of versions kept for diffing
+    rom_window: no. of ROM bytes in the full state
+    """
+
+    def __init__(self, controller, history: int = 8, rom_window: int = 256) -> None:
+        self.controller = controller
+        self.history = history
+        self.rom_window = rom_window
+        self.version = 0
+        self._snapshots = OrderedDict()
+        return
+
+    def __repr__(self) -> str:
+        return f"<StateTracker version={self.version} kept={len(self._snapshots)}>"
+
+    def _snapshot(self) -> tuple:
+        op = self.controller.op
+        return (
+            op.super_memory._registers_todict(),
+            op.super_memory.PSW.flags(),
+            dict(op._assembler),
+            op.memory_ram,
+            op.memory_ram.checkpoint(),
+            op.memory_rom,
+            op.memory_rom.checkpoint(),
+        )
+
+    @staticmethod
+    def _diff_dict(old: dict, new: dict) -> dict:
+        return {key: val for key, val in new.items() if old.get(key, None) != val}
+
+    @staticmethod
+    def _changed_rows(memory, old_memory, old_generation: int) -> list:
+        """[[addr, value], ...] of the rows of `memory` written after `old_generation`"""
+        if memory is not old_memory:
+            # replaced by `Controller.reset`; every written row is new
+            old_generation = 0
+        buffer = memory.buffer
+        changed = []
+        for addr in memory.changed_pages(old_generation):
+            idx = addr - memory._offset
+            changed.extend([addr + i, val] for i, val in enumerate(buffer[idx : idx + memory.PAGE_SIZE]))
+        return changed
+
+    def delta(self, since: int = None) -> dict:
+        """
+        State changes since the version `since`; memory changes are whole rows of `Memory.PAGE_SIZE`
+
+        returns: dict with `version`, `full`, `index`, `ready`, `registers`, `flags`, `ram`,
+            `rom` and `assembler` (`None` if unchanged)
+        """
+        snapshot = self._snapshot()
+        registers, flags, assembler, memory_ram, _, memory_rom, _ = snapshot
+        old = self._snapshots.get(since, None)
+        if old is None:
+            state = {
+                "full": True,
+                "registers": registers,
+                "flags": flags,
+                "ram": list(enumerate(memory_ram.buffer)),
+                "rom": list(enumerate(memory_rom.buffer[: self.rom_window])),
+                "assembler": assembler,
+            }
+        else:
+            old_registers, old_flags, old_assembler, old_ram, ram_generation, old_rom, rom_generation = old
+            state = {
+                "full": False,
+                "registers": self._diff_dict(old_registers, registers),
+                "flags": self._diff_dict(old_flags, flags),
+                "ram": self._changed_rows(memory_ram, old_ram, ram_generation),
+                "rom": self._changed_rows(memory_rom, old_rom, rom_generation),
+                "assembler": assembler if assembler != old_assembler else None,
+            }
+
+        unchanged = not (state["full"] or any(state[x] for x in ("registers", "flags", "ram", "rom", "assembler")))
+        if since == self.version and unchanged:
+            # nothing changed since the latest version; don't record a duplicate
+            version = since
+        else:
+            self.version += 1
+            version = self.version
+            self._snapshots[version] = snapshot
+            while len(self._snapshots) > self.history:
+                self._snapshots.popitem(last=False)
+        state["version"] = version
+        state["index"] = self.controller._run_idx
+        state["ready"] = self.controller.ready
+        return state
+
+    def clear(self) -> bool:
+        self._snapshots.clear()
+        return True
+
+    pass
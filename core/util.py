@@ -1,13 +1,64 @@
 import re
+import base64
+import binascii
 from copy import copy
 
+# interned "0x%02x" strings of every 8-bit value and "0x%x" of every nibble; formatting is a lookup
+HEX8 = tuple(f"0x{x:02x}" for x in range(0x100))
+HEX4 = tuple(f"0x{x:x}" for x in range(0x10))
+# "0x%04x" of every 16-bit value; built on first use, it's 4 MB and ~10 ms
+_HEX16 = None
+
+
+def hex8(value: int) -> str:
+    """`0x%02x` of the 8-bit `value`"""
+    return HEX8[value]
+
+
+def hex16(value: int) -> str:
+    """`0x%04x` of the 16-bit `value`"""
+    global _HEX16
+    if _HEX16 is None:
+        _HEX16 = tuple([high + low for high in HEX8 for low in (x[2:] for x in HEX8)])
+    return _HEX16[value]
+
+
+def split_word(value: int) -> tuple:
+    """(high, low) bytes of the 16-bit `value`"""
+    return (value >> 8) & 0xFF, value & 0xFF
+
+
+def join_word(high: int, low: int) -> int:
+    return ((high & 0xFF) << 8) | (low & 0xFF)
+
+
+def split_byte(value: int) -> tuple:
+    """(high, low) nibbles of the 8-bit `value`"""
+    return (value >> 4) & 0x0F, value & 0x0F
+
+
+def negate(value: int, bits: int = 8) -> int:
+    """Two's complement of `value` in `bits` bits"""
+    return -value & ((1 << bits) - 1)
+
+
+def _chunks(value: int, bits: int, size: int) -> list:
+    """`value` as a `bits` wide binary number cut in `size` bit chunks, most significant first"""
+    bits = max(bits, value.bit_length())
+    mask = (1 << size) - 1
+    return [(value >> (bits - size * (x + 1))) & mask for x in range(bits // size)]
+
 
 def twos_complement(num, _base=16):
     """
     Helper method to compure 2's complement of a hex value
     """
-    _bytes = int(len(format(int(num, _base), "x")) / 2) or 1
-    return format((1 << 8 * _bytes) - int(num, _base), f"#0{2 + _bytes*2}x")
+    value = int(str(num), _base)
+    _bytes = len(format(value, "x")) // 2 or 1
+    result = (1 << 8 * _bytes) - value
+    if _bytes == 1 and 0 <= result < 0x100:
+        return HEX8[result]
+    return format(result, f"#0{2 + _bytes*2}x")
 
 
 def comparehex(hex1, hex2):
@@ -59,15 +110,11 @@ def decompose_byte(data, nibble=False):
     """
     Helper method to decompose hex into bytes/nibbles
     """
-    _bytes = int(len(sanatize_hex(data)) / 2)
-    mem_size = 8
+    data = str(data)
+    _bytes = len(sanatize_hex(data)) // 2
     if nibble:
-        mem_size = 4
-    binary_data = format(int(str(data), 16), f"0{_bytes*8}b")
-    return [
-        format(int(binary_data[mem_size * x : mem_size * (x + 1)], 2), f"#0{int(mem_size/2)}x")
-        for x in range(0, int(len(binary_data) / mem_size))
-    ]
+        return [HEX4[x] for x in _chunks(int(data, 16), _bytes * 8, 4)]
+    return [HEX8[x] for x in _chunks(int(data, 16), _bytes * 8, 8)]
 
 
 def get_bytes(data):
@@ -81,19 +128,18 @@ def construct_hex(hex1, hex2, _bytes=2):
     """
     Helper method to construct hex from two decomposed hex values
     """
-    bin1 = format(int(str(hex1), 16), f"0{_bytes * 4}b")
-    bin2 = format(int(str(hex2), 16), f"0{_bytes * 4}b")
-    bin_total = "".join(["0b", bin1, bin2])
-    return f'0x{format(int(bin_total, 2), f"0{_bytes * 2}x")}'
+    value_2 = int(str(hex2), 16)
+    value = (int(str(hex1), 16) << max(_bytes * 4, value_2.bit_length())) | value_2
+    if _bytes == 2 and value <= 0xFFFF:
+        return hex16(value)
+    return f"0x{value:0{_bytes * 2}x}"
 
 
 def get_byte_sequence(start, size, _bytes=1) -> list:
-    _ret_array = []
-    _hex_val = start
-    for _ in range(0, size):
-        _ret_array.append(_hex_val)
-        _hex_val = format(int(_hex_val, 16) + 1, f"#0{_bytes * 2 + 2}x")
-    return _ret_array
+    value = int(start, 16)
+    if _bytes == 1 and value + size <= 0x100:
+        return [start, *HEX8[value + 1 : value + size]][:size]
+    return [start, *(format(x, f"#0{_bytes * 2 + 2}x") for x in range(value + 1, value + size))][:size]
 
 
 def fill_memory(memory, size) -> dict:
@@ -111,3 +157,22 @@ def hexconvert(value: str) -> str:
         print(f"converted: {value} -> {new_val}")
         return new_val
     return value
+
+
+def decode_bytes(data, encoding: str = "hex") -> bytes:
+    """
+    Helper method to decode a bytes payload; `raw` bytes, a `hex` string (`0x` prefixes, spaces and
+    commas between the bytes are ignored) or a `base64` string
+    """
+    if encoding == "raw":
+        return bytes(data)
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("ascii")
+    if encoding == "hex":
+        return bytes.fromhex(re.sub(r"0[xX]|[\s,]", "", data))
+    if encoding == "base64":
+        try:
+            return base64.b64decode(data, validate=True)
+        except binascii.Error as e:
+            raise ValueError(f"invalid base64 data; {e}")
+    raise ValueError(f"unknown encoding `{encoding}`; raw, hex or base64")
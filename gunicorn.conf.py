@@ -1,3 +1,5 @@
+# sessions and background jobs live in the process; scale with threads, not workers
 workers = 1
-worker_class = "sync"
+worker_class = "gthread"
+threads = 4
 worker_connections = 100
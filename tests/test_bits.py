@@ -0,0 +1,89 @@
+import pytest
+
+from core.controller import Controller
+from core.exceptions import SyntaxError
+from core.memory import SuperMemory
+from core.sfr import BIT_ADDRESSES, BIT_NAMES, bit_address
+
+
+@pytest.mark.parametrize(
+    "bit, addr, mask",
+    [(0x00, 0x20, 0x01), (0x0F, 0x21, 0x80), (0x7F, 0x2F, 0x80), (0x80, 0x80, 0x01), (0xD7, 0xD0, 0x80)],
+)
+def test_bit_addresses(bit, addr, mask):
+    assert BIT_ADDRESSES[bit] == (addr, mask)
+    assert bit_address(addr, mask.bit_length() - 1) == bit
+
+
+def test_bit_names():
+    assert BIT_NAMES["C"] == BIT_NAMES["CY"] == 0xD7
+    assert BIT_NAMES["TR0"] == 0x8C
+    assert BIT_NAMES["EA"] == 0xAF
+
+
+def test_bit_read_write():
+    super_memory = SuperMemory()
+    super_memory.bit_write(0x0F, True)
+    super_memory.bit_write(0xE7, 1)
+    assert super_memory.memory_ram.dump(0x21, 1) == b"\x80"
+    assert str(super_memory.A) == "0x80"
+    assert super_memory.bit_read(0xE7) and not super_memory.bit_read(0xE6)
+    super_memory.bit_write(0xE7, False)
+    assert str(super_memory.A) == "0x00"
+    super_memory.bit_write(0xD7, True)
+    assert super_memory.PSW.CY
+
+
+@pytest.mark.parametrize("operand", ["SP.1", "0x30.0", "R0.1", "0x100"])
+def test_not_bit_addressable(operand):
+    controller = Controller()
+    with pytest.raises(SyntaxError):
+        controller.op._bit(operand)
+
+
+@pytest.mark.parametrize(
+    "program, addr, value",
+    [
+        ("SETB ACC.7\nJB ACC.7, SET\nMOV B, #0x01\nSET: MOV 0x30, #0x02", 0x30, 0x02),
+        ("SETB ACC.7\nJB ACC.7, SET\nMOV B, #0x01\nSET: MOV 0x30, #0x02", 0xF0, 0x00),
+        ("JNB P1.0, CLEAR\nMOV B, #0x01\nCLEAR: NOP", 0xF0, 0x01),
+        ("SETB 0x05\nJBC 0x20.5, TAKEN\nMOV B, #0x01\nTAKEN: NOP", 0x20, 0x00),
+        ("SETB 0x05\nJBC 0x20.5, TAKEN\nMOV B, #0x01\nTAKEN: NOP", 0xF0, 0x00),
+        ("SETB TR0\nSETB EA", 0x88, 0x10),
+        ("MOV A, #0x80\nMOV C, ACC.7\nMOV 0x20.1, C", 0x20, 0x02),
+        ("SETB C\nANL C, ACC.0\nMOV 0x20.0, C", 0x20, 0x00),
+        ("CLR C\nORL C, /ACC.0\nMOV 0x20.0, C", 0x20, 0x01),
+        ("SETB C\nMOV 0x31, C", 0x26, 0x02),  # bit address as the destination
+        ("SETB 0x31\nSETB C\nANL C, 0x31\nMOV 0x20.0, C", 0x20, 0x01),
+        ("MOV A, #0x0F\nCPL A", 0xE0, 0xF0),
+        ("MOV A, #0x0F\nCLR A", 0xE0, 0x00),
+    ],
+)
+def test_bit_instructions(program, addr, value):
+    controller = Controller()
+    controller.parse_all(program)
+    controller.run()
+    assert controller.op.super_memory.read_direct(addr) == value
+
+
+def test_bit_banging_loop():
+    controller = Controller()
+    controller.parse_all("MOV R2, #0x08\nLOOP: CPL P1.0\nDJNZ R2, LOOP")
+    controller.run()
+    assert controller.op.super_memory.read_direct(0x90) == 0xFF
+
+
+@pytest.mark.parametrize(
+    "program",
+    [
+        "MOV A, #0x00\nJZ OV\nMOV A, #0x05\nOV: MOV A, #0x09",
+        "LJMP TI\nMOV A, #0x05\nTI: MOV A, #0x09",
+        "SETB EA\nJB EA, F0\nMOV A, #0x05\nF0: MOV A, #0x09",
+        "SJMP FACE\nMOV A, #0x05\nFACE: MOV A, #0x09",
+    ],
+)
+def test_bit_name_as_label(program):
+    controller = Controller()
+    controller.parse_all(program)
+    controller.run()
+    assert controller.op.super_memory.read_direct(0xE0) == 0x09
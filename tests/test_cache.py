@@ -0,0 +1,99 @@
+import pickle
+
+import pytest
+
+from core.cache import AssembledProgram, AssemblyCache
+from core.controller import Controller
+
+PROGRAM = """MOV A, #0x05
+MOV R0, #0x03
+LOOP: ADD A, R0
+DJNZ R0, LOOP
+MOV 0x40, A"""
+
+FLAGS = {"P": False, "_UD": False, "OV": False, "RS0": False, "RS1": False, "F0": False, "AC": False, "CY": True}
+
+
+@pytest.mark.parametrize(
+    "source1, source2, result",
+    [
+        ("MOV A, #0x05\nINC A", "  MOV   A, #0x05\n\n INC A  ", True),
+        ("MOV A, #0x05", "MOV A, #0x06", False),
+    ],
+)
+def test_key_normalises_source(source1, source2, result):
+    assert (AssemblyCache.key(source1, FLAGS) == AssemblyCache.key(source2, FLAGS)) is result
+
+
+def test_key_includes_flags():
+    assert AssemblyCache.key(PROGRAM, FLAGS) != AssemblyCache.key(PROGRAM, {**FLAGS, "CY": False})
+
+
+def test_hit_clones_assembled_program():
+    cache = AssemblyCache()
+    parsed = Controller()
+    cache.assemble(parsed, PROGRAM, FLAGS)
+    cloned = Controller()
+    cache.assemble(cloned, PROGRAM, FLAGS)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert cloned.op._assembler == parsed.op._assembler
+    assert cloned.op._internal_PC == parsed.op._internal_PC
+    assert cloned.labels == parsed.labels == {"LOOP": 2}
+    assert cloned.op.flags.CY is True
+
+    parsed.run()
+    cloned.run()
+    assert str(cloned.op.memory_ram.read("0x40")) == str(parsed.op.memory_ram.read("0x40")) == "0x0b"
+
+
+def test_hit_applies_flags():
+    cache = AssemblyCache()
+    cache.assemble(Controller(), PROGRAM, {**FLAGS, "CY": False})
+    controller = Controller()
+    controller.set_flags({**FLAGS, "CY": True})
+    cache.assemble(controller, PROGRAM, {**FLAGS, "CY": False})
+    assert cache.stats()["hits"] == 1
+    assert controller.op.flags.CY is False
+    assert controller.op.super_memory.read_direct(0xD0) == 0x00
+
+
+def test_lru_eviction():
+    cache = AssemblyCache(maxsize=2)
+    for key in ["a", "b", "c"]:
+        cache.put(key, AssembledProgram(key=key))
+    assert "a" not in cache
+    assert len(cache) == 2
+    cache.get("b")
+    cache.put("d", AssembledProgram(key="d"))
+    assert "b" in cache and "c" not in cache
+
+
+def test_disk_tier(tmp_path):
+    AssemblyCache(path=str(tmp_path)).assemble(Controller(), PROGRAM, FLAGS)
+    cache = AssemblyCache(path=str(tmp_path))
+    controller = Controller()
+    cache.assemble(controller, PROGRAM, FLAGS)
+    assert cache.stats()["disk_hits"] == 1
+    assert controller.labels == {"LOOP": 2}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"S51A\x00\x02" + bytes(8),  # another layout
+        b"S51A\x01\x02\xff\x00\x00\x00",
+        pickle.dumps({"program": []}),
+    ],
+)
+def test_disk_tier_damaged_entry(tmp_path, data):
+    cache = AssemblyCache(path=str(tmp_path))
+    with open(cache._disk_file(cache.key(PROGRAM, FLAGS)), "wb") as f:
+        f.write(data)
+    controller = Controller()
+    cache.assemble(controller, PROGRAM, FLAGS)
+    assert (cache.stats()["misses"], cache.stats()["disk_hits"]) == (1, 0)
+    assert controller.labels == {"LOOP": 2}
+    cache = AssemblyCache(path=str(tmp_path))
+    cache.assemble(Controller(), PROGRAM, FLAGS)
+    assert cache.stats()["disk_hits"] == 1
@@ -0,0 +1,73 @@
+import pytest
+
+from core.controller import Controller
+from core.exceptions import StackError
+
+PROGRAM = """MOV A, #0x01
+LCALL DOUBLE
+ACALL DOUBLE
+MOV 0x30, A
+SJMP END
+DOUBLE: ADD A, A
+LCALL INCR
+RET
+INCR: INC A
+RET
+END: NOP"""
+
+
+def test_nested_calls():
+    controller = Controller()
+    controller.parse_all(PROGRAM)
+    controller.run()
+    assert controller.op.super_memory.read_direct(0x30) == 0x07
+    assert str(controller.op.super_memory.SP) == "0x07"
+    assert (controller.call_depth, controller.max_call_depth, controller.stack_overflows) == (0, 2, 0)
+
+
+def test_return_address_on_stack():
+    controller = Controller()
+    controller.parse_all("LCALL SUB\nSJMP END\nSUB: MOV 0x30, SP\nRET\nEND: NOP")
+    controller.run_steps(steps=2)
+    # the address of the `SJMP` after the 3-byte `LCALL`; low byte first
+    assert controller.op.memory_ram.dump(0x08, 2) == b"\x03\x00"
+    assert controller.op.super_memory.read_direct(0x30) == 0x09
+    assert controller.call_depth == 1
+    controller.run()
+    assert controller.call_depth == 0
+
+
+def test_return_to_end():
+    controller = Controller()
+    controller.parse_all("SJMP MAIN\nSUB: INC A\nRET\nMAIN: ACALL SUB")
+    controller.run()
+    assert str(controller.op.super_memory.A) == "0x01"
+
+
+def test_stack_overflow():
+    controller = Controller()
+    controller.parse_all("MOV SP, #0x7F\nLCALL SUB\nSUB: NOP")
+    controller.run()
+    assert controller.stack_overflows == 1
+    # the return address wraps into R0/R1 instead of P0 and SP
+    assert str(controller.op.super_memory.SP) == "0x01"
+    assert controller.op.memory_ram.dump(0x00, 2) == b"\x06\x00"
+    assert controller.op.super_memory.read_direct(0x80) == 0xFF
+    controller.reset()
+    assert controller.stack_overflows == 0
+
+
+def test_stack_overflow_return():
+    controller = Controller()
+    controller.parse_all("MOV SP, #0x7E\nLCALL SUB\nSJMP END\nSUB: PUSH 0xE0\nPOP 0xE0\nRET\nEND: NOP")
+    controller.run()
+    assert controller.stack_overflows == 1
+    assert controller.op.super_memory.read_direct(0x81) == 0x7E
+    assert controller.call_depth == 0
+
+
+def test_invalid_return():
+    controller = Controller()
+    controller.parse_all("MOV SP, #0x09\nMOV 0x09, #0x12\nRET")
+    with pytest.raises(StackError):
+        controller.run()
@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+from core import cfg
+from core.controller import Controller
+
+PROGRAM = """ORG 0x0010
+MOV R7, #0x02
+OUTER: MOV R6, #0x03
+INNER: CJNE A, #0x03, SKIP
+INC A
+SKIP: DJNZ R6, INNER
+DJNZ R7, OUTER
+LCALL SUB
+LCALL SUB
+SJMP END
+UNUSED: INC A
+SJMP UNUSED
+SUB: JZ ZERO
+INC A
+ZERO: RET
+END: NOP"""
+
+
+def assemble(program: str) -> Controller:
+    controller = Controller()
+    controller.parse_all(program)
+    return controller
+
+
+def test_blocks():
+    graph = assemble(PROGRAM).cfg()
+    assert [(x.label, x.address, x.end - x.start) for x in graph.blocks[:3]] == [
+        (None, 0x10, 2),
+        ("OUTER", 0x12, 1),
+        ("INNER", 0x14, 1),
+    ]
+    assert graph.block("INNER").successors == [graph.block("SKIP").id, 3]
+    assert graph.block("SUB").successors == [graph.block("ZERO").id, graph.block("SUB").id + 1]
+    assert graph.blocks[6].calls == [graph.block("SUB").id]
+    assert graph.blocks[6].successors == [7]
+    assert graph.block("ZERO").successors == []
+    assert graph.routines == [0, graph.block("SUB").id]
+    assert graph.index[3] == graph.block("INNER").id
+
+
+def test_loops():
+    graph = assemble(PROGRAM).cfg()
+    outer, inner, unused = graph.block("OUTER").id, graph.block("INNER").id, graph.block("UNUSED").id
+    assert sorted(graph.loops) == [outer, inner, unused]
+    assert (graph.loops[inner].parent, graph.loops[inner].depth) == (outer, 2)
+    assert graph.loops[outer].children == [inner]
+    assert [graph.blocks[x].depth for x in range(6)] == [0, 1, 2, 2, 2, 1]
+    assert not any(x.irreducible for x in graph.loops.values())
+
+
+def test_irreducible_loop():
+    graph = assemble("JZ SECOND\nFIRST: INC A\nSECOND: INC R0\nJNZ FIRST\nNOP").cfg()
+    (loop,) = graph.loops.values()
+    assert loop.irreducible
+    assert sorted(loop.blocks) == [graph.block("FIRST").id, graph.block("SECOND").id]
+
+
+def test_reachable_and_dead():
+    graph = assemble(PROGRAM).cfg()
+    assert [x.label for x in graph.dead] == ["UNUSED"]
+    stats = graph.stats()
+    assert stats["dead"] == {"instructions": 2, "bytes": 3, "addresses": ["0x0024"]}
+    assert stats["reachable"] == {"instructions": 14, "bytes": 25}
+    assert (stats["loops"], stats["max_depth"]) == (3, 2)
+
+
+@pytest.mark.parametrize(
+    "key, bounds",
+    [
+        ("SUB", (4, 5)),  # JZ 2 (+ INC A 1) + RET 2
+        ("END", (1, 1)),
+        (0, None),  # the loops
+    ],
+)
+def test_bounds(key, bounds):
+    assert assemble(PROGRAM).cfg().bounds(key) == bounds
+
+
+def test_bounds_with_calls():
+    program = "LCALL SUB\nJC END\nNOP\nEND: NOP\nSJMP DONE\nSUB: ACALL INNER\nRET\nINNER: RET\nDONE: NOP"
+    controller = assemble(program)
+    # LCALL 2 + ACALL 2 + RET 2 + RET 2, JC 2, (NOP 1), NOP 1, SJMP 2, NOP 1
+    assert controller.cfg().bounds(0) == (14, 15)
+    controller.run()
+    assert controller.cycles == 15
+
+
+def test_recursion():
+    assert assemble("LCALL SUB\nSJMP END\nSUB: JZ BACK\nDEC A\nLCALL SUB\nBACK: RET\nEND: NOP").cfg().bounds(0) is None
+
+
+def test_cached_per_program():
+    controller = assemble(PROGRAM)
+    graph = controller.cfg()
+    assert controller.cfg() is graph
+    assert assemble(PROGRAM).cfg() is graph
+    controller.parse("NOP")
+    assert controller.cfg() is not graph
+    assert cfg.build(controller).key == controller._program_hash()
+
+
+def test_address_target():
+    # `SJMP 0x0004` goes to `INC A`; nothing is dead
+    graph = assemble("MOV A, #0x00\nSJMP 0x0004\nINC A\nRET").cfg()
+    assert graph.dead == []
+    assert graph.blocks[0].successors == [graph.index[2]]
+    assert graph.bounds(0) == (6, 6)
+
+
+def test_bounds_threads():
+    controller = assemble(PROGRAM)
+    expected = cfg.ControlFlowGraph(controller).stats()["bounds"]
+    graph = controller.cfg()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(graph.stats()["bounds"])) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [expected] * 8
@@ -0,0 +1,32 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from core.console import NULL_CONSOLE, TRACE_ENV, get_console
+from core.controller import Controller
+
+
+@pytest.mark.parametrize("value, tracing", [("", False), ("0", False), ("1", True), ("yes", True)])
+def test_trace_env(monkeypatch, value, tracing):
+    monkeypatch.setenv(TRACE_ENV, value)
+    assert getattr(get_console(), "tracing") is tracing
+    assert get_console(trace=False) is NULL_CONSOLE
+
+
+def test_controller_console():
+    controller = Controller(trace=False)
+    assert controller.console is NULL_CONSOLE and controller.op.console is NULL_CONSOLE
+    assert Controller(trace=True).op.console.tracing
+    controller.parse_all("MOV A, #0x05\nADD A, #0x03")
+    controller.run()
+    assert str(controller.op.super_memory.A) == "0x08"
+
+
+def test_cold_import_skips_rich():
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env.pop(TRACE_ENV, None)
+    code = "import sys, api.index; print('rich' in sys.modules, len(api.index.controllers))"
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["False", "0"]
@@ -0,0 +1,90 @@
+import pytest
+
+from core.controller import Controller
+
+PROGRAM = """ORG 0x0010
+MOV A, #0x05
+MOV R0, #0x03
+LOOP: ADD A, R0
+DJNZ R0, LOOP
+MOV 0x40, A
+PUSH B
+CLR ACC.1"""
+
+
+def test_disassemble():
+    controller = Controller()
+    controller.parse_all(PROGRAM)
+    listing = controller.disassembler.disassemble(0x0010, 13)
+    assert [(x["address"], x["mnemonic"], x["operands"]) for x in listing] == [
+        (0x10, "MOV", ["A", "#0x05"]),
+        (0x12, "MOV", ["R0", "#0x03"]),
+        (0x14, "ADD", ["A", "R0"]),
+        (0x15, "DJNZ", ["R0", "L0014"]),
+        (0x17, "MOV", ["0x40", "A"]),
+        (0x19, "PUSH", ["0xf0"]),
+        (0x1B, "CLR", ["0xe0.1"]),
+    ]
+    assert listing[2]["label"] == "L0014"
+    assert listing[3]["bytes"] == "d8fd"
+
+
+def test_cache_invalidated_by_writes():
+    controller = Controller()
+    controller.parse_all(PROGRAM)
+    disassembler = controller.disassembler
+    disassembler.disassemble(0x0010, 13)
+    disassembler.disassemble(0x0010, 13)
+    assert disassembler.hits == 7
+    controller.op.memory_rom.write("0x0011", "0x07")
+    assert disassembler.decode(0x0010)[2] == ["A", "#0x07"]
+    controller.op.memory_rom.load(0x0012, b"\x04")
+    assert disassembler.decode(0x0012)[1:3] == ("INC", ["A"])
+
+
+def test_cache_kept_while_stepping():
+    controller = Controller()
+    controller.parse_all(PROGRAM)
+    disassembler = controller.disassembler
+    disassembler.disassemble(0x0010, 13)
+    misses = disassembler.misses
+    for _ in range(5):
+        controller.run_once()
+        disassembler.disassemble(0x0010, 13)
+    assert disassembler.misses == misses
+    assert disassembler.hits == 5 * 7
+
+
+def test_to_source_roundtrip():
+    controller = Controller()
+    controller.parse_all(PROGRAM)
+    parsed = Controller()
+    parsed.parse_all(controller.disassembler.to_source(0x0010, 13))
+    assert parsed.op.memory_rom.dump(0, 0x20) == controller.op.memory_rom.dump(0, 0x20)
+
+
+@pytest.mark.parametrize(
+    "image",
+    [
+        b"\xa5\x74\x07\xa5",  # undefined opcode
+        b"\x02\x12\x34\x80\xfe\x70\x80",  # LJMP/JNZ out of the range, SJMP to itself
+        b"\xc5\x30\x84\x04",  # XCH; not in the instruction set
+        b"\x74\x07\x90\x12",  # `MOV DPTR` cut by the end of the range
+    ],
+)
+def test_parse_rom_roundtrip(image):
+    controller = Controller()
+    controller.op.memory_rom.load(0x0100, image)
+    controller.parse_rom(0x0100, len(image))
+    assert controller.op.memory_rom.dump(0x0100, len(image)) == image
+    assert controller.op.memory_rom.dump(0x0100 + len(image), 4) == bytes(4)
+
+
+def test_numeric_target():
+    controller = Controller()
+    controller.parse_all("SJMP 0x0003\nINC A\nINC A\nMOV 0x30, A\nLJMP 0x0004")
+    assert controller.op.memory_rom.dump(0x0000, 2) == b"\x80\x01"
+    assert controller.op.memory_rom.dump(0x0006, 3) == b"\x02\x00\x04"
+    controller.run_steps(steps=4)  # SJMP, INC A, MOV, LJMP
+    assert str(controller.op.super_memory.A) == "0x01"
+    assert controller._run_idx == 3
@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+from core.exceptions import ImageFormatError, MemoryLimitExceeded
+from core.image import detect_format, read_bin, read_ihex, write_bin, write_ihex
+from core.memory import Memory
+
+IHEX = """:0300000002003BC0
+:0400300074057803D8
+:00000001FF
+"""
+
+
+def test_read_ihex():
+    memory = Memory(65536, "0x0000")
+    assert read_ihex(io.StringIO(IHEX), memory) == (0x0000, 0x0033, 7)
+    assert memory.dump(0, 3) == bytes([0x02, 0x00, 0x3B])
+    assert str(memory.read("0x0031")) == "0x05"
+
+
+@pytest.mark.parametrize(
+    "line",
+    [":0300000002003BC1", "0300000002003BC0", ":0300000002003B", ":03000000ZZ003BC0"],
+)
+def test_read_ihex_invalid(line):
+    with pytest.raises(ImageFormatError):
+        read_ihex(io.StringIO(line), Memory(65536, "0x0000"))
+
+
+def test_ihex_roundtrip():
+    memory = Memory(65536, "0x0000")
+    memory.load(0xFFF0, bytes(range(1, 17)))
+    memory.load(0x0100, b"\x12\x34")
+    stream = io.StringIO()
+    assert write_ihex(memory, stream, start=0x0100) == 0xFF00
+    copied_memory = Memory(65536, "0x0000")
+    read_ihex(io.StringIO(stream.getvalue()), copied_memory)
+    assert copied_memory.dump() == memory.dump()
+
+
+def test_bin_roundtrip_64k():
+    data = bytes(x & 0xFF for x in range(65536))
+    memory = Memory(65536, "0x0000")
+    assert read_bin(io.BytesIO(data), memory) == (0x0000, 0xFFFF, 65536)
+    stream = io.BytesIO()
+    write_bin(memory, stream, size=65536)
+    assert stream.getvalue() == data
+
+
+def test_image_exceeding_memory():
+    with pytest.raises(MemoryLimitExceeded):
+        read_bin(io.BytesIO(bytes(4097)), Memory(4096, "0x0000"))
+
+
+@pytest.mark.parametrize("filename, result", [("rom.hex", "hex"), ("ROM.IHX", "hex"), ("rom.bin", "bin")])
+def test_detect_format(filename, result):
+    assert detect_format(filename) == result
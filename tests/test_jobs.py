@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from api.jobs import CANCELLED, DONE, JobLimitExceeded, JobManager
+from api.sessions import Session
+from core.controller import Controller
+
+
+def _session(sid, source="MOV A, #0x05\nINC A"):
+    controller = Controller()
+    controller.parse_all(source)
+    return Session(sid, controller)
+
+
+def test_job_runs_to_completion():
+    jobs = JobManager(max_workers=1)
+    job = jobs.submit(_session("a"))
+    jobs.shutdown(cancel=False)
+    assert (job.status, job.reason) == (DONE, "end")
+    assert job.progress() == {"instructions": 2, "cycles": 2}
+    assert str(job.session.controller.op.super_memory.A) == "0x06"
+
+
+def test_job_cancelled_while_queued():
+    jobs = JobManager(max_workers=1)
+    blocker = _session("a")
+    blocker.lock.acquire()
+    first = jobs.submit(blocker)
+    second = jobs.submit(_session("b"))
+    second.cancel()
+    blocker.lock.release()
+    jobs.shutdown(cancel=False)
+    assert first.status == DONE and second.status == CANCELLED
+    assert second.progress()["instructions"] == 0
+
+
+def test_job_limits():
+    jobs = JobManager(max_workers=1, max_pending=2)
+    blocker = _session("a")
+    blocker.lock.acquire()
+    jobs.submit(blocker)
+    with pytest.raises(JobLimitExceeded):
+        jobs.submit(blocker)
+    jobs.submit(_session("b"))
+    with pytest.raises(JobLimitExceeded):
+        jobs.submit(_session("c"))
+    blocker.lock.release()
+    jobs.shutdown()
+
+
+def test_job_scoped_to_session():
+    jobs = JobManager()
+    job = jobs.submit(_session("a"))
+    assert jobs.get(job.id, "a") is job
+    assert jobs.get(job.id, "b") is None
+    assert jobs.cancel(job.id, "b") is None
+    jobs.shutdown(cancel=False)
+
+
+def test_controller_run_stop():
+    controller = Controller()
+    controller.parse_all("MOV A, #0x05\nINC A")
+    stop = threading.Event()
+    stop.set()
+    assert controller.run(stop=stop) is False
+    assert controller.instructions == 0
+
+
+@pytest.mark.parametrize("source", ["LOOP: SJMP LOOP", "WAIT: JB P1.0, WAIT"])
+def test_job_instruction_budget(source):
+    jobs = JobManager(max_workers=1, max_instructions=50)
+    job = jobs.submit(_session("a", source))
+    jobs.shutdown(cancel=False)
+    assert (job.status, job.reason) == (DONE, "limit")
+    assert job.progress()["instructions"] == 50
+
+
+def test_controller_run_limit():
+    controller = Controller()
+    controller.parse_all("LOOP: INC A\nSJMP LOOP")
+    assert controller.run(limit=9) is False
+    assert controller.instructions == 9
+    assert str(controller.op.super_memory.A) == "0x05"
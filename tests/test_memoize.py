@@ -0,0 +1,117 @@
+import pytest
+
+from core.controller import Controller
+from core.pool import ControllerPool
+
+# `TRIPLE` gets the same A and flags on every pass
+PROGRAM = """MOV R7, #0x04
+LOOP: MOV PSW, #0x00
+MOV A, #0x03
+LCALL TRIPLE
+ADD A, 0x40
+MOV 0x40, A
+DJNZ R7, LOOP
+SJMP END
+TRIPLE: MOV R0, A
+ADD A, R0
+ADD A, R0
+MOV 0x31, A
+RET
+END: NOP"""
+
+
+def run(program: str, labels: list = (), **kwargs) -> tuple:
+    controller = Controller()
+    controller.parse_all(program)
+    memoizer = controller.memoize(labels, **kwargs) if labels else None
+    controller.run()
+    return controller, memoizer
+
+
+def state(controller: Controller) -> tuple:
+    return (
+        controller.op.memory_ram.dump(0x00, 256),
+        controller.instructions,
+        controller.cycles,
+        controller.call_depth,
+        controller.max_call_depth,
+    )
+
+
+@pytest.mark.parametrize("verify", [False, True])
+def test_replay(verify):
+    expected, _ = run(PROGRAM)
+    controller, memoizer = run(PROGRAM, ["triple"], verify=verify)
+    assert state(controller) == state(expected)
+    assert controller.op.super_memory.read_direct(0x40) == 0x24
+    stats = memoizer.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["impure"]) == (3, 1, 1, [])
+    assert stats["hit_rate"] == 0.75
+    assert stats["verified"] == (3 if verify else 0)
+
+
+@pytest.mark.parametrize(
+    "routine",
+    [
+        "MOV P1, A\nRET",
+        "MOV DPTR, #0x0100\nMOVX A, @DPTR\nRET",
+        "SETB TR0\nRET",
+    ],
+)
+def test_impure(routine):
+    program = PROGRAM.replace("MOV 0x31, A\nRET", routine)
+    expected, _ = run(program)
+    controller, memoizer = run(program, ["TRIPLE"])
+    assert state(controller) == state(expected)
+    stats = memoizer.stats()
+    assert (stats["hits"], stats["entries"], stats["impure"]) == (0, 0, ["TRIPLE"])
+
+
+def test_code_write_invalidates():
+    controller, memoizer = run(PROGRAM, ["TRIPLE"])
+    controller.op.memory_rom.write_byte(0x0000, controller.op.memory_rom.read_byte(0x0000))
+    assert memoizer.stats()["entries"] == 1
+    controller.op.memory_rom.write_byte(0x1000, 0xA5)
+    assert memoizer.stats()["entries"] == 0
+    assert memoizer.stats()["invalidated"] == 1
+
+
+def test_verify_mismatch():
+    controller, memoizer = run(PROGRAM, ["TRIPLE"], verify=True)
+    for entry in memoizer._cache.values():
+        entry.cycles += 1
+    controller._run_idx = 0
+    controller.run()
+    stats = memoizer.stats()
+    assert (stats["mismatches"], stats["impure"], stats["entries"]) == (1, ["TRIPLE"], 0)
+
+
+def test_uninstall():
+    controller, memoizer = run(PROGRAM, ["TRIPLE"])
+    memoizer.uninstall()
+    assert "_call_label" not in vars(controller) and "_call" not in vars(controller)
+
+
+def test_reset_drops_recording():
+    expected, _ = run(PROGRAM)
+    controller = Controller()
+    controller.parse_all(PROGRAM)
+    memoizer = controller.memoize(["TRIPLE"])
+    controller.run_steps(steps=5)  # inside the first call of `TRIPLE`
+    assert memoizer._recording is not None
+    controller.reset()
+    assert memoizer._recording is None and "_call" not in vars(controller)
+    controller.parse_all(PROGRAM)
+    controller.run()
+    assert state(controller) == state(expected)
+
+
+def test_pool_release_uninstalls():
+    pool = ControllerPool(size=1, prewarm=False)
+    controller = pool.acquire()
+    controller.parse_all(PROGRAM)
+    memoizer = controller.memoize(["TRIPLE"])
+    controller.run_steps(steps=5)
+    pool.release(controller)
+    assert controller._memoizer is None and not memoizer._installed
+    assert "_call_label" not in vars(controller) and "_call" not in vars(controller)
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+from core.exceptions import InvalidMemoryAddress, MemoryLimitExceeded
+from core.memory import Memory, SuperMemory, diff
+
+
+def test_dirty_pages():
+    memory = Memory(256, "0x00")
+    memory.write("0x12", "0x01")
+    memory.load(0x3F, b"\x01\x02")
+    assert memory.dirty_pages(clear=True) == [0x10, 0x30, 0x40]
+    assert memory.dirty_pages() == []
+
+
+@pytest.mark.parametrize("offset", [0x0000, 0x0800])
+def test_changed_pages_since_generation(offset):
+    memory = Memory(4096, format(offset, "#06x"))
+    memory.load(offset + 0x100, b"\x01")
+    generation = memory.checkpoint()
+    memory.write(format(offset + 0x205, "#06x"), "0x02")
+    memory.load(offset + 0x0FF0, b"\x03" * 16)
+    assert memory.changed_pages(generation) == [offset + 0x200, offset + 0xFF0]
+    assert memory.changed_pages(0) == [offset + 0x100, offset + 0x200, offset + 0xFF0]
+    assert memory.changed_pages(memory.checkpoint()) == []
+
+
+def test_changed_pages_after_compaction():
+    memory = Memory(256, "0x00")
+    generations = []
+    for x in range(200):
+        memory.load(x % 256, b"\x01")
+        generations.append(memory.checkpoint())
+    assert len(memory._log_pages) <= 2 * 16 + 64
+    assert memory.changed_pages(generations[-3]) == [0xC0]
+
+
+def test_changed_pages_concurrent_checkpoints():
+    memory = Memory(256, "0x00")
+    done = threading.Event()
+
+    def write():
+        for x in range(20000):
+            memory.load(x % 256, b"\x01")
+        done.set()
+
+    thread = threading.Thread(target=write, daemon=True)
+    thread.start()
+    while not done.is_set():
+        memory.changed_pages(memory.checkpoint() - 1)
+    thread.join()
+    assert len(memory._log_generations) == len(memory._log_pages)
+    assert memory._log_generations == sorted(memory._log_generations)
+    assert memory.changed_pages(0) == list(range(0, 256, 16))
+
+
+@pytest.mark.parametrize(
+    "space, start, size, expected",
+    [
+        ("rom", 0x10, 3, b"\x01\x02\x03"),
+        ("ROM", 0xFFFF, 16, b"\x00"),
+        ("ram", 0xE0, 1, b"\x05"),
+        ("ram", 0x100, 4, b""),
+    ],
+)
+def test_read_block(space, start, size, expected):
+    super_memory = SuperMemory()
+    super_memory.memory_rom.load(0x10, b"\x01\x02\x03")
+    super_memory.A.write("0x05")
+    assert super_memory.read_block(space, start, size) == expected
+
+
+def test_read_block_unknown_space():
+    with pytest.raises(InvalidMemoryAddress):
+        SuperMemory().read_block("eeprom", 0, 1)
+
+
+@pytest.mark.parametrize(
+    "data, encoding", [(b"\x01\x02\xff", "raw"), ("01 02 FF", "hex"), ("0x01,0x02,0xff", "hex"), ("AQL/", "base64")]
+)
+def test_write_block(data, encoding):
+    super_memory = SuperMemory()
+    generation = super_memory.memory_ram.checkpoint()
+    assert super_memory.write_block("ram", 0x3E, data, encoding) == 3
+    assert super_memory.read_block("ram", 0x3E, 3) == b"\x01\x02\xff"
+    assert super_memory.memory_ram.changed_pages(generation) == [0x30, 0x40]
+
+
+@pytest.mark.parametrize(
+    "start, data, encoding, exception",
+    [(0xFF, b"\x01\x02", "raw", MemoryLimitExceeded), (0x00, "0g", "hex", ValueError), (0, "A", "base64", ValueError)],
+)
+def test_write_block_invalid(start, data, encoding, exception):
+    super_memory = SuperMemory()
+    with pytest.raises(exception):
+        super_memory.write_block("ram", start, data, encoding)
+    assert super_memory.read_block("ram", 0, 0x80) == bytes(0x80)
+
+
+def test_diff():
+    image = SuperMemory().read_block("xram", 0, 0x10000)
+    changed = bytearray(image)
+    changed[0x0005], changed[0xFFFF] = 0x01, 0xFF
+    addresses, old, new = diff(image, changed)
+    assert (list(addresses), list(old), list(new)) == ([0x0005, 0xFFFF], [0x00, 0x00], [0x01, 0xFF])
+    assert list(diff(image, image)[0]) == []
+    with pytest.raises(MemoryLimitExceeded):
+        diff(image, image[:-1])
+
+
+def test_as_numpy():
+    numpy = pytest.importorskip("numpy")
+    super_memory = SuperMemory()
+    view = super_memory.as_numpy("xram")
+    assert view.dtype == numpy.uint8 and len(view) == 0x10000
+    super_memory.write_block("xram", 0x10, b"\x01\x02")
+    assert view[0x10:0x12].tolist() == [1, 2]  # zero-copy
+    assert not view.flags.writeable
+    super_memory.as_numpy("ram", writable=True)[0x30] = 0x42
+    assert super_memory.memory_ram.dump(0x30, 1) == b"\x42"
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from core import metrics
+from core.controller import Controller
+from core.metrics import Registry
+
+PROGRAM = "MOV A, #0x05\nADD A, #0x03\nMOV R0, A"
+
+
+def test_render():
+    registry = Registry()
+    registry.counter("runs_total", "Runs", ("reason",)).inc(2, reason='say "hi"')
+    registry.gauge("live", "Live").set_function(lambda: 3)
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    assert registry.render().splitlines() == [
+        "# HELP runs_total Runs",
+        "# TYPE runs_total counter",
+        'runs_total{reason="say \\"hi\\""} 2',
+        "# HELP live Live",
+        "# TYPE live gauge",
+        "live 3",
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3",
+    ]
+
+
+def test_register():
+    registry = Registry()
+    assert registry.counter("x", "X") is registry.counter("x", "X")
+    with pytest.raises(ValueError):
+        registry.gauge("x", "X")
+    with pytest.raises(ValueError):
+        registry.counter("y", "Y", ("a",)).inc()
+
+
+def test_counter_threads():
+    counter = Registry().counter("x", "X")
+    threads = [threading.Thread(target=lambda: [counter.inc() for _ in range(1000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.get() == 8000
+
+
+@pytest.mark.parametrize("steps, reason", [(None, "end"), (2, "limit")])
+def test_controller_runs(steps, reason):
+    controller = Controller()
+    assembled = metrics.assemble_seconds.count()
+    controller.parse_all(PROGRAM)
+    assert metrics.assemble_seconds.count() == assembled + 1
+
+    instructions, runs = metrics.instructions.get(), metrics.runs.get(reason=reason)
+    exhausted = metrics.budget_exhausted.get()
+    if steps is None:
+        controller.run()
+    else:
+        controller.run_steps(limit=steps)
+    assert metrics.instructions.get() == instructions + (steps or 3)
+    assert metrics.runs.get(reason=reason) == runs + 1
+    assert metrics.budget_exhausted.get() == exhausted + (reason == "limit")
@@ -0,0 +1,82 @@
+import pytest
+
+from core.controller import Controller
+from core.opcodes import OPCODE_TRIE, OPCODES, opcodes_lookup
+
+
+def test_reverse_table():
+    assert len(OPCODES) == 256
+    assert [code for code, info in enumerate(OPCODES) if info is None] == [0xA5]
+    assert all(info.code == code for code, info in enumerate(OPCODES) if info)
+
+
+@pytest.mark.parametrize(
+    "key, result",
+    [("ADD A @R0", "0x26"), ("PUSH DIRECT", "0xc0"), ("AJMP ADDR11", "0x01"), ("MOV DPTR #IMMED16", "0x90")],
+)
+def test_opcodes_lookup(key, result):
+    assert opcodes_lookup[key] == result
+
+
+@pytest.mark.parametrize(
+    "tokens, code",
+    [
+        (["ADD", "A", "#IMMED"], 0x24),
+        (["DJNZ", "R3", "LABEL"], 0xDB),
+        (["CJNE", "@R1", "#IMMED", "LABEL"], 0xB7),
+        (["MOV", "DPTR", "#IMMED"], 0x90),
+    ],
+)
+def test_trie(tokens, code):
+    node = OPCODE_TRIE
+    for token in tokens:
+        node = node[token]
+    assert node[None].code == code
+
+
+# sample (value, decoded text) per operand kind, in the order of their use in an instruction
+SAMPLES = {
+    "DIRECT": [(0x30, "0x30"), (0x40, "0x40")],
+    "#IMMED": [(0x12, "#0x12")],
+    "#IMMED16": [(0x1234, "#0x1234")],
+    "BIT": [(0x0D, "0x21.5")],
+    "/BIT": [(0x0D, "/0x21.5")],
+    "REL": [(0x0120, "0x0120")],
+    "ADDR11": [(0x0123, "0x0123")],
+    "ADDR16": [(0x1234, "0x1234")],
+}
+
+
+@pytest.mark.parametrize("code", [code for code, info in enumerate(OPCODES) if info])
+def test_encode_decode(code):
+    info = OPCODES[code]
+    values, operands = [], []
+    for idx, kind in enumerate(info.operands):
+        value, text = SAMPLES[kind][info.operands[:idx].count(kind)] if kind in SAMPLES else (None, kind)
+        values.append(value)
+        operands.append(text)
+    data = bytes(info.encode(values, 0x0100))
+    assert len(data) == info.length
+    decoded = OPCODES[data[0]]
+    assert (decoded.mnemonic, decoded.operands, decoded.length) == (info.mnemonic, info.operands, info.length)
+    assert decoded.decode(data, 0x0100) == (operands, values[info.operands.index(info.target)] if info.target else None)
+
+
+@pytest.mark.parametrize(
+    "source, result",
+    [
+        ("MOV A, #0x05", "7405"),
+        ("PUSH A", "c0e0"),
+        ("MOV B, A", "f5f0"),
+        ("MOV 0x30, 0x40", "854030"),
+        ("MOV DPTR, #0x1234", "901234"),
+        ("CLR ACC.1", "c2e1"),
+        ("LOOP: INC A\nDJNZ R0, LOOP", "04d8fd"),
+        ("JZ DONE\nINC A\nDONE: INC A", "60010404"),
+        ("ORG 0x0002\nMOV A, R7", "0000ef"),
+    ],
+)
+def test_assemble(source, result):
+    controller = Controller()
+    controller.parse_all(source)
+    assert controller.op.memory_rom.dump(0, len(result) // 2).hex() == result
@@ -0,0 +1,70 @@
+from api.sessions import SessionPool
+from core.controller import Controller
+from core.pool import ControllerPool
+
+SOURCE = "MOV R0, #0x05\nLOOP: INC A\nDJNZ R0, LOOP\nMOV 0x30, A\nSETB C"
+
+
+def _state(controller):
+    return (
+        controller.op.memory_ram.dump(),
+        controller.op.memory_rom.dump(),
+        str(controller.op.super_memory.PC),
+        controller.callstack,
+        controller.op._assembler,
+        controller.op._location,
+        controller.ready,
+        controller.instructions,
+    )
+
+
+def test_reset_in_place():
+    controller = Controller()
+    op, lookup = controller.op, controller.lookup
+    controller.parse_all(SOURCE)
+    controller.run()
+    controller.reset()
+    assert controller.op is op and controller.lookup is lookup
+    assert _state(controller) == _state(Controller())
+    controller.parse_all(SOURCE)
+    controller.run()
+    assert str(controller.op.memory_ram.read("0x30")) == "0x05"
+
+
+def test_reset_marks_changed_pages():
+    controller = Controller()
+    controller.parse_all(SOURCE)
+    controller.run()
+    generation = controller.op.memory_ram.checkpoint()
+    controller.reset()
+    assert controller.op.memory_ram.changed_pages(generation) == [0x30, 0xD0, 0xE0]
+
+
+def test_pool_acquire_release():
+    pool = ControllerPool(size=2)
+    assert len(pool) == 2
+    controller = pool.acquire()
+    controller.parse_all(SOURCE)
+    controller.run()
+    assert pool.release(controller)
+    assert pool.acquire() is controller
+    assert _state(controller) == _state(Controller())
+    pool.acquire(), pool.acquire()
+    assert pool.stats()["built"] == 3
+
+
+def test_pool_release_over_size():
+    pool = ControllerPool(size=1)
+    assert not pool.release(Controller())
+    assert pool.stats()["discarded"] == 1
+
+
+def test_session_pool_recycles_controllers():
+    controllers = ControllerPool(size=2)
+    sessions = SessionPool(max_sessions=1, idle_timeout=None, controllers=controllers)
+    session = sessions.get("a")
+    session.controller.parse_all(SOURCE)
+    sessions.get("b")
+    assert session.closed
+    assert len(controllers) == 1
+    assert sessions.get("a").controller.callstack == []
@@ -0,0 +1,30 @@
+import pytest
+
+from core.controller import Controller
+from core.memory import SuperMemory
+
+
+@pytest.mark.parametrize("psw, bank", [("0x00", 0), ("0x08", 1), ("0x10", 2), ("0x18", 3), ("0xe7", 0)])
+def test_bank_follows_psw(psw, bank):
+    super_memory = SuperMemory()
+    super_memory.PSW.write(psw)
+    assert super_memory.registers.bank == bank
+    super_memory.R5.write("0x42")
+    assert super_memory.memory_ram.dump(bank * 8 + 5, 1) == b"\x42"
+    assert super_memory.registers.read(5) == 0x42
+    assert str(super_memory.R5) == "0x42"
+
+
+def test_bank_after_bulk_psw_write():
+    super_memory = SuperMemory()
+    super_memory.memory_ram.load(0x10, bytes(range(8)))
+    super_memory.write_block("ram", 0xD0, b"\x10")
+    assert [super_memory.registers.read(x) for x in range(8)] == list(range(8))
+    assert str(super_memory._general_purpose_registers["10"]["R7"]) == "0x07"
+
+
+def test_register_banks_in_program():
+    controller = Controller()
+    controller.parse_all("MOV R0, #0x11\nMOV PSW, #0x08\nMOV R0, #0x22\nMOV PSW, #0x18\nMOV R0, #0x44")
+    controller.run()
+    assert controller.op.memory_ram.dump(0x00, 0x19)[::8] == b"\x11\x22\x00\x44"
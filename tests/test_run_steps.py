@@ -0,0 +1,66 @@
+import pytest
+
+from core.conditions import Condition
+from core.controller import Controller
+from core.exceptions import InvalidCondition
+
+SOURCE = "MOV R0, #0x05\nLOOP: INC A\nDJNZ R0, LOOP\nMOV B, A"
+
+
+@pytest.fixture
+def controller():
+    controller = Controller()
+    controller.parse_all(SOURCE)
+    return controller
+
+
+@pytest.mark.parametrize(
+    "kwargs, steps, reason, index",
+    [
+        ({"steps": 2}, 2, "steps", 2),
+        ({"until": "LOOP"}, 1, "until", 1),
+        ({"until": 3}, 11, "until", 3),
+        ({"condition": Condition("A == 0x03")}, 6, "condition", 2),
+        ({"condition": Condition("R0 == 0")}, 11, "condition", 3),
+        ({"steps": 100}, 12, "end", 4),
+        ({}, 5, "limit", 1),
+    ],
+)
+def test_run_steps(controller, kwargs, steps, reason, index):
+    result = controller.run_steps(limit=5 if not kwargs else 100, **kwargs)
+    assert (result["steps"], result["reason"], controller._run_idx) == (steps, reason, index)
+
+
+def test_run_steps_until_steps_past_current(controller):
+    controller.run_steps(until="LOOP")
+    assert controller.run_steps(until="LOOP")["steps"] == 2
+
+
+def test_run_steps_trace(controller):
+    trace = controller.run_steps(steps=2, trace=True)["trace"]
+    assert [x["index"] for x in trace] == [0, 1]
+    assert trace[0]["changed"] == {"PC": "0x0002", "R0": "0x05"}
+    assert trace[1]["PC"] == "0x0002"
+
+
+def test_run_steps_unknown_label(controller):
+    with pytest.raises(ValueError):
+        controller.run_steps(until="NOWHERE")
+
+
+@pytest.mark.parametrize(
+    "expression, result",
+    [("A == 0x05", True), ("a != 5", False), ("0x30 >= 10H", True), ("CY", True), ("!C", False), ("B < 1", True)],
+)
+def test_condition(expression, result):
+    controller = Controller()
+    controller.op.super_memory.A.write("0x05")
+    controller.op.memory_ram.write("0x30", "0x10")
+    controller.op.super_memory.C.bit_set(True)
+    assert Condition(expression)(controller) is result
+
+
+@pytest.mark.parametrize("expression", ["XX > 1", "A == zz", "A =", "0x100 == 1", "!"])
+def test_invalid_condition(expression):
+    with pytest.raises(InvalidCondition):
+        Condition(expression)
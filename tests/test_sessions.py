@@ -0,0 +1,110 @@
+import os
+import time
+import threading
+
+import pytest
+
+from api import index
+from api.sessions import SessionPool, SessionStore
+from core.controller import Controller
+from core.pool import ControllerPool
+
+
+def test_registers_isolated():
+    controller_a, controller_b = Controller(), Controller()
+    controller_a.op.super_memory.R0.write("0x07")
+    controller_a.op.super_memory.C.bit_set(True)
+    assert str(controller_b.op.super_memory.R0.read()) == "0x00"
+    assert controller_b.op.super_memory.C.bit_get() is False
+
+
+def test_pool_lru_eviction():
+    pool = SessionPool(max_sessions=2, idle_timeout=None)
+    session_a = pool.get("a")
+    pool.get("b")
+    assert pool.get("a") is session_a
+    pool.get("c")
+    assert "b" not in pool and "a" in pool
+    assert pool.stats()["evicted"] == 1
+
+
+def test_pool_idle_timeout():
+    pool = SessionPool(idle_timeout=60)
+    pool.get("a").last_access -= 120
+    pool.get("b")
+    assert "a" not in pool
+    assert pool.stats()["expired"] == 1
+
+
+def test_pool_store_roundtrip(tmp_path):
+    pool = SessionPool(max_sessions=1, idle_timeout=None, store=SessionStore(str(tmp_path)))
+    controller = pool.get("a").controller
+    controller.parse_all("MOV A, #0x05\nMOV R0, #0x07")
+    controller.run()
+    pool.get("b")
+    assert "a" not in pool
+    controller = pool.get("a").controller
+    assert pool.stats()["restored"] == 1
+    assert controller.ready
+    assert str(controller.op.super_memory.R0.read()) == "0x07"
+    assert controller.op.memory_rom.dump(0, 4).hex() == "74057807"
+
+
+def test_pool_evicts_busy_session(tmp_path):
+    store = SessionStore(str(tmp_path))
+    pool = SessionPool(max_sessions=1, idle_timeout=None, store=store)
+    session = pool.get("a")
+    session.controller.parse_all("MOV R0, #0x07")
+    acquired, release = threading.Event(), threading.Event()
+
+    def run():
+        with session.lock:
+            acquired.set()
+            release.wait(5)
+            session.controller.run()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    acquired.wait(5)
+    result = []
+    getter = threading.Thread(target=lambda: result.append((pool.get("b"), pool.stats())), daemon=True)
+    getter.start()
+    getter.join(1)
+    assert result, "the pool blocked on the busy session"
+    assert session.closed and result[0][1]["deferred"] == 1
+    release.set()
+    thread.join(5)
+    for _ in range(100):
+        if os.path.exists(store._file("a")):
+            break
+        time.sleep(0.01)
+    controller = pool.get("a").controller
+    assert str(controller.op.super_memory.R0.read()) == "0x07"
+
+
+def test_route_retries_evicted_session(monkeypatch):
+    pool = SessionPool(idle_timeout=None, controllers=ControllerPool(size=2, prewarm=False))
+    evicted = []
+    get = pool.get
+
+    def get_then_evict(sid):
+        session = get(sid)
+        if not evicted:  # evicted between `get` and the lock
+            with pool._lock:
+                pool._evict(sid)
+            evicted.append(session)
+        return session
+
+    monkeypatch.setattr(pool, "get", get_then_evict)
+    monkeypatch.setattr(index, "sessions", pool)
+    route = index.with_controller(lambda controller: controller)
+    with index.app.test_request_context("/state"):
+        controller = route()
+        assert evicted[0].closed and not index.g.session.closed
+        assert index.g.session is not evicted[0] and controller is index.g.session.controller
+
+
+@pytest.mark.parametrize("sid", ["../etc", "a/b", ""])
+def test_store_invalid_sid(tmp_path, sid):
+    with pytest.raises(ValueError):
+        SessionStore(str(tmp_path))._file(sid)
@@ -0,0 +1,100 @@
+import pytest
+
+from core.controller import Controller
+from core.exceptions import InvalidMemoryAddress
+from core.memory import SuperMemory
+from core.pool import ControllerPool
+from core.sfr import SFR_SPECS, SFRMap
+
+
+def test_sfr_map():
+    sfr = SFRMap()
+    assert len(sfr.entries) == 128
+    assert len(sfr.registers()) == len(SFR_SPECS)
+    assert sfr["A"] is sfr["ACC"] is sfr[0xE0]
+    assert sfr["SP"].reset == 0x07
+    assert [x.name for x in sfr.registers() if x.bit_addressable] == [
+        "P0",
+        "TCON",
+        "P1",
+        "SCON",
+        "P2",
+        "IE",
+        "P3",
+        "IP",
+        "PSW",
+        "ACC",
+        "B",
+    ]
+    assert 0x84 not in sfr
+    with pytest.raises(InvalidMemoryAddress):
+        sfr.address(0x7F)
+    with pytest.raises(InvalidMemoryAddress):
+        sfr["T2CON"]
+
+
+@pytest.mark.parametrize("name, addr, value", [("P0", 0x80, 0xFF), ("SP", 0x81, 0x07), ("P3", 0xB0, 0xFF)])
+def test_reset_values(name, addr, value):
+    super_memory = SuperMemory()
+    assert super_memory.read_direct(addr) == value
+    super_memory.write_direct(addr, 0x00)
+    super_memory.reset()
+    assert super_memory.read_direct(addr) == value
+
+
+def test_hooks():
+    super_memory = SuperMemory()
+    written = []
+    super_memory.sfr.hook("SBUF", read=lambda value: 0x55, write=written.append)
+    super_memory.write_direct(0x99, "0x41")
+    assert written == [0x41]
+    assert super_memory.memory_ram.buffer[0x99] == 0x00
+    assert super_memory.read_direct(0x99) == 0x55
+    assert str(super_memory.direct_cell(0x99)) == "0x55"
+
+    super_memory.sfr.hook("P1", write=lambda value: value & 0x0F)
+    super_memory.write_direct(0x90, 0xAB)
+    assert super_memory.read_direct(0x90) == 0x0B
+    super_memory.sfr.hook("P1")
+    super_memory.write_direct(0x90, 0xAB)
+    assert super_memory.read_direct(0x90) == 0xAB
+
+
+@pytest.mark.parametrize(
+    "program, addr, value",
+    [
+        ("MOV SP, #0x30\nMOV A, SP", 0xE0, 0x30),  # SP is read and written as a plain SFR
+        ("MOV 0x81, #0x40\nMOV B, SP", 0xF0, 0x40),
+        ("MOV DPL, #0x34\nMOV DPH, #0x12", 0x82, 0x34),
+        ("MOV DPH, #0x12\nMOV DPL, #0x34", 0x83, 0x12),
+        ("MOV A, P1", 0xE0, 0xFF),
+        ("MOV 0xE0, #0x21\nMOV 0x30, A", 0x30, 0x21),
+    ],
+)
+def test_direct_addressing(program, addr, value):
+    controller = Controller()
+    controller.parse_all(program)
+    controller.run()
+    assert controller.op.super_memory.read_direct(addr) == value
+
+
+def test_sfr_hook_in_program():
+    controller = Controller()
+    written = []
+    controller.op.super_memory.sfr.hook("SBUF", write=written.append)
+    controller.parse_all("MOV A, #0x48\nMOV SBUF, A\nMOV 0x99, #0x69")
+    controller.run()
+    assert written == [0x48, 0x69]
+
+
+def test_sfr_hooks_dropped_on_reset():
+    pool = ControllerPool(size=1, prewarm=False)
+    controller = pool.acquire()
+    written = []
+    controller.op.super_memory.sfr.hook("SBUF", read=lambda value: 0x55, write=written.append)
+    pool.release(controller)
+    assert pool.acquire() is controller
+    controller.parse_all("MOV SBUF, #0x48\nMOV A, SBUF")
+    controller.run()
+    assert written == []
+    assert controller.op.super_memory.read_direct(0xE0) == 0x48
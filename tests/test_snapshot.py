@@ -0,0 +1,137 @@
+import threading
+
+import pytest
+
+from core import snapshot
+from core.controller import Controller
+from core.exceptions import SnapshotError
+
+SOURCE = "MOV R0, #0x05\nLOOP: INC A\nDJNZ R0, LOOP\nORG 0x0100\nMOV B, A"
+
+
+@pytest.fixture
+def controller():
+    controller = Controller()
+    controller.parse_all(SOURCE)
+    controller.run_steps(steps=4)
+    return controller
+
+
+def _state(controller):
+    return (
+        controller.op.memory_ram.dump(),
+        controller.op.memory_rom.dump(),
+        str(controller.op.super_memory.PC),
+        controller._run_idx,
+        controller.instructions,
+        controller.cycles,
+        controller.call_depth,
+        controller.max_call_depth,
+        controller.stack_overflows,
+        controller.labels,
+        controller.op._assembler,
+        controller.ready,
+    )
+
+
+def test_snapshot_roundtrip(controller):
+    blob = controller.snapshot()
+    assert blob[:4] == b"S51S"
+    assert len(blob) < 1024
+    restored = Controller()
+    restored.restore(blob)
+    assert _state(restored) == _state(controller)
+    controller.run()
+    restored.run()
+    assert _state(restored) == _state(controller)
+    assert str(restored.op.super_memory.B) == "0x05"
+
+
+def test_snapshot_call_state():
+    controller = Controller()
+    controller.parse_all("MOV SP, #0x7F\nLCALL SUB\nSJMP END\nSUB: NOP\nRET\nEND: NOP")
+    controller.run_steps(steps=3)
+    restored = Controller()
+    restored.restore(controller.snapshot())
+    assert (restored.call_depth, restored.max_call_depth, restored.stack_overflows) == (1, 1, 1)
+    assert _state(restored) == _state(controller)
+
+
+def test_restore_rolls_back(controller):
+    blob = controller.snapshot(program=False)
+    state = _state(controller)
+    controller.run()
+    controller.restore(blob)
+    assert _state(controller) == state
+
+
+def test_restore_without_program():
+    controller = Controller()
+    controller.parse_all(SOURCE)
+    with pytest.raises(SnapshotError):
+        Controller().restore(controller.snapshot(program=False))
+
+
+def test_restore_marks_changed_pages(controller):
+    blob = controller.snapshot()
+    generation = controller.op.memory_ram.checkpoint()
+    controller.op.memory_ram.write("0x40", "0x01")
+    controller.op.memory_rom.checkpoint()
+    controller.restore(blob)
+    assert controller.op.memory_ram.changed_pages(generation) == [0x40]
+    assert str(controller.op.memory_ram.read("0x40")) == "0x00"
+
+
+@pytest.mark.parametrize("blob", [b"", b"XXXX" + bytes(60), b"S51S\x63" + bytes(59)])
+def test_invalid_snapshot(blob):
+    with pytest.raises(SnapshotError):
+        Controller().restore(blob)
+
+
+def test_truncated_snapshot(controller):
+    with pytest.raises(SnapshotError):
+        Controller().restore(controller.snapshot()[:120])
+
+
+def test_images(controller):
+    spaces = snapshot.images(controller.snapshot())
+    assert sorted(spaces) == ["ram", "rom", "xram"]
+    assert spaces["ram"] == controller.op.memory_ram.dump()
+    assert spaces["rom"] == controller.op.memory_rom.dump()
+
+
+def test_diff(controller):
+    before = controller.snapshot()
+    controller.run()
+    controller.op.super_memory.write_block("xram", 0x1234, b"\x42")
+    changes = snapshot.diff(before, controller.snapshot())
+    assert sorted(changes) == ["ram", "xram"]
+    addresses, old, new = changes["xram"]
+    assert (list(addresses), list(old), list(new)) == ([0x1234], [0x00], [0x42])
+    addresses, old, new = changes["ram"]
+    assert dict(zip(addresses, new))[0xF0] == 0x05  # MOV B, A
+    assert snapshot.diff(before, before) == {}
+
+
+def test_restore_threads(monkeypatch):
+    monkeypatch.setattr(snapshot, "_PROGRAMS_SIZE", 1)
+    blobs = []
+    for x in range(4):
+        controller = Controller()
+        controller.parse_all(f"MOV A, #0x0{x}\nINC A")
+        blobs.append(controller.snapshot())
+    errors = []
+
+    def restore(blob):
+        try:
+            for _ in range(200):
+                Controller().restore(blob)
+        except SnapshotError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=restore, args=(x,)) for x in blobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
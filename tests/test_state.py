@@ -0,0 +1,54 @@
+from core.controller import Controller
+from core.state import StateTracker
+
+
+def test_full_state():
+    state = StateTracker(Controller()).delta()
+    assert state["full"] and state["version"] == 1
+    assert len(state["ram"]) == 256 and len(state["rom"]) == 256
+    assert state["flags"]["CY"] is False
+
+
+def test_delta_since_version():
+    controller = Controller()
+    tracker = StateTracker(controller)
+    controller.parse_all("MOV A, #0x05\nMOV R1, #0x07")
+    version = tracker.delta()["version"]
+    controller.run_once()
+    state = tracker.delta(version)
+    assert not state["full"]
+    assert [x[0] for x in state["ram"]] == list(range(0xE0, 0xF0))
+    assert dict(state["ram"])[0xE0] == 0x05
+    assert state["assembler"] is None
+    assert set(state["registers"]) == {"A/PSW", "PC"}
+    controller.run_once()
+    state = tracker.delta(state["version"])
+    assert [x[0] for x in state["ram"]] == list(range(0x00, 0x10))
+    assert dict(state["ram"])[0x01] == 0x07
+
+
+def test_unchanged_keeps_version():
+    tracker = StateTracker(Controller())
+    version = tracker.delta()["version"]
+    state = tracker.delta(version)
+    assert state["version"] == version
+    assert not any([state["registers"], state["flags"], state["ram"], state["rom"]])
+
+
+def test_expired_version():
+    tracker = StateTracker(Controller(), history=2)
+    for _ in range(3):
+        tracker.delta()
+    assert tracker.delta(1)["full"]
+    assert not tracker.delta(3)["full"]
+
+
+def test_delta_after_reset():
+    controller = Controller()
+    tracker = StateTracker(controller)
+    version = tracker.delta()["version"]
+    controller.reset()
+    controller.op.memory_ram.write("0x30", "0x01")
+    ram = dict(tracker.delta(version)["ram"])
+    assert 0x3F in ram and 0x40 not in ram
+    assert ram[0x30] == 0x01
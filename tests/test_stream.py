@@ -0,0 +1,39 @@
+import json
+
+from api.jobs import JobManager
+from api.sessions import Session
+from api.stream import job_stream, sse
+from core.controller import Controller
+
+
+def _events(messages):
+    events = []
+    for message in messages:
+        if message.startswith("event:"):
+            event, data = message.strip().split("\n")
+            events.append((event[len("event: ") :], json.loads(data[len("data: ") :])))
+    return events
+
+
+def test_sse():
+    assert sse("done", {"status": "done"}) == 'event: done\ndata: {"status": "done"}\n\n'
+
+
+def test_job_stream():
+    controller = Controller()
+    controller.parse_all("MOV R0, #0x10\nLOOP: DJNZ R0, LOOP\nMOV A, #0x05")
+    session = Session("a", controller)
+    jobs = JobManager()
+    job = jobs.submit(session)
+    events = _events(job_stream(job, fps=60))
+    jobs.shutdown(cancel=False)
+    assert [x[0] for x in events[-2:]] == ["state", "done"]
+    assert events[0][1]["state"]["full"]
+    assert not any(x[1]["state"]["full"] for x in events[1:-1])
+    assert events[-1][1]["status"] == "done"
+    assert events[-1][1]["instructions"] == 18
+    # the last frame carries everything since the previous one
+    final = {}
+    for event, data in events[:-1]:
+        final.update(dict(data["state"]["ram"]))
+    assert final[0xE0] == 0x05 and final[0x00] == 0x00
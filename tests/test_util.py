@@ -1,5 +1,6 @@
 import pytest
 
+from core import util
 from core.util import comparehex, construct_hex, decompose_byte, get_bytes, ishex, sanatize_hex, twos_complement
 
 
@@ -67,3 +68,45 @@ def test_is_hex(val, result):
 @pytest.mark.parametrize("val, result", [("0x12", "12"), ("0Xfa", "fa")])
 def test_sanatize_hex(val, result):
     assert sanatize_hex(val) == result
+
+
+@pytest.mark.parametrize("val, result", [(0x12EE, (0x12, 0xEE)), (0x0045, (0x00, 0x45)), (0xFFFF, (0xFF, 0xFF))])
+def test_split_join_word(val, result):
+    assert util.split_word(val) == result
+    assert util.join_word(*result) == val
+
+
+@pytest.mark.parametrize("val, result", [(0xAE, (0xA, 0xE)), (0x05, (0x0, 0x5))])
+def test_split_byte(val, result):
+    assert util.split_byte(val) == result
+
+
+@pytest.mark.parametrize("val, bits, result", [(0x12, 8, 0xEE), (0x00, 8, 0x00), (0x0001, 16, 0xFFFF)])
+def test_negate(val, bits, result):
+    assert util.negate(val, bits) == result
+
+
+@pytest.mark.parametrize("val", [0x00, 0x0A, 0xFF, 0x1234, 0xFFFF])
+def test_hex_tables(val):
+    assert util.hex16(val) == f"0x{val:04x}"
+    if val <= 0xFF:
+        assert util.hex8(val) == f"0x{val:02x}"
+        assert util.hex8(val) is util.hex8(val)
+
+
+@pytest.mark.parametrize(
+    "start, size, _bytes, result",
+    [("0x08", 3, 1, ["0x08", "0x09", "0x0a"]), ("0xfe", 3, 1, ["0xfe", "0xff", "0x100"]), ("0x00", 0, 1, [])],
+)
+def test_get_byte_sequence(start, size, _bytes, result):
+    assert util.get_byte_sequence(start, size, _bytes) == result
+
+
+@pytest.mark.parametrize("val, result", [("0x100", ["0x8", "0x0"]), ("0xae", ["0xa", "0xe"])])
+def test_decompose_nibbles(val, result):
+    assert decompose_byte(val, nibble=True) == result
+
+
+@pytest.mark.parametrize("data, encoding, result", [("0x01 ff", "hex", b"\x01\xff"), ("Af8=", "base64", b"\x01\xff")])
+def test_decode_bytes(data, encoding, result):
+    assert util.decode_bytes(data, encoding) == result
@@ -0,0 +1,92 @@
+import pytest
+
+from core import snapshot
+from core.cli import main
+from core.controller import Controller
+from core.memory import SuperMemory
+
+PROGRAM = """MOV DPTR, #0x1000
+MOV R2, #0x04
+LOOP: MOVX A, @DPTR
+ADD A, #0x10
+MOVX @DPTR, A
+INC DPTR
+DJNZ R2, LOOP"""
+
+
+@pytest.mark.parametrize("value, expected", [(0x12FF, "0x1300"), (0xFFFF, "0x0000"), (0x0000, "0x0001")])
+def test_dptr_increment(value, expected):
+    super_memory = SuperMemory()
+    super_memory.DPTR.write(value)
+    next(super_memory.DPTR)
+    assert str(super_memory.DPTR) == expected
+    assert super_memory.read_direct(0x82) == int(expected, 16) & 0xFF
+    assert super_memory.read_direct(0x83) == int(expected, 16) >> 8
+
+
+def test_xram_space():
+    super_memory = SuperMemory()
+    assert len(super_memory.space("xram").buffer) == 0x10000
+    super_memory.write_block("xram", 0xFFFE, b"\x01\x02")
+    assert super_memory.read_block("xram", 0xFFFE, 4) == b"\x01\x02"
+    super_memory.reset()
+    assert super_memory.read_block("xram", 0xFFFE, 2) == b"\x00\x00"
+
+
+def test_movx_dptr():
+    controller = Controller()
+    controller.op.super_memory.write_block("xram", 0x1000, bytes([1, 2, 3, 4]))
+    controller.parse_all(PROGRAM)
+    controller.run()
+    assert controller.op.super_memory.read_block("xram", 0x1000, 5) == bytes([0x11, 0x12, 0x13, 0x14, 0x00])
+    assert str(controller.op.super_memory.DPTR) == "0x1004"
+
+
+@pytest.mark.parametrize("page, addr", [("0x00", 0x0005), ("0x20", 0x2005)])
+def test_movx_ri(page, addr):
+    controller = Controller()
+    controller.parse_all(f"MOV P2, #{page}\nMOV R0, #0x05\nMOV A, #0x77\nMOVX @R0, A\nMOV A, #0x00\nMOVX A, @R0")
+    controller.run()
+    assert controller.op.memory_xram.read_byte(addr) == 0x77
+    assert str(controller.op.super_memory.A) == "0x77"
+
+
+def test_movc():
+    controller = Controller()
+    controller.parse_all(
+        "MOV DPTR, #0x0000\nMOV A, #0x01\nMOVC A, @A+DPTR\nMOV B, A\nMOV A, #0x01\nMOVC A, @A+PC\nNOP\nINC A"
+    )
+    controller.run()
+    assert controller.op.super_memory.read_direct(0xF0) == 0x00  # low byte of `MOV DPTR, #0x0000`
+    assert str(controller.op.super_memory.A) == "0x05"  # `INC A` after the NOP, +1 as it runs
+
+
+def test_xram_mapped_file(tmp_path):
+    path = tmp_path / "xram.bin"
+    path.write_bytes(bytes(0x1000) + bytes([1, 2, 3, 4]))
+    controller = Controller(xram=str(path))
+    controller.parse_all(PROGRAM)
+    controller.run()
+    controller.op.memory_xram.flush()
+    data = path.read_bytes()
+    assert len(data) == 0x10000
+    assert data[0x1000:0x1004] == bytes([0x11, 0x12, 0x13, 0x14])
+    controller.reset()
+    assert controller.op.memory_xram.read_byte(0x1000) == 0x11  # a mapped file isn't cleared
+
+
+def test_xram_snapshot():
+    controller = Controller()
+    controller.op.super_memory.write_block("xram", 0x8000, b"\xaa\xbb")
+    blob = snapshot.dump(controller)
+    other = Controller()
+    snapshot.load(other, blob)
+    assert other.op.super_memory.read_block("xram", 0x8000, 2) == b"\xaa\xbb"
+
+
+def test_cli_xram(tmp_path, capsys):
+    source = tmp_path / "program.asm"
+    source.write_text(PROGRAM)
+    path = tmp_path / "xram.bin"
+    assert main([str(source), "--run", "--xram", str(path), "--write", "xram:0x1000=01020304"]) == 0
+    assert path.read_bytes()[0x1000:0x1004] == bytes([0x11, 0x12, 0x13, 0x14])